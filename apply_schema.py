@@ -63,6 +63,82 @@ def update_existing_tables(cursor):
             print("✅ Added lockout_until column to users table")
     except Exception as e:
         print(f"⚠️ Warning adding lockout_until column: {e}")
+    
+    try:
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'users' AND column_name = 'claims_version'")
+        if not cursor.fetchone():
+            cursor.execute("ALTER TABLE users ADD COLUMN claims_version INTEGER NOT NULL DEFAULT 1")
+            print("✅ Added claims_version column to users table")
+    except Exception as e:
+        print(f"⚠️ Warning adding claims_version column: {e}")
+    
+    try:
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'users' AND column_name = 'token_epoch'")
+        if not cursor.fetchone():
+            cursor.execute("ALTER TABLE users ADD COLUMN token_epoch INTEGER NOT NULL DEFAULT 0")
+            print("✅ Added token_epoch column to users table")
+    except Exception as e:
+        print(f"⚠️ Warning adding token_epoch column: {e}")
+    
+    # Revocation sequence polled by every backend replica
+    try:
+        cursor.execute("CREATE SEQUENCE IF NOT EXISTS jwt_revocation_seq START 1")
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'jwt_sessions' AND column_name = 'revocation_seq'")
+        if not cursor.fetchone():
+            cursor.execute("ALTER TABLE jwt_sessions ADD COLUMN revocation_seq BIGINT")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_jwt_sessions_revocation_seq ON jwt_sessions(revocation_seq) WHERE revocation_seq IS NOT NULL")
+            print("✅ Added revocation_seq column to jwt_sessions table")
+    except Exception as e:
+        print(f"⚠️ Warning adding revocation_seq column: {e}")
+    
+    # Background admin jobs
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS admin_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                job_type VARCHAR(100) NOT NULL,
+                params JSONB,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                progress_done INTEGER NOT NULL DEFAULT 0,
+                progress_total INTEGER,
+                result JSONB,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id VARCHAR(100),
+                created_by VARCHAR(255),
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                started_at TIMESTAMP WITH TIME ZONE,
+                heartbeat_at TIMESTAMP WITH TIME ZONE,
+                finished_at TIMESTAMP WITH TIME ZONE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_admin_jobs_pending ON admin_jobs(id) WHERE status IN ('queued', 'running')")
+        print("✅ Ensured admin_jobs table exists")
+    except Exception as e:
+        print(f"⚠️ Warning creating admin_jobs table: {e}")
+    
+    # Outbox of LDAP writes applied by the backend's relay
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ldap_outbox (
+                id BIGSERIAL PRIMARY KEY,
+                idempotency_key VARCHAR(255) UNIQUE NOT NULL,
+                username VARCHAR(255) NOT NULL,
+                changes JSONB NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                applied_at TIMESTAMP WITH TIME ZONE,
+                dead_at TIMESTAMP WITH TIME ZONE
+            )
+        """)
+        cursor.execute("ALTER TABLE ldap_outbox ADD COLUMN IF NOT EXISTS dead_at TIMESTAMP WITH TIME ZONE")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ldap_outbox_pending ON ldap_outbox(id) WHERE applied_at IS NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ldap_outbox_username ON ldap_outbox(username, applied_at)")
+        print("✅ Ensured ldap_outbox table exists")
+    except Exception as e:
+        print(f"⚠️ Warning creating ldap_outbox table: {e}")
 
 def fix_sequence_gaps(cursor):
     """Fix sequence gaps by resetting them to match actual data"""
@@ -89,15 +165,9 @@ def fix_sequence_gaps(cursor):
         else:
             print("⚠️ No operators found, keeping operators_id_seq at default")
         
-        # Fix personnel_id_seq
-        cursor.execute("SELECT MAX(id) FROM personnel")
-        result = cursor.fetchone()
-        max_personnel_id = result[0] if result and result[0] else 0
-        if max_personnel_id > 0:
-            cursor.execute("SELECT setval('personnel_id_seq', %s, true)", (max_personnel_id,))
-            print(f"✅ Fixed personnel_id_seq to {max_personnel_id}")
-        else:
-            print("⚠️ No personnel found, keeping personnel_id_seq at default")
+        # personnel_id_seq is also the PER_ employee ID sequence; resetting it to
+        # MAX(personnel.id) could move it backwards and reissue employee IDs.
+        # sync_employee_id_sequences only ever moves it forward.
         
         print("✅ Sequence gaps fixed")
         
@@ -106,6 +176,48 @@ def fix_sequence_gaps(cursor):
         import traceback
         traceback.print_exc()
 
+EMPLOYEE_ID_SEQUENCES = ('admin_id_seq', 'operator_id_seq', 'personnel_id_seq')
+
+def advance_sequence(cursor, sequence, value):
+    """Move a sequence forward to value; never backwards. Returns whether it moved."""
+    cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+    last_value, is_called = cursor.fetchone()
+    current = last_value if is_called else last_value - 1
+    if value <= current:
+        return False
+    cursor.execute("SELECT setval(%s, %s, true)", (sequence, value))
+    return True
+
+def sync_employee_id_sequences(cursor):
+    """Move the employee ID sequences past every employee ID already issued.
+
+    The backend hands out employee IDs from blocks of these sequences, so a
+    sequence behind the IDs in the users table (e.g. after the max+1 variant
+    of get_next_employee_id was in use) would reissue existing IDs.
+    Sequences are only ever moved forward.
+    """
+    try:
+        print("🔄 Syncing employee ID sequences...")
+        sequences = {
+            'admin_id_seq': ['ADMIN_', 'USER_'],
+            'operator_id_seq': ['OP_'],
+            'personnel_id_seq': ['PER_']
+        }
+        for sequence, prefixes in sequences.items():
+            max_id = 0
+            for prefix in prefixes:
+                cursor.execute("""
+                    SELECT COALESCE(MAX(CAST(SUBSTRING(employee_id FROM %s) AS INTEGER)), 0)
+                    FROM users WHERE employee_id ~ %s
+                """, (len(prefix) + 1, f"^{prefix}[0-9]+$"))
+                max_id = max(max_id, cursor.fetchone()[0])
+            if advance_sequence(cursor, sequence, max_id):
+                print(f"✅ Moved {sequence} to {max_id}")
+            else:
+                print(f"✅ {sequence} already past existing employee IDs")
+    except Exception as e:
+        print(f"⚠️ Warning syncing employee ID sequences: {e}")
+
 def compact_primary_keys(cursor):
     """Densify primary key IDs to remove gaps for specific tables.
     This resets IDs to 1..N order by current id and resets the related sequences.
@@ -137,8 +249,12 @@ def compact_primary_keys(cursor):
             cursor.execute(f"UPDATE {table_name} u SET id = m.new_id FROM tmp_{table_name}_id_map m WHERE u.id = -m.new_id")
             cursor.execute(f"DROP TABLE tmp_{table_name}_id_map")
 
-            # Reset sequence to MAX(id)
-            cursor.execute(f"SELECT setval('{seq_name}', (SELECT COALESCE(MAX(id), 0) FROM {table_name}))")
+            # Reset sequence to MAX(id); an employee ID sequence is only moved forward
+            if seq_name in EMPLOYEE_ID_SEQUENCES:
+                cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}")
+                advance_sequence(cursor, seq_name, cursor.fetchone()[0])
+            else:
+                cursor.execute(f"SELECT setval('{seq_name}', (SELECT COALESCE(MAX(id), 0) FROM {table_name}))")
 
         print("✅ Primary key compaction complete")
     except Exception as e:
@@ -255,6 +371,7 @@ def apply_schema():
             
             # Fix sequence gaps to ensure proper ID generation
             fix_sequence_gaps(cursor)
+            sync_employee_id_sequences(cursor)
         
         conn.close()
         return True
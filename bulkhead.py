@@ -0,0 +1,116 @@
+import os
+import functools
+from typing import Any, Callable, Dict, Optional
+import logging
+
+import anyio
+from fastapi import HTTPException
+
+from profiling_service import profiling_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class BulkheadFullError(HTTPException):
+    """Raised when a dependency's bulkhead has no free slot within the admission timeout"""
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is busy, please retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.name = name
+
+# Run on the worker thread after every bulkhead call (e.g. to hand thread-bound resources back)
+_after_call_hooks = []
+
+def after_each_call(hook: Callable[[], None]) -> None:
+    """Register a hook to run on the worker thread once each bulkhead call returns"""
+    _after_call_hooks.append(hook)
+
+def _run_with_hooks(func: Callable[..., Any], *args, **kwargs) -> Any:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        for hook in _after_call_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Bulkhead after-call hook failed: {e}")
+
+class Bulkhead:
+    """Bounded concurrency for blocking calls into one dependency (LDAP, DB, ...).
+
+    Each bulkhead owns its own worker-thread limiter, so a slow dependency can
+    only tie up its own slots and never starves the default AnyIO threadpool
+    used by other routes.  Callers that cannot get a slot within
+    `max_wait_seconds` fail fast with a 503 instead of queueing forever.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait_seconds: float, retry_after: int = 1):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_after = retry_after
+        self._admission: Optional[anyio.CapacityLimiter] = None
+        self._threads: Optional[anyio.CapacityLimiter] = None
+        self.rejected = 0
+
+    def _limiters(self):
+        # Limiters must be created inside the running event loop
+        if self._admission is None:
+            self._admission = anyio.CapacityLimiter(self.max_concurrent)
+            self._threads = anyio.CapacityLimiter(self.max_concurrent)
+        return self._admission, self._threads
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable in a worker thread under this bulkhead"""
+        admission, threads = self._limiters()
+
+        acquired = False
+        with anyio.move_on_after(self.max_wait_seconds):
+            await admission.acquire()
+            acquired = True
+        if not acquired:
+            self.rejected += 1
+            logger.warning(f"Bulkhead {self.name} full ({self.max_concurrent} in use), rejecting call to {func.__name__}")
+            raise BulkheadFullError(self.name, self.retry_after)
+
+        try:
+            return await anyio.to_thread.run_sync(functools.partial(_run_with_hooks, profiling_service.bind_route(func), *args, **kwargs),
+                                                limiter=threads)
+        finally:
+            admission.release()
+
+    def stats(self) -> Dict[str, Any]:
+        in_use = self._admission.borrowed_tokens if self._admission else 0
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_use": in_use,
+            "rejected": self.rejected
+        }
+
+BULKHEAD_MAX_WAIT_SECONDS = float(os.environ.get('BULKHEAD_MAX_WAIT_SECONDS', '0.5'))
+BULKHEAD_RETRY_AFTER_SECONDS = int(os.environ.get('BULKHEAD_RETRY_AFTER_SECONDS', '1'))
+
+# Global bulkheads, one per blocking dependency
+ldap_bulkhead = Bulkhead(
+    'LDAP',
+    int(os.environ.get('LDAP_MAX_CONCURRENCY', '16')),
+    BULKHEAD_MAX_WAIT_SECONDS,
+    BULKHEAD_RETRY_AFTER_SECONDS
+)
+db_bulkhead = Bulkhead(
+    'Database',
+    int(os.environ.get('DB_MAX_CONCURRENCY', '8')),
+    BULKHEAD_MAX_WAIT_SECONDS,
+    BULKHEAD_RETRY_AFTER_SECONDS
+)
+# scrypt for the credential cache holds ~16 MiB per call, so bound it apart from the default threadpool
+hash_bulkhead = Bulkhead(
+    'Password hashing',
+    int(os.environ.get('CREDENTIAL_CACHE_MAX_CONCURRENT_HASHES', '4')),
+    BULKHEAD_MAX_WAIT_SECONDS,
+    BULKHEAD_RETRY_AFTER_SECONDS
+)
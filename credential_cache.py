@@ -0,0 +1,149 @@
+import os
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+
+from invalidation_bus import USER_CHANGED, USER_DELETED, PASSWORD_CHANGED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CachedCredential:
+    __slots__ = ('salt', 'digest', 'stored_at', 'record')
+
+    def __init__(self, salt: bytes, digest: bytes, stored_at: float, record: Dict[str, Any]):
+        self.salt = salt
+        self.digest = digest
+        self.stored_at = stored_at
+        self.record = record
+
+class CredentialCache:
+    """Opt-in cache of password verifiers from successful LDAP binds (cf. SSSD cached credentials).
+
+    After a successful bind the password is stored only as a salted scrypt
+    hash, together with the user's login record (role, authorization level,
+    name, employeeNumber), for `ttl` seconds.  A repeat login can then be
+    validated locally either when LDAP is unhealthy (mode `fallback`) or,
+    in mode `cache_first`, while the entry is younger than
+    `cache_first_window` (a mismatch still falls through to LDAP).  A
+    password changed directly in LDAP therefore stops working within that
+    window while LDAP is up; the full `ttl` only applies to outages.
+    Password resets, role/level changes and deletions drop the user's entry
+    via the invalidation bus.  Hashing runs on its own bulkhead (see
+    main.py), since each scrypt call holds ~16 MiB.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get('CREDENTIAL_CACHE_ENABLED', 'false').lower() == 'true'
+        self.mode = os.environ.get('CREDENTIAL_CACHE_MODE', 'fallback').lower()
+        self.ttl = float(os.environ.get('CREDENTIAL_CACHE_TTL', '900'))
+        # cache_first only skips LDAP for entries this fresh
+        self.cache_first_window = float(os.environ.get('CREDENTIAL_CACHE_FIRST_WINDOW', '60'))
+        # Re-hash after a successful bind only once the entry is this old, so
+        # repeat logins do not pay for scrypt on every LDAP bind
+        self.refresh_after = float(os.environ.get('CREDENTIAL_CACHE_REFRESH_AFTER', '300'))
+        if self.cache_first:
+            # Keep the entry young enough to keep serving repeat logins first
+            self.refresh_after = min(self.refresh_after, self.cache_first_window)
+        self.max_entries = max(1, int(os.environ.get('CREDENTIAL_CACHE_MAX_ENTRIES', '10000')))
+        # scrypt cost: n=2**14, r=8 takes ~16 MiB and tens of milliseconds per hash
+        self.scrypt_n = int(os.environ.get('CREDENTIAL_CACHE_SCRYPT_N', '16384'))
+        self.scrypt_r = 8
+        self.scrypt_p = 1
+        self._entries: "OrderedDict[str, CachedCredential]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.local_misses = 0
+
+    @property
+    def cache_first(self) -> bool:
+        return self.mode == 'cache_first'
+
+    def _hash(self, password: str, salt: bytes) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=self.scrypt_n, r=self.scrypt_r,
+                              p=self.scrypt_p, maxmem=256 * self.scrypt_n * self.scrypt_r, dklen=32)
+
+    def _get(self, username: str) -> Optional[CachedCredential]:
+        with self._lock:
+            cached = self._entries.get(username)
+            if cached is None:
+                return None
+            if time.monotonic() - cached.stored_at >= self.ttl:
+                del self._entries[username]
+                return None
+            return cached
+
+    def has(self, username: str) -> bool:
+        return self.enabled and self._get(username) is not None
+
+    def serves_first(self, username: str) -> bool:
+        """Whether a login may be checked against the cache before LDAP (cache_first mode, fresh entry)"""
+        if not self.enabled or not self.cache_first:
+            return False
+        cached = self._get(username)
+        return cached is not None and time.monotonic() - cached.stored_at < self.cache_first_window
+
+    def needs_refresh(self, username: str) -> bool:
+        """Whether a successful bind should (re)store the user's verifier"""
+        if not self.enabled:
+            return False
+        cached = self._get(username)
+        return cached is None or time.monotonic() - cached.stored_at >= self.refresh_after
+
+    def store(self, username: str, password: str, record: Dict[str, Any]):
+        """Remember a password verifier after a successful LDAP bind"""
+        if not self.enabled:
+            return
+        salt = secrets.token_bytes(16)
+        cached = CachedCredential(salt, self._hash(password, salt), time.monotonic(), dict(record))
+        with self._lock:
+            self._entries[username] = cached
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def verify(self, username: str, password: str) -> Optional[Dict[str, Any]]:
+        """Return the cached login record if the password matches the cached verifier"""
+        cached = self._get(username) if self.enabled else None
+        if cached is None:
+            return None
+        if hmac.compare_digest(self._hash(password, cached.salt), cached.digest):
+            self.local_hits += 1
+            return dict(cached.record)
+        self.local_misses += 1
+        return None
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in (USER_CHANGED, USER_DELETED, PASSWORD_CHANGED):
+            if username:
+                self.invalidate(username)
+            else:
+                self.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached_users = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "cached_users": cached_users,
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses
+        }
+
+# Global credential cache instance
+credential_cache = CredentialCache()
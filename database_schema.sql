@@ -9,6 +9,7 @@ CREATE SEQUENCE IF NOT EXISTS admin_id_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS operator_id_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS personnel_id_seq START 1;
 CREATE SEQUENCE IF NOT EXISTS users_id_seq START 1;
+CREATE SEQUENCE IF NOT EXISTS jwt_revocation_seq START 1; -- Monotonic revocation order polled by every replica
 
 -- Users table (for future non-LDAP users and metadata)
 CREATE TABLE users (
@@ -25,7 +26,9 @@ CREATE TABLE users (
     login_count INTEGER DEFAULT 0,
     failed_attempts_count INTEGER DEFAULT 0,
     is_locked BOOLEAN DEFAULT false,
-    lockout_until TIMESTAMP WITH TIME ZONE
+    lockout_until TIMESTAMP WITH TIME ZONE,
+    claims_version INTEGER NOT NULL DEFAULT 1, -- Bumped when role/authorization level/employee_id change
+    token_epoch INTEGER NOT NULL DEFAULT 0 -- Access tokens minted with an older epoch are rejected
 );
 
 -- Operators table (separate table for operator-specific data)
@@ -86,6 +89,7 @@ CREATE TABLE jwt_sessions (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
     revoked_at TIMESTAMP WITH TIME ZONE,
+    revocation_seq BIGINT, -- Set from jwt_revocation_seq when the token is revoked
     ip_address INET,
     user_agent TEXT
 );
@@ -116,18 +120,55 @@ CREATE TABLE admin_actions (
 -- Convert to hypertable for time-series optimization
 SELECT create_hypertable('admin_actions', 'created_at');
 
+-- Background admin jobs (claimed by workers in any replica with FOR UPDATE SKIP LOCKED)
+CREATE TABLE admin_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(100) NOT NULL, -- 'sync_ldap_users', 'delete_user', 'sync_user_to_tables'
+    params JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- 'queued', 'running', 'succeeded', 'failed'
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id VARCHAR(100), -- Worker holding the claim while running
+    created_by VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE, -- Running jobs with a stale heartbeat are claimed again
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- LDAP writes committed with admin database changes, applied in order by the outbox relay
+CREATE TABLE ldap_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    idempotency_key VARCHAR(255) UNIQUE NOT NULL,
+    username VARCHAR(255) NOT NULL,
+    changes JSONB NOT NULL, -- {"attribute": ["value", ...]}, replace semantics
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    applied_at TIMESTAMP WITH TIME ZONE,
+    dead_at TIMESTAMP WITH TIME ZONE -- gave up after LDAP_OUTBOX_MAX_ATTEMPTS; an admin retries or discards it
+);
+
 -- Indexes for performance
 CREATE INDEX idx_login_attempts_username ON login_attempts(username);
 CREATE INDEX idx_login_attempts_created_at ON login_attempts(created_at DESC);
 CREATE INDEX idx_jwt_sessions_username ON jwt_sessions(username);
 CREATE INDEX idx_jwt_sessions_token_id ON jwt_sessions(token_id);
 CREATE INDEX idx_jwt_sessions_active ON jwt_sessions(is_active) WHERE is_active = true;
+CREATE INDEX idx_jwt_sessions_revocation_seq ON jwt_sessions(revocation_seq) WHERE revocation_seq IS NOT NULL;
 CREATE INDEX idx_user_lockouts_username ON user_lockouts(username);
 CREATE INDEX idx_user_lockouts_active ON user_lockouts(is_active) WHERE is_active = true;
 CREATE INDEX idx_admin_actions_admin ON admin_actions(admin_username);
 CREATE INDEX idx_admin_actions_target ON admin_actions(target_username);
 CREATE INDEX idx_users_employee_id ON users(employee_id);
 CREATE INDEX idx_operators_employee_id ON operators(employee_id);
+CREATE INDEX idx_admin_jobs_pending ON admin_jobs(id) WHERE status IN ('queued', 'running');
+CREATE INDEX idx_ldap_outbox_pending ON ldap_outbox(id) WHERE applied_at IS NULL;
+CREATE INDEX idx_ldap_outbox_username ON ldap_outbox(username, applied_at);
 CREATE INDEX idx_personnel_employee_id ON personnel(employee_id);
 
 -- Functions for automatic timestamp updates
@@ -1,15 +1,40 @@
 import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from psycopg2 import extensions
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List, Any
 import logging
 
+from employee_ids import EmployeeIdAllocator
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# True while an admin change to the user is still on its way to LDAP: an
+# ldap_outbox row is unapplied (or dead-lettered), or was applied so recently
+# that an LDAP read taken just before it may still be in flight.  Upserts
+# sourced from LDAP keep the database's role and level meanwhile.
+LDAP_WRITE_PENDING = """EXISTS (
+    SELECT 1 FROM ldap_outbox o
+    WHERE o.username = users.username
+      AND (o.applied_at IS NULL OR o.applied_at > NOW() - INTERVAL '60 seconds'))"""
+
+class DatabaseUnavailableError(Exception):
+    """Raised by writes whose callers keep an in-memory fallback when the database is down"""
+    pass
+
+class OutboxRowSupersededError(Exception):
+    """Raised when retrying a dead-lettered LDAP change would overwrite a later change to the same user"""
+    pass
+
 class DatabaseService:
     def __init__(self):
         self.db_config = {
@@ -17,27 +42,195 @@ class DatabaseService:
             'port': os.environ.get('DB_PORT', '5432'),
             'database': os.environ.get('DB_NAME', 'auth_metadata'),
             'user': os.environ.get('DB_USER', 'postgres'),
-            'password': os.environ.get('DB_PASSWORD', 'auth_metadata_pass')
+            'password': os.environ.get('DB_PASSWORD', 'auth_metadata_pass'),
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '3'))
         }
-        self._connection = None
+        # A thread works on its own connection, so one thread's commit or
+        # rollback never lands on another thread's transaction.  Background
+        # loops keep theirs; a bulkhead call borrows one and hands it back to
+        # the idle pool when it returns (release_connection).  At most
+        # DB_MAX_CONNECTIONS are open, DB_POOL_MAX_IDLE of them idle.
+        self.max_connections = max(1, int(os.environ.get('DB_MAX_CONNECTIONS', '36')))
+        self.max_idle = max(0, int(os.environ.get('DB_POOL_MAX_IDLE', '4')))
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._idle: List[Any] = []
+        self._open_count = 0
+        self._pool = threading.Condition()
+        
+        # Dependency health state machine: 'connected' -> 'down' on a failed
+        # connect; reconnects are only attempted once the backoff has elapsed
+        self.backoff_initial = float(os.environ.get('DB_RECONNECT_BACKOFF_INITIAL', '0.5'))
+        self.backoff_max = float(os.environ.get('DB_RECONNECT_BACKOFF_MAX', '30'))
+        self._state = 'disconnected'
+        self._consecutive_failures = 0
+        self._next_attempt_at = 0.0
+        self._last_error = None
+        self._connect_lock = threading.Lock()
+        
+        # Employee IDs are issued from blocks of the role sequences
+        self.employee_ids = EmployeeIdAllocator(self.reserve_sequence_values)
 
     def get_connection(self):
-        """Get database connection with retry logic"""
-        if self._connection is None or self._connection.closed:
-            try:
-                self._connection = psycopg2.connect(**self.db_config)
-                logger.info("Database connection established")
-            except Exception as e:
-                logger.error(f"Failed to connect to database: {e}")
-                # Don't raise immediately, try to return None and let caller handle
+        """Get this thread's database connection, backing off exponentially while the database is down.
+
+        Returns None immediately (a "degraded" answer) while a reconnect is not
+        yet due, instead of making every caller pay the connect timeout.  While
+        the database is down only one thread probes it; the others wait for
+        that outcome rather than reporting a healthy database as unavailable.
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None and not conn.closed:
+            return conn
+        if time.monotonic() < self._next_attempt_at:
+            return None
+        if self._state == 'connected':
+            return self._checkout()
+        if not self._connect_lock.acquire(timeout=self.db_config['connect_timeout'] + 1):
+            logger.warning("Timed out waiting for another thread's database reconnect")
+            return None
+        try:
+            if self._state == 'connected':
+                return self._checkout()
+            if time.monotonic() < self._next_attempt_at:
+                # The attempt we waited for failed; respect its backoff
                 return None
-        return self._connection
+            return self._checkout()
+        finally:
+            self._connect_lock.release()
+
+    def _checkout(self):
+        """Bind an idle connection (or a new one, within DB_MAX_CONNECTIONS) to the calling thread"""
+        deadline = time.monotonic() + self.db_config['connect_timeout']
+        with self._pool:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if not conn.closed:
+                        self._local.connection = conn
+                        return conn
+                if self._open_count < self.max_connections:
+                    self._open_count += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"All {self.max_connections} database connections are in use")
+                    return None
+                self._pool.wait(remaining)
+        return self._open_connection()
+
+    def _connection_gone(self):
+        with self._pool:
+            self._open_count -= 1
+            self._pool.notify()
+
+    def _open_connection(self):
+        """Open the calling thread's connection (a slot is already counted) and record the outcome"""
+        try:
+            conn = psycopg2.connect(**self.db_config)
+        except Exception as e:
+            self._connection_gone()
+            self._consecutive_failures += 1
+            delay = min(self.backoff_max, self.backoff_initial * (2 ** (self._consecutive_failures - 1)))
+            delay *= random.uniform(0.8, 1.2)
+            self._next_attempt_at = time.monotonic() + delay
+            self._state = 'down'
+            self._last_error = str(e).strip()
+            logger.error(f"Failed to connect to database (attempt {self._consecutive_failures}, retrying in {delay:.1f}s): {e}")
+            # Don't raise immediately, try to return None and let caller handle
+            return None
+        # Between calls a connection holds no transaction: plain reads never sit
+        # "idle in transaction" or leave it aborted; transaction() groups writes
+        conn.autocommit = True
+        # The slot is freed once the connection is gone (closed and dropped, e.g. with its thread)
+        weakref.finalize(conn, self._connection_gone)
+        self._connections.add(conn)
+        self._local.connection = conn
+        if self._state != 'connected':
+            logger.info(f"Database connection established (after {self._consecutive_failures} failed attempts)")
+        self._state = 'connected'
+        self._consecutive_failures = 0
+        self._next_attempt_at = 0.0
+        self._last_error = None
+        return conn
+
+    def release_connection(self):
+        """Hand the calling thread's connection back to the pool (run after every bulkhead call)"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            return
+        self._local.connection = None
+        if conn.closed:
+            return
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"Dropping a database connection that could not be reset: {e}")
+            conn.close()
+            return
+        with self._pool:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                self._pool.notify()
+                return
+        conn.close()
+
+    @contextmanager
+    def transaction(self, conn):
+        """Run the block as one transaction on this thread's connection `conn`.
+
+        Rolls back whatever an earlier call on the thread left open, turns
+        autocommit off for the block and commits at the end (rolls back if it
+        raises).  A transaction() inside another one on the same thread joins
+        the outer transaction.
+        """
+        if getattr(self._local, 'transaction', None) is conn:
+            yield conn
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        conn.autocommit = False
+        self._local.transaction = conn
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception as rollback_error:
+                logger.error(f"Failed to rollback transaction: {rollback_error}")
+            raise
+        finally:
+            self._local.transaction = None
+            if not conn.closed:
+                conn.autocommit = True
+
+    def is_degraded(self) -> bool:
+        """True while the database is known to be unreachable"""
+        return self._state == 'down'
+
+    def health(self) -> Dict[str, Any]:
+        """Report the database dependency state for /health"""
+        retry_in = max(0.0, self._next_attempt_at - time.monotonic()) if self._state == 'down' else 0.0
+        return {
+            "state": self._state,
+            "consecutive_failures": self._consecutive_failures,
+            "retry_in_seconds": round(retry_in, 1),
+            "last_error": self._last_error,
+            "connections": self._open_count,
+            "idle_connections": len(self._idle),
+            "max_connections": self.max_connections
+        }
 
     def close_connection(self):
-        """Close database connection"""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            logger.info("Database connection closed")
+        """Close every thread's database connection"""
+        with self._pool:
+            self._idle.clear()
+        for conn in list(self._connections):
+            if not conn.closed:
+                conn.close()
+        logger.info("Database connections closed")
 
     def test_connection(self):
         """Test database connection"""
@@ -53,6 +246,19 @@ class DatabaseService:
             logger.error(f"Database connection test failed: {e}")
             return False
 
+    def notify(self, channel: str, payload: str):
+        """Send a NOTIFY to every listening backend replica"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to notify channel {channel}: {e}")
+            raise
+
     def record_login_attempt(self, username: str, attempt_type: str, ip_address: str = None, 
                            user_agent: str = None, session_id: str = None, error_message: str = None):
         """Record a login attempt in the database"""
@@ -61,7 +267,7 @@ class DatabaseService:
             if conn is None:
                 logger.error(f"Cannot record login attempt for {username}: database connection failed.")
                 return
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 # Insert login attempt
                 cursor.execute("""
                     INSERT INTO login_attempts (username, attempt_type, ip_address, user_agent, session_id, error_message)
@@ -94,6 +300,89 @@ class DatabaseService:
             logger.error(f"Failed to record login attempt: {e}")
             raise
 
+    def get_user_claims(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get the access-token claims kept for a user (role, employee_id, authorization_level, claims_version, token_epoch)"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot get claims for {username}: database connection failed.")
+                return None
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT role, employee_id, authorization_level, claims_version, token_epoch
+                    FROM users 
+                    WHERE username = %s
+                """, (username,))
+                result = cursor.fetchone()
+                return dict(result) if result else None
+        except Exception as e:
+            logger.error(f"Failed to get user claims: {e}")
+            return None
+
+    def get_employee_ids(self, usernames: List[str]) -> Dict[str, str]:
+        """Get the persistent employee_id of many users in one query (users without one are omitted)"""
+        if not usernames:
+            return {}
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot get employee ids: database connection failed.")
+                return {}
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT username, employee_id
+                    FROM users 
+                    WHERE username = ANY(%s) AND employee_id IS NOT NULL
+                """, (list(usernames),))
+                return {username: employee_id for username, employee_id in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to get employee ids: {e}")
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            return {}
+
+    def bump_token_epoch(self, username: str) -> Optional[int]:
+        """Increment a user's token epoch, invalidating their outstanding access tokens"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot bump token epoch for {username}: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET token_epoch = token_epoch + 1
+                    WHERE username = %s
+                    RETURNING token_epoch
+                """, (username,))
+                result = cursor.fetchone()
+                conn.commit()
+                logger.info(f"Bumped token epoch for {username}")
+                return result[0] if result else None
+        except Exception as e:
+            logger.error(f"Failed to bump token epoch: {e}")
+            raise
+
+    def get_token_epochs(self, username: str = None) -> Dict[str, int]:
+        """Get every non-zero token epoch (or just one user's) as {username: epoch}"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error("Cannot get token epochs: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                if username:
+                    cursor.execute("SELECT username, token_epoch FROM users WHERE username = %s", (username,))
+                else:
+                    cursor.execute("SELECT username, token_epoch FROM users WHERE token_epoch > 0")
+                return {row[0]: row[1] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to get token epochs: {e}")
+            raise
+
     def get_user_lockout_status(self, username: str) -> Dict[str, Any]:
         """Get current lockout status for a user"""
         try:
@@ -122,7 +411,7 @@ class DatabaseService:
             if conn is None:
                 logger.error(f"Cannot set lockout for {username}: database connection failed.")
                 return
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 # Update user table
                 cursor.execute("""
                     UPDATE users 
@@ -149,7 +438,7 @@ class DatabaseService:
             if conn is None:
                 logger.error(f"Cannot unlock user {username}: database connection failed.")
                 return
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE users 
                     SET is_locked = false, lockout_until = NULL, failed_attempts_count = 0 
@@ -176,7 +465,7 @@ class DatabaseService:
             conn = self.get_connection()
             if conn is None:
                 logger.error(f"Cannot store refresh token for {username}: database connection failed.")
-                return
+                raise DatabaseUnavailableError("database connection failed")
             with conn.cursor() as cursor:
                 cursor.execute("""
                     INSERT INTO jwt_sessions (token_id, username, token_type, expires_at, ip_address, user_agent)
@@ -188,18 +477,61 @@ class DatabaseService:
             logger.error(f"Failed to store refresh token: {e}")
             raise
 
+    def store_refresh_tokens_bulk(self, tokens: List[tuple]):
+        """Insert refresh tokens held in memory during an outage.
+
+        `tokens` are (token_id, username, created_at, expires_at, is_active,
+        revoked_at) tuples; a token that already exists keeps its row but a
+        revocation is carried over.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot store {len(tokens)} fallback refresh tokens: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with self.transaction(conn), conn.cursor() as cursor:
+                execute_values(cursor, """
+                    INSERT INTO jwt_sessions (token_id, username, token_type, created_at, expires_at, is_active, revoked_at)
+                    VALUES %s
+                    ON CONFLICT (token_id) DO UPDATE SET
+                        is_active = jwt_sessions.is_active AND EXCLUDED.is_active,
+                        revoked_at = COALESCE(jwt_sessions.revoked_at, EXCLUDED.revoked_at)
+                """, [
+                    (token_id, username, 'refresh', created_at, expires_at, is_active, revoked_at)
+                    for token_id, username, created_at, expires_at, is_active, revoked_at in tokens
+                ])
+                # Publish revocations made during the outage to the other replicas
+                revoked_ids = [token[0] for token in tokens if not token[4]]
+                if revoked_ids:
+                    cursor.execute("""
+                        UPDATE jwt_sessions
+                        SET revocation_seq = nextval('jwt_revocation_seq')
+                        WHERE token_id = ANY(%s) AND is_active = false AND revocation_seq IS NULL
+                    """, (revoked_ids,))
+                conn.commit()
+                logger.info(f"Stored {len(tokens)} fallback refresh tokens")
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to store fallback refresh tokens: {e}")
+            raise
+
     def revoke_refresh_token(self, token_id: str):
         """Revoke a refresh token"""
         try:
             conn = self.get_connection()
             if conn is None:
                 logger.error(f"Cannot revoke token {token_id}: database connection failed.")
-                return
+                raise DatabaseUnavailableError("database connection failed")
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE jwt_sessions 
-                    SET is_active = false, revoked_at = NOW() 
-                    WHERE token_id = %s
+                    SET is_active = false, revoked_at = NOW(), revocation_seq = nextval('jwt_revocation_seq')
+                    WHERE token_id = %s AND revocation_seq IS NULL
                 """, (token_id,))
                 conn.commit()
                 logger.info(f"Revoked token {token_id}")
@@ -213,11 +545,11 @@ class DatabaseService:
             conn = self.get_connection()
             if conn is None:
                 logger.error(f"Cannot revoke all tokens for {username}: database connection failed.")
-                return
+                raise DatabaseUnavailableError("database connection failed")
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE jwt_sessions 
-                    SET is_active = false, revoked_at = NOW() 
+                    SET is_active = false, revoked_at = NOW(), revocation_seq = nextval('jwt_revocation_seq')
                     WHERE username = %s AND is_active = true
                 """, (username,))
                 conn.commit()
@@ -226,6 +558,57 @@ class DatabaseService:
             logger.error(f"Failed to revoke all user tokens: {e}")
             raise
 
+    def get_revoked_tokens(self) -> tuple:
+        """Load every unexpired revoked token; returns (rows, highest revocation_seq)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error("Cannot load revoked tokens: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("SELECT COALESCE(MAX(revocation_seq), 0) AS max_seq FROM jwt_sessions")
+                max_seq = cursor.fetchone()['max_seq']
+                cursor.execute("""
+                    SELECT token_id, expires_at, revocation_seq FROM jwt_sessions
+                    WHERE is_active = false AND revoked_at IS NOT NULL AND expires_at > NOW()
+                """)
+                rows = [dict(row) for row in cursor.fetchall()]
+                return rows, max_seq
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to load revoked tokens: {e}")
+            raise
+
+    def get_revocations_since(self, revocation_seq: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get revocations with a sequence number above `revocation_seq`, oldest first"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error("Cannot poll revocations: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT token_id, expires_at, revocation_seq FROM jwt_sessions
+                    WHERE revocation_seq > %s
+                    ORDER BY revocation_seq
+                    LIMIT %s
+                """, (revocation_seq, limit))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to poll revocations: {e}")
+            raise
+
     def get_active_refresh_tokens(self, username: str = None) -> List[Dict[str, Any]]:
         """Get active refresh tokens"""
         try:
@@ -251,13 +634,55 @@ class DatabaseService:
             logger.error(f"Failed to get active refresh tokens: {e}")
             return []
 
+    def get_session_counts(self) -> Optional[Dict[str, int]]:
+        """Active refresh-token sessions per user (None if the database is unavailable)"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error("Cannot get session counts: database connection failed.")
+                return None
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT username, COUNT(*)
+                    FROM jwt_sessions
+                    WHERE is_active = true AND expires_at > NOW()
+                    GROUP BY username
+                """)
+                return {username: count for username, count in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Failed to get session counts: {e}")
+            return None
+
+    def get_lockout_overview(self) -> Optional[List[Dict[str, Any]]]:
+        """Users currently locked out or with failed login attempts (None if the database is unavailable)"""
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error("Cannot get lockout overview: database connection failed.")
+                return None
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT username,
+                           COALESCE(is_locked AND lockout_until > NOW(), false) AS is_locked,
+                           CASE WHEN is_locked AND lockout_until > NOW()
+                                THEN CEIL(EXTRACT(EPOCH FROM lockout_until - NOW()))::int END AS remaining_lockout_time,
+                           failed_attempts_count AS failed_attempts
+                    FROM users
+                    WHERE (is_locked AND lockout_until > NOW()) OR failed_attempts_count > 0
+                    ORDER BY username
+                """)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Failed to get lockout overview: {e}")
+            return None
+
     def cleanup_expired_tokens(self):
         """Clean up expired tokens"""
         try:
             conn = self.get_connection()
             if conn is None:
                 logger.error(f"Cannot cleanup expired tokens: database connection failed.")
-                return
+                raise DatabaseUnavailableError("database connection failed")
             with conn.cursor() as cursor:
                 cursor.execute("""
                     UPDATE jwt_sessions 
@@ -271,8 +696,13 @@ class DatabaseService:
             raise
 
     def upsert_user(self, username: str, ldap_dn: str = None, role: str = 'user', 
-                    authorization_level: int = 1, employee_id: str = None) -> int:
-        """Create or update a user with persistent employee ID"""
+                    authorization_level: int = 1, employee_id: str = None,
+                    admin_action: Dict[str, Any] = None) -> int:
+        """Create or update a user with persistent employee ID.
+
+        `admin_action` (record_admin_action's keyword arguments) is written
+        in the same transaction, so the audit record commits with the user.
+        """
         conn = None
         try:
             conn = self.get_connection()
@@ -280,74 +710,43 @@ class DatabaseService:
                 logger.error(f"Cannot upsert user {username}: database connection failed.")
                 return 0
             
-            # Get a fresh connection to avoid transaction issues
-            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
-                logger.info(f"Resetting connection for user {username} due to transaction status")
-                conn.close()
-                conn = self.get_connection()
-                if conn is None:
-                    logger.error(f"Cannot get fresh connection for user {username}")
-                    return 0
-            
-            conn.autocommit = False  # Start transaction
-            
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 # Ensure employee_id remains stable: reuse existing if present; only generate if missing
                 if not employee_id:
-                    try:
-                        cursor.execute("SELECT employee_id FROM users WHERE username = %s", (username,))
-                        existing = cursor.fetchone()
-                        if existing and existing[0]:
-                            employee_id = existing[0]
-                            logger.info(f"Reusing existing employee_id: {employee_id} for user {username}")
-                        else:
-                            try:
-                                cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-                                result = cursor.fetchone()
-                                if result:
-                                    employee_id = result[0]
-                                    logger.info(f"Generated employee_id: {employee_id} for user {username}")
-                                else:
-                                    # Fallback if function doesn't work
-                                    employee_id = f"{role.upper()}_01"
-                                    logger.warning(f"Using fallback employee_id: {employee_id} for user {username}")
-                            except Exception as e:
-                                logger.error(f"Failed to generate employee_id: {e}")
-                                # Fallback employee_id
-                                employee_id = f"{role.upper()}_01"
-                                logger.info(f"Using fallback employee_id: {employee_id} for user {username}")
-                    except Exception as e:
-                        logger.error(f"Failed checking existing employee_id for {username}: {e}")
-                        # As a safe fallback, attempt generation
-                        try:
-                            cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-                            result = cursor.fetchone()
-                            if result:
-                                employee_id = result[0]
-                                logger.info(f"Generated employee_id (fallback): {employee_id} for user {username}")
-                            else:
-                                employee_id = f"{role.upper()}_01"
-                                logger.warning(f"Using fallback employee_id: {employee_id} for user {username}")
-                        except Exception as gen_err:
-                            logger.error(f"Failed to generate employee_id in fallback: {gen_err}")
-                            employee_id = f"{role.upper()}_01"
-                            logger.info(f"Using fallback employee_id: {employee_id} for user {username}")
+                    cursor.execute("SELECT employee_id FROM users WHERE username = %s", (username,))
+                    existing = cursor.fetchone()
+                    if existing and existing[0]:
+                        employee_id = existing[0]
+                        logger.info(f"Reusing existing employee_id: {employee_id} for user {username}")
+                    else:
+                        employee_id = self.employee_ids.next(role, cursor)
+                        logger.info(f"Generated employee_id: {employee_id} for user {username}")
                 
-                # Insert or update user
-                cursor.execute("""
+                # Insert or update user (role and level stay as they are while
+                # an admin change is still being written to LDAP)
+                cursor.execute(f"""
                     INSERT INTO users (username, ldap_dn, role, authorization_level, employee_id)
                     VALUES (%s, %s, %s, %s, %s)
                     ON CONFLICT (username) DO UPDATE SET
                         ldap_dn = EXCLUDED.ldap_dn,
-                        role = EXCLUDED.role,
-                        authorization_level = EXCLUDED.authorization_level,
+                        role = CASE WHEN {LDAP_WRITE_PENDING} THEN users.role ELSE EXCLUDED.role END,
+                        authorization_level = CASE WHEN {LDAP_WRITE_PENDING}
+                            THEN users.authorization_level ELSE EXCLUDED.authorization_level END,
                         -- Preserve existing employee_id if already set; otherwise take incoming
                         employee_id = COALESCE(users.employee_id, EXCLUDED.employee_id),
+                        -- Outstanding access tokens carry role/level claims; mark them stale
+                        claims_version = users.claims_version + CASE
+                            WHEN NOT {LDAP_WRITE_PENDING}
+                             AND (users.role IS DISTINCT FROM EXCLUDED.role
+                              OR users.authorization_level IS DISTINCT FROM EXCLUDED.authorization_level)
+                            THEN 1 ELSE 0 END,
                         updated_at = NOW()
-                    RETURNING id
+                    RETURNING id, role, authorization_level
                 """, (username, ldap_dn, role, authorization_level, employee_id))
                 result = cursor.fetchone()
                 user_id = result[0] if result else 0
+                if result:
+                    role, authorization_level = result[1], result[2]
                 
                 # Add to role-specific table if needed
                 try:
@@ -362,6 +761,9 @@ class DatabaseService:
                     # Don't fail the entire transaction for role-specific table issues
                     # Just log the error and continue
                 
+                if admin_action:
+                    self.insert_admin_action(cursor, **admin_action)
+                
                 conn.commit()
                 logger.info(f"Successfully upserted user {username} with ID {user_id} and employee_id {employee_id}")
                 return user_id
@@ -373,12 +775,6 @@ class DatabaseService:
                     logger.error(f"Failed to rollback transaction: {rollback_error}")
             logger.error(f"Failed to upsert user: {e}")
             raise
-        finally:
-            if conn:
-                try:
-                    conn.autocommit = True
-                except Exception as autocommit_error:
-                    logger.error(f"Failed to set autocommit: {autocommit_error}")
 
     def _upsert_operator(self, cursor, username: str, employee_id: str, access_level: int):
         """Upsert operator in operators table"""
@@ -410,6 +806,303 @@ class DatabaseService:
             logger.error(f"Failed to upsert personnel: {e}")
             raise
 
+    def reserve_sequence_values(self, sequence: str, count: int, cursor=None) -> List[int]:
+        """Take `count` values from a sequence in one round trip.
+
+        With `cursor` the values are taken inside the caller's transaction
+        (nextval is not transactional, so a later rollback keeps them taken).
+        """
+        if cursor is not None:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", (sequence, count))
+            return [row[0] for row in cursor.fetchall()]
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot reserve values from {sequence}: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", (sequence, count))
+                values = [row[0] for row in cursor.fetchall()]
+                conn.commit()
+                return values
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to reserve values from {sequence}: {e}")
+            raise
+
+    def insert_imported_users(self, users: List[Dict[str, Any]], admin_username: str, ip_address: str = None):
+        """Write users created by a bulk import in one transaction.
+
+        `users` are dicts with username, ldap_dn, role, authorization_level and
+        employee_id.  The users rows, the operators/personnel rows and one
+        create_user audit record per user are each inserted with a single
+        multi-row statement.
+        """
+        if not users:
+            return
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot insert {len(users)} imported users: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with self.transaction(conn), conn.cursor() as cursor:
+                execute_values(cursor, """
+                    INSERT INTO users (username, ldap_dn, role, authorization_level, employee_id)
+                    VALUES %s
+                    ON CONFLICT (username) DO UPDATE SET
+                        ldap_dn = EXCLUDED.ldap_dn,
+                        role = EXCLUDED.role,
+                        authorization_level = EXCLUDED.authorization_level,
+                        employee_id = COALESCE(users.employee_id, EXCLUDED.employee_id),
+                        claims_version = users.claims_version + CASE
+                            WHEN users.role IS DISTINCT FROM EXCLUDED.role
+                              OR users.authorization_level IS DISTINCT FROM EXCLUDED.authorization_level
+                            THEN 1 ELSE 0 END,
+                        updated_at = NOW()
+                """, [
+                    (user['username'], user['ldap_dn'], user['role'], user['authorization_level'], user['employee_id'])
+                    for user in users
+                ])
+                for role, table in (('operator', 'operators'), ('personnel', 'personnel')):
+                    rows = [
+                        (user['username'], user['employee_id'], user['username'], user['authorization_level'])
+                        for user in users if user['role'] == role
+                    ]
+                    if rows:
+                        execute_values(cursor, f"""
+                            INSERT INTO {table} (username, employee_id, full_name, access_level)
+                            VALUES %s
+                            ON CONFLICT (username) DO UPDATE SET
+                                employee_id = EXCLUDED.employee_id,
+                                access_level = EXCLUDED.access_level,
+                                updated_at = NOW()
+                        """, rows)
+                execute_values(cursor, """
+                    INSERT INTO admin_actions (admin_username, target_username, action_type, action_details, ip_address)
+                    VALUES %s
+                """, [
+                    (admin_username, user['username'], 'create_user', psycopg2.extras.Json({
+                        "role": user['role'],
+                        "authorization_level": user['authorization_level'],
+                        "employee_id": user['employee_id'],
+                        "bulk_import": True
+                    }), ip_address)
+                    for user in users
+                ])
+                conn.commit()
+                logger.info(f"Inserted {len(users)} imported users")
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to insert imported users: {e}")
+            raise
+
+    def _lock_users(self, cursor, usernames: List[str]) -> Dict[str, tuple]:
+        """Lock the users rows of a bulk change; username -> (role, authorization_level, employee_id)"""
+        cursor.execute("""
+            SELECT username, role, authorization_level, employee_id
+            FROM users
+            WHERE username = ANY(%s)
+            ORDER BY username
+            FOR UPDATE
+        """, (list(usernames),))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def _write_bulk_change(self, cursor, action_type: str, batch_id: str, admin_username: str, ip_address: str,
+                           changed: List[tuple]):
+        """Audit records and outbox rows for a bulk change: `changed` is (username, details, ldap_changes)"""
+        execute_values(cursor, """
+            INSERT INTO admin_actions (admin_username, target_username, action_type, action_details, ip_address)
+            VALUES %s
+        """, [
+            (admin_username, username, action_type, psycopg2.extras.Json(dict(details, batch_id=batch_id)), ip_address)
+            for username, details, _ in changed
+        ])
+        execute_values(cursor, """
+            INSERT INTO ldap_outbox (idempotency_key, username, changes)
+            VALUES %s
+            ON CONFLICT (idempotency_key) DO NOTHING
+        """, [
+            (f"{action_type}:{username}:{batch_id}", username, psycopg2.extras.Json(ldap_changes))
+            for username, _, ldap_changes in changed
+        ])
+
+    def apply_role_changes(self, changes: Dict[str, str], admin_username: str,
+                           ip_address: str = None) -> Dict[str, Dict[str, Any]]:
+        """Move many users to new roles in one transaction.
+
+        `changes` maps username -> new role.  Each moved user gets a new
+        employee ID for their role (one reservation per role), moves between
+        the operators and personnel tables and has their token epoch bumped;
+        the change_role audit records (sharing a batch_id) and the outbox
+        rows for employeeType/employeeNumber are written in the same
+        transaction with multi-row statements.  Returns username -> outcome:
+        status changed (with old/new role and employee ID and token_epoch),
+        unchanged or not_found.
+        """
+        if not changes:
+            return {}
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot change the role of {len(changes)} users: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with self.transaction(conn), conn.cursor() as cursor:
+                current = self._lock_users(cursor, list(changes))
+                outcomes = {}
+                moves = {}
+                for username, new_role in changes.items():
+                    if username not in current:
+                        outcomes[username] = {"status": "not_found"}
+                    elif current[username][0] == new_role:
+                        outcomes[username] = {"status": "unchanged"}
+                    else:
+                        moves.setdefault(new_role, []).append(username)
+                if not moves:
+                    conn.rollback()
+                    return outcomes
+                
+                for new_role, usernames in moves.items():
+                    for username, employee_id in zip(usernames, self.employee_ids.take(new_role, len(usernames), cursor)):
+                        old_role, _, old_employee_id = current[username]
+                        outcomes[username] = {
+                            "status": "changed",
+                            "old_role": old_role,
+                            "new_role": new_role,
+                            "old_employee_id": old_employee_id,
+                            "new_employee_id": employee_id
+                        }
+                moved = [username for username, outcome in outcomes.items() if outcome["status"] == "changed"]
+                
+                epochs = execute_values(cursor, """
+                    UPDATE users SET
+                        role = v.role,
+                        employee_id = v.employee_id,
+                        claims_version = users.claims_version + 1,
+                        token_epoch = users.token_epoch + 1,
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v(username, role, employee_id)
+                    WHERE users.username = v.username
+                    RETURNING users.username, users.token_epoch
+                """, [(username, outcomes[username]["new_role"], outcomes[username]["new_employee_id"]) for username in moved],
+                    fetch=True)
+                for username, token_epoch in epochs:
+                    outcomes[username]["token_epoch"] = token_epoch
+                
+                for role, table in (('operator', 'operators'), ('personnel', 'personnel')):
+                    leaving = [username for username in moved if current[username][0] == role]
+                    if leaving:
+                        cursor.execute(f"DELETE FROM {table} WHERE username = ANY(%s)", (leaving,))
+                    rows = [
+                        (username, outcomes[username]["new_employee_id"], username, current[username][1])
+                        for username in moved if outcomes[username]["new_role"] == role
+                    ]
+                    if rows:
+                        execute_values(cursor, f"""
+                            INSERT INTO {table} (username, employee_id, full_name, access_level)
+                            VALUES %s
+                            ON CONFLICT (username) DO UPDATE SET
+                                employee_id = EXCLUDED.employee_id,
+                                access_level = EXCLUDED.access_level,
+                                updated_at = NOW()
+                        """, rows)
+                
+                self._write_bulk_change(cursor, 'change_role', uuid.uuid4().hex, admin_username, ip_address, [
+                    (username,
+                     {key: outcomes[username][key] for key in ("old_role", "new_role", "old_employee_id", "new_employee_id")},
+                     {"employeeType": [outcomes[username]["new_role"]], "employeeNumber": [outcomes[username]["new_employee_id"]]})
+                    for username in moved
+                ])
+                conn.commit()
+                logger.info(f"Changed the role of {len(moved)} users")
+                return outcomes
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to change roles: {e}")
+            raise
+
+    def apply_authorization_levels(self, changes: Dict[str, int], admin_username: str,
+                                   ip_address: str = None) -> Dict[str, Dict[str, Any]]:
+        """Set the authorization level of many users in one transaction.
+
+        `changes` maps username -> level.  The users, operators and personnel
+        rows, token epochs, change_authorization_level audit records and the
+        outbox rows for the LDAP description are written with multi-row
+        statements.  Returns username -> outcome as apply_role_changes().
+        """
+        if not changes:
+            return {}
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot change the authorization level of {len(changes)} users: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with self.transaction(conn), conn.cursor() as cursor:
+                current = self._lock_users(cursor, list(changes))
+                outcomes = {}
+                for username, level in changes.items():
+                    if username not in current:
+                        outcomes[username] = {"status": "not_found"}
+                    elif current[username][1] == level:
+                        outcomes[username] = {"status": "unchanged"}
+                    else:
+                        outcomes[username] = {"status": "changed", "old_level": current[username][1], "new_level": level}
+                rows = [(username, outcome["new_level"]) for username, outcome in outcomes.items() if outcome["status"] == "changed"]
+                if not rows:
+                    conn.rollback()
+                    return outcomes
+                
+                epochs = execute_values(cursor, """
+                    UPDATE users SET
+                        authorization_level = v.level,
+                        claims_version = users.claims_version + 1,
+                        token_epoch = users.token_epoch + 1,
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v(username, level)
+                    WHERE users.username = v.username
+                    RETURNING users.username, users.token_epoch
+                """, rows, fetch=True)
+                for username, token_epoch in epochs:
+                    outcomes[username]["token_epoch"] = token_epoch
+                for table in ('operators', 'personnel'):
+                    execute_values(cursor, f"""
+                        UPDATE {table} SET access_level = v.level, updated_at = NOW()
+                        FROM (VALUES %s) AS v(username, level)
+                        WHERE {table}.username = v.username
+                    """, rows)
+                
+                self._write_bulk_change(cursor, 'change_authorization_level', uuid.uuid4().hex, admin_username, ip_address, [
+                    (username, {"old_level": outcomes[username]["old_level"], "new_level": level},
+                     {"description": [f"auth_level:{level}"]})
+                    for username, level in rows
+                ])
+                conn.commit()
+                logger.info(f"Changed the authorization level of {len(rows)} users")
+                return outcomes
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to change authorization levels: {e}")
+            raise
+
     def record_admin_action(self, admin_username: str, action_type: str, target_username: str = None,
                           action_details: Dict = None, ip_address: str = None):
         """Record an admin action for audit trail"""
@@ -419,17 +1112,34 @@ class DatabaseService:
                 logger.error(f"Cannot record admin action for {admin_username}: database connection failed.")
                 return
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO admin_actions (admin_username, target_username, action_type, action_details, ip_address)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (admin_username, target_username, action_type, 
-                      psycopg2.extras.Json(action_details) if action_details else None, ip_address))
+                self.insert_admin_action(cursor, admin_username, action_type, target_username, action_details, ip_address)
                 conn.commit()
                 logger.info(f"Recorded admin action: {action_type} by {admin_username}")
         except Exception as e:
             logger.error(f"Failed to record admin action: {e}")
             raise
 
+    def insert_admin_action(self, cursor, admin_username: str, action_type: str, target_username: str = None,
+                            action_details: Dict = None, ip_address: str = None):
+        """Write an audit record as part of the caller's transaction"""
+        cursor.execute("""
+            INSERT INTO admin_actions (admin_username, target_username, action_type, action_details, ip_address)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (admin_username, target_username, action_type, 
+              psycopg2.extras.Json(action_details) if action_details else None, ip_address))
+
+    def enqueue_ldap_change(self, cursor, idempotency_key: str, username: str, changes: Dict[str, List[str]]):
+        """Record an LDAP modify for the outbox relay as part of the caller's transaction.
+
+        `changes` maps attribute names to their new values (replace
+        semantics).  A key that is already queued is ignored.
+        """
+        cursor.execute("""
+            INSERT INTO ldap_outbox (idempotency_key, username, changes)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (idempotency_key) DO NOTHING
+        """, (idempotency_key, username, psycopg2.extras.Json(changes)))
+
     def get_login_attempts(self, username: str = None, limit: int = 100) -> List[Dict[str, Any]]:
         """Get login attempts for a user or all users"""
         try:
@@ -508,20 +1218,21 @@ class DatabaseService:
             if conn is None:
                 logger.error(f"Cannot sync LDAP users to database: database connection failed.")
                 return
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 for user in ldap_users:
                     # Preserve existing employee_id if present; use LDAP employee_id only when missing
                     cursor.execute("SELECT employee_id FROM users WHERE username = %s", (user.get('uid'),))
                     existing_emp = cursor.fetchone()
                     effective_employee_id = existing_emp[0] if existing_emp and existing_emp[0] else user.get('employee_id')
 
-                    cursor.execute("""
+                    cursor.execute(f"""
                         INSERT INTO users (username, ldap_dn, role, authorization_level, employee_id, is_active)
                         VALUES (%s, %s, %s, %s, %s, true)
                         ON CONFLICT (username) DO UPDATE SET
                             ldap_dn = EXCLUDED.ldap_dn,
-                            role = EXCLUDED.role,
-                            authorization_level = EXCLUDED.authorization_level,
+                            role = CASE WHEN {LDAP_WRITE_PENDING} THEN users.role ELSE EXCLUDED.role END,
+                            authorization_level = CASE WHEN {LDAP_WRITE_PENDING}
+                                THEN users.authorization_level ELSE EXCLUDED.authorization_level END,
                             employee_id = COALESCE(users.employee_id, EXCLUDED.employee_id),
                             is_active = true,
                             updated_at = NOW()
@@ -647,18 +1358,7 @@ class DatabaseService:
                 logger.error(f"Cannot completely remove user {username}: database connection failed.")
                 return
             
-            # Get a fresh connection to avoid transaction issues
-            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
-                logger.info(f"Resetting connection for user removal {username} due to transaction status")
-                conn.close()
-                conn = self.get_connection()
-                if conn is None:
-                    logger.error(f"Cannot get fresh connection for user removal {username}")
-                    return
-            
-            conn.autocommit = False  # Start transaction
-            
-            with conn.cursor() as cursor:
+            with self.transaction(conn), conn.cursor() as cursor:
                 # Delete related data first (due to foreign key constraints)
                 cursor.execute("DELETE FROM login_attempts WHERE username = %s", (username,))
                 cursor.execute("DELETE FROM jwt_sessions WHERE username = %s", (username,))
@@ -682,12 +1382,239 @@ class DatabaseService:
                     logger.error(f"Failed to rollback transaction: {rollback_error}")
             logger.error(f"Failed to completely remove user from database: {e}")
             raise
-        finally:
+
+    def create_job(self, job_type: str, params: Dict[str, Any], created_by: str = None) -> int:
+        """Queue a background admin job; returns its id"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot queue {job_type} job: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO admin_jobs (job_type, params, created_by)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                """, (job_type, psycopg2.extras.Json(params), created_by))
+                job_id = cursor.fetchone()[0]
+                conn.commit()
+                return job_id
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to queue {job_type} job: {e}")
+            raise
+
+    def claim_job(self, worker_id: str, job_types: List[str], stale_seconds: float) -> Optional[Dict[str, Any]]:
+        """Claim the oldest queued job, or a running one whose worker stopped heartbeating.
+
+        FOR UPDATE SKIP LOCKED lets every replica poll the same table without
+        two workers ever claiming the same job.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                return None
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    UPDATE admin_jobs SET
+                        status = 'running',
+                        worker_id = %s,
+                        attempts = attempts + 1,
+                        progress_done = 0,
+                        started_at = NOW(),
+                        heartbeat_at = NOW()
+                    WHERE id = (
+                        SELECT id FROM admin_jobs
+                        WHERE job_type = ANY(%s)
+                          AND (status = 'queued'
+                               OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)))
+                        ORDER BY id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, job_type, params, attempts, created_by
+                """, (worker_id, list(job_types), stale_seconds))
+                job = cursor.fetchone()
+                conn.commit()
+                return dict(job) if job else None
+        except Exception as e:
             if conn:
                 try:
-                    conn.autocommit = True
-                except Exception as autocommit_error:
-                    logger.error(f"Failed to set autocommit: {autocommit_error}")
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to claim job: {e}")
+            return None
+
+    def update_job_progress(self, job_id: int, worker_id: str, done: int = None, total: int = None) -> bool:
+        """Record progress (and a heartbeat); False once the job is no longer this worker's"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                return True
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE admin_jobs SET
+                        progress_done = COALESCE(%s, progress_done),
+                        progress_total = COALESCE(%s, progress_total),
+                        heartbeat_at = NOW()
+                    WHERE id = %s AND worker_id = %s AND status = 'running'
+                """, (done, total, job_id, worker_id))
+                owned = cursor.rowcount == 1
+                conn.commit()
+                return owned
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.warning(f"Failed to update progress of job {job_id}: {e}")
+            return True
+
+    def finish_job(self, job_id: int, worker_id: str, status: str, result: Any = None, error: str = None) -> bool:
+        """Store a job's outcome unless another worker has taken it over"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot finish job {job_id}: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE admin_jobs SET
+                        status = %s,
+                        result = %s,
+                        error = %s,
+                        finished_at = NOW(),
+                        heartbeat_at = NOW()
+                    WHERE id = %s AND worker_id = %s AND status = 'running'
+                """, (status, psycopg2.extras.Json(result) if result is not None else None, error, job_id, worker_id))
+                finished = cursor.rowcount == 1
+                conn.commit()
+                return finished
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to finish job {job_id}: {e}")
+            raise
+
+    def get_ldap_outbox_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """LDAP changes the outbox relay gave up on, oldest first"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot get LDAP outbox dead letters: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT o.id, o.username, o.changes, o.attempts, o.last_error, o.created_at, o.dead_at,
+                           EXISTS (SELECT 1 FROM ldap_outbox later
+                                   WHERE later.username = o.username AND later.id > o.id) AS superseded
+                    FROM ldap_outbox o
+                    WHERE o.applied_at IS NULL AND o.dead_at IS NOT NULL
+                    ORDER BY o.id
+                    LIMIT %s
+                """, (limit,))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to get LDAP outbox dead letters: {e}")
+            raise
+
+    def resolve_ldap_outbox_dead_letter(self, row_id: int, retry: bool, admin_username: str,
+                                        ip_address: str = None) -> Optional[str]:
+        """Requeue (`retry`) or discard a dead-lettered outbox row, with an audit record.
+
+        Returns the row's username, or None if it is not a dead letter.  A
+        discarded row counts as applied, so the next login or sync takes the
+        user's role and level from LDAP again.  Retrying a row that a later
+        change to the same user superseded raises OutboxRowSupersededError.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot resolve LDAP outbox row {row_id}: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with self.transaction(conn), conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT username, changes FROM ldap_outbox
+                    WHERE id = %s AND applied_at IS NULL AND dead_at IS NOT NULL
+                    FOR UPDATE
+                """, (row_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                username, changes = row
+                if retry:
+                    cursor.execute("SELECT 1 FROM ldap_outbox WHERE username = %s AND id > %s LIMIT 1", (username, row_id))
+                    if cursor.fetchone():
+                        raise OutboxRowSupersededError(f"a later LDAP change to {username} supersedes outbox row {row_id}")
+                    cursor.execute("""
+                        UPDATE ldap_outbox SET dead_at = NULL, attempts = 0, next_attempt_at = NOW()
+                        WHERE id = %s
+                    """, (row_id,))
+                else:
+                    cursor.execute("""
+                        UPDATE ldap_outbox SET applied_at = NOW(), last_error = %s
+                        WHERE id = %s
+                    """, (f"discarded by {admin_username}", row_id))
+                self.insert_admin_action(cursor, admin_username,
+                                         "ldap_outbox_retry" if retry else "ldap_outbox_discard", username,
+                                         {"outbox_id": row_id, "changes": changes}, ip_address)
+                conn.commit()
+                return username
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to resolve LDAP outbox row {row_id}: {e}")
+            raise
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Get a background admin job's status, progress and result"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                logger.error(f"Cannot get job {job_id}: database connection failed.")
+                raise DatabaseUnavailableError("database connection failed")
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT id, job_type, params, status, progress_done, progress_total, result, error,
+                           attempts, created_by, created_at, started_at, heartbeat_at, finished_at
+                    FROM admin_jobs
+                    WHERE id = %s
+                """, (job_id,))
+                job = cursor.fetchone()
+                return dict(job) if job else None
+        except Exception as e:
+            if conn:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Failed to rollback transaction: {rollback_error}")
+            logger.error(f"Failed to get job {job_id}: {e}")
+            raise
 
 # Global database service instance
 db_service = DatabaseService() 
\ No newline at end of file
@@ -0,0 +1,142 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from ldap3 import Connection, MODIFY_REPLACE
+
+from database_service import db_service
+from ldap_pool import ldap_pool
+from ldap_search import paged_search, batched
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmployeeNumberReconciler:
+    """Keeps LDAP employeeNumber in line with users.employee_id in the background.
+
+    The database is authoritative for employee IDs.  Every
+    EMPLOYEE_NUMBER_RECONCILE_INTERVAL seconds the users subtree is paged
+    through (uid and employeeNumber only), each page's employee IDs are read
+    in one query, and the drifted entries are rewritten over a single
+    pipelined admin connection.  Runs are skipped while LDAP is unhealthy; a
+    fix that races an admin change is corrected by the next run.
+    """
+
+    def __init__(self):
+        self.interval = float(os.environ.get('EMPLOYEE_NUMBER_RECONCILE_INTERVAL', '600'))
+        self.pipeline_depth = int(os.environ.get('EMPLOYEE_NUMBER_RECONCILE_PIPELINE_DEPTH', '16'))
+        self._open_search: Optional[Callable[[], Connection]] = None
+        self._open_pipelined: Optional[Callable[[], Connection]] = None
+        self._base_dn: Optional[str] = None
+        self._on_fixed: Optional[Callable[[str], None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self.runs = 0
+        self.failures = 0
+        self.fixes_applied = 0
+        self.fix_failures = 0
+        self.last_run_seconds = None
+
+    def _fix(self, conn: Connection, drifted: List[Tuple[str, str, str]]) -> List[str]:
+        """Rewrite employeeNumber for (dn, uid, employee_id) entries, keeping several modifies in flight;
+        returns the uids fixed"""
+        fixed = []
+        in_flight = deque()
+
+        def collect_oldest():
+            uid, message_id = in_flight.popleft()
+            _, result = conn.get_response(message_id, timeout=ldap_pool.receive_timeout)
+            if result["result"] == 0:
+                fixed.append(uid)
+            else:
+                self.fix_failures += 1
+                logger.warning(f"Could not fix LDAP employeeNumber for {uid}: {result['description']}")
+
+        for dn, uid, employee_id in drifted:
+            in_flight.append((uid, conn.modify(dn, {"employeeNumber": [(MODIFY_REPLACE, [employee_id])]})))
+            if len(in_flight) >= self.pipeline_depth:
+                collect_oldest()
+        while in_flight:
+            collect_oldest()
+        return fixed
+
+    def reconcile(self) -> int:
+        """One full pass over the directory; returns the number of entries fixed"""
+        search_conn = self._open_search()
+        write_conn = None
+        fixed = 0
+        try:
+            records = paged_search(search_conn, self._base_dn, "(objectClass=inetOrgPerson)", ["uid", "employeeNumber"])
+            for page in batched(records):
+                employee_ids = db_service.get_employee_ids([record["uid"] for record in page])
+                drifted = [
+                    (record["dn"], record["uid"], employee_ids[record["uid"]])
+                    for record in page
+                    if employee_ids.get(record["uid"]) and employee_ids[record["uid"]] != record["employeeNumber"]
+                ]
+                if drifted:
+                    if write_conn is None:
+                        write_conn = self._open_pipelined()
+                    for uid in self._fix(write_conn, drifted):
+                        fixed += 1
+                        if self._on_fixed is not None:
+                            self._on_fixed(uid)
+        finally:
+            for conn in (search_conn, write_conn):
+                if conn is not None:
+                    try:
+                        conn.unbind()
+                    except Exception:
+                        pass
+        self.fixes_applied += fixed
+        if fixed:
+            logger.info(f"Fixed LDAP employeeNumber drift for {fixed} users")
+        return fixed
+
+    def request_run(self):
+        """Reconcile now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        # First pass soon after startup, then every interval (jittered across replicas)
+        self._wake.wait(min(self.interval, 60) * random.uniform(0.5, 1.0))
+        while True:
+            self._wake.clear()
+            if ldap_pool.is_healthy():
+                started = time.monotonic()
+                try:
+                    self.reconcile()
+                    self.runs += 1
+                    self.last_run_seconds = round(time.monotonic() - started, 2)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning(f"employeeNumber reconciliation failed: {e}")
+            self._wake.wait(self.interval * random.uniform(0.9, 1.1))
+
+    def start(self, open_search: Callable[[], Connection], open_pipelined: Callable[[], Connection], base_dn: str,
+              on_fixed: Callable[[str], None] = None):
+        """Reconcile in the background (idempotent); `on_fixed(uid)` runs for every entry rewritten"""
+        self._open_search = open_search
+        self._open_pipelined = open_pipelined
+        self._base_dn = base_dn
+        self._on_fixed = on_fixed
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="employee-number-reconciler", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "fixes_applied": self.fixes_applied,
+            "fix_failures": self.fix_failures,
+            "last_run_seconds": self.last_run_seconds
+        }
+
+# Global employeeNumber reconciler instance
+employee_number_reconciler = EmployeeNumberReconciler()
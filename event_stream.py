@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, FrozenSet, Optional, Set, Tuple
+import logging
+
+from invalidation_bus import USER_DELETED, LOCKOUT_CHANGED, TOKENS_REVOKED, TOKEN_EPOCH_BUMPED, ROLE_CHANGED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Server-sent event names
+LOCKED = 'locked'
+LOCKOUT_EXPIRED = 'lockout_expired'
+SESSION_REVOKED = 'session_revoked'
+SESSION_EXPIRED = 'session_expired'
+ROLE_CHANGED_EVENT = 'role_changed'
+RESYNC = 'resync'  # events may have been missed; the client should check again
+
+# Invalidation bus kind -> event sent to the user's subscribers
+BUS_EVENTS = {
+    LOCKOUT_CHANGED: LOCKOUT_CHANGED,
+    ROLE_CHANGED: ROLE_CHANGED_EVENT,
+    TOKENS_REVOKED: SESSION_REVOKED,
+    TOKEN_EPOCH_BUMPED: SESSION_REVOKED,
+    USER_DELETED: SESSION_REVOKED
+}
+
+SESSION_EVENTS = frozenset({ROLE_CHANGED_EVENT, SESSION_REVOKED, RESYNC})
+LOCKOUT_EVENTS = frozenset({LOCKOUT_CHANGED, RESYNC})
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+class EventHub:
+    """Pushes lockout and session events to browsers as server-sent events.
+
+    The hub subscribes to the invalidation bus, so an event published by any
+    replica reaches every subscriber.  A subscriber is one asyncio queue
+    and one suspended generator on the event loop: no thread, no polling,
+    just a keep-alive comment every EVENT_STREAM_KEEPALIVE seconds, so
+    thousands of idle streams are cheap.  Bus callbacks arrive on other
+    threads and are handed to the loop with call_soon_threadsafe.  When the
+    bus may have missed events every stream is sent `resync`.  Lockout
+    streams are public, so they have their own, smaller pool
+    (EVENT_STREAM_MAX_LOCKOUT_SUBSCRIBERS) inside the overall cap and
+    cannot crowd out signed-in users' session streams.
+    """
+
+    def __init__(self):
+        self.keepalive = float(os.environ.get('EVENT_STREAM_KEEPALIVE', '25'))
+        self.max_subscribers = int(os.environ.get('EVENT_STREAM_MAX_SUBSCRIBERS', '10000'))
+        self.max_lockout_subscribers = int(os.environ.get('EVENT_STREAM_MAX_LOCKOUT_SUBSCRIBERS', '1000'))
+        self._subscribers: Dict[str, Set[Tuple[asyncio.Queue, FrozenSet[str]]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers = 0
+        self.lockout_subscribers = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def accepting(self, lockout: bool = False) -> bool:
+        if lockout and self.lockout_subscribers >= self.max_lockout_subscribers:
+            return False
+        return self.subscribers < self.max_subscribers
+
+    @contextmanager
+    def _subscription(self, username: str, events: FrozenSet[str]):
+        # Runs on the event loop, like _deliver, so the registry needs no lock
+        self._loop = asyncio.get_running_loop()
+        entry = (asyncio.Queue(maxsize=8), events)
+        self._subscribers.setdefault(username, set()).add(entry)
+        lockout = events is LOCKOUT_EVENTS
+        self.subscribers += 1
+        self.lockout_subscribers += lockout
+        try:
+            yield entry[0]
+        finally:
+            self.subscribers -= 1
+            self.lockout_subscribers -= lockout
+            entries = self._subscribers.get(username)
+            if entries is not None:
+                entries.discard(entry)
+                if not entries:
+                    del self._subscribers[username]
+
+    def _deliver(self, username: Optional[str], event: str):
+        if username is None:
+            entries = [entry for user_entries in self._subscribers.values() for entry in user_entries]
+        else:
+            entries = list(self._subscribers.get(username, ()))
+        for queue, events in entries:
+            if event not in events:
+                continue
+            try:
+                queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                # A subscriber this far behind re-checks on the events it has
+                self.dropped += 1
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        event = BUS_EVENTS.get(kind)
+        if event is None or username is None or self._loop is None or username not in self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._deliver, username, event)
+
+    def on_flush(self):
+        if self._loop is not None and self._subscribers:
+            self._loop.call_soon_threadsafe(self._deliver, None, RESYNC)
+
+    async def _next_event(self, queue: asyncio.Queue, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def session_events(self, username: str, expires_at: float) -> AsyncIterator[str]:
+        """Stream role_changed / resync events until the session is revoked or the access token expires"""
+        with self._subscription(username, SESSION_EVENTS) as queue:
+            while True:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    yield format_event(SESSION_EXPIRED, {"username": username})
+                    return
+                event = await self._next_event(queue, min(self.keepalive, remaining))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event, {"username": username})
+                if event == SESSION_REVOKED:
+                    return
+
+    async def lockout_events(self, username: str,
+                             remaining_time: Callable[[], Awaitable[Optional[int]]]) -> AsyncIterator[str]:
+        """Stream `locked` (with the seconds left) and, once the lockout is over, `lockout_expired`.
+
+        `remaining_time()` reads the lockout from the database; it is called
+        when the stream starts, when the lockout should have ended and when
+        an admin changes it, never on a timer.
+        """
+        with self._subscription(username, LOCKOUT_EVENTS) as queue:
+            loop = asyncio.get_running_loop()
+            remaining = await remaining_time()
+            while remaining:
+                yield format_event(LOCKED, {"username": username, "remaining_lockout_time": remaining})
+                deadline = loop.time() + remaining
+                while loop.time() < deadline:
+                    if await self._next_event(queue, min(self.keepalive, deadline - loop.time())) is not None:
+                        break
+                    yield ": keep-alive\n\n"
+                remaining = await remaining_time()
+            yield format_event(LOCKOUT_EXPIRED, {"username": username})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self.subscribers,
+            "lockout_subscribers": self.lockout_subscribers,
+            "users": len(self._subscribers),
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+# Global server-sent event hub instance
+event_hub = EventHub()
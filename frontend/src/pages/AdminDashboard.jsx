@@ -25,6 +25,7 @@ const AdminDashboard = () => {
   const [showPasswordReset, setShowPasswordReset] = useState(false);
   const [showUserRegistration, setShowUserRegistration] = useState(false);
   const [selectedUser, setSelectedUser] = useState(null);
+  const [deadLetters, setDeadLetters] = useState([]);
 
   // Function to get default authorization level based on role
   const getDefaultAuthLevel = (role) => {
@@ -51,21 +52,28 @@ const AdminDashboard = () => {
       navigate("/login", { replace: true });
       return;
     }
-    // Decode JWT to check role (call backend for verification)
-    const formData = new URLSearchParams();
-    formData.append("token", token);
-    fetch(`${getApiBaseUrl()}/verify-token`, {
-      method: "POST",
-      body: formData,
+    // One request verifies the admin token and loads the dashboard data
+    fetch(`${getApiBaseUrl()}/admin/dashboard`, {
       headers: { Authorization: `Bearer ${token}` },
     })
-      .then((res) => res.json())
-      .then((data) => {
-        if (!data.valid || data.data.role !== "admin") {
+      .then((res) => {
+        if (res.status === 403) {
           navigate("/protected", { replace: true });
-        } else {
+          return null;
+        }
+        if (!res.ok) throw new Error("Not authorized");
+        return res.json();
+      })
+      .then((data) => {
+        if (!data) return;
+        setDeadLetters(data.ldap_outbox_dead_letters || []);
+        if (!data.users || data.users.more) {
+          // Section failed, or more users than one dashboard page: load the full list
           fetchUsers(token);
+          return;
         }
+        setUsers(data.users.items);
+        setLoading(false);
       })
       .catch(() => {
         navigate("/login", { replace: true });
@@ -112,6 +120,21 @@ const AdminDashboard = () => {
     }
   };
 
+  const handleDeadLetter = (id, action) => async () => {
+    const token = tokenManager.getAccessToken();
+    const res = await fetch(`${getApiBaseUrl()}/admin/ldap-outbox/dead-letters/${id}/${action}`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    const data = await res.json();
+    if (res.ok) {
+      setSuccess(data.message);
+      setDeadLetters((letters) => letters.filter((letter) => letter.id !== id));
+    } else {
+      setError(data.detail || `Failed to ${action} LDAP change ${id}`);
+    }
+  };
+
   const handlePasswordReset = (uid) => {
     setSelectedUser(uid);
     setShowPasswordReset(true);
@@ -342,6 +365,20 @@ const AdminDashboard = () => {
         
         {error && <div className="mb-4 p-2 bg-red-100 text-red-700 rounded">{error}</div>}
         {success && <div className="mb-4 p-2 bg-green-100 text-green-700 rounded">{success}</div>}
+        {deadLetters.length > 0 && (
+          <div className="mb-4 p-2 bg-yellow-100 text-yellow-800 rounded">
+            <div className="font-semibold">LDAP changes that could not be applied</div>
+            {deadLetters.map((letter) => (
+              <div key={letter.id} className="flex items-center gap-2 mt-1 text-sm">
+                <span>{letter.username}: {Object.keys(letter.changes).join(", ")} ({letter.last_error})</span>
+                {!letter.superseded && (
+                  <button className="bg-blue-600 text-white px-2 py-1 rounded hover:bg-blue-700" onClick={handleDeadLetter(letter.id, "retry")}>Retry</button>
+                )}
+                <button className="bg-gray-600 text-white px-2 py-1 rounded hover:bg-gray-700" onClick={handleDeadLetter(letter.id, "discard")}>Discard</button>
+              </div>
+            ))}
+          </div>
+        )}
         {loading ? (
           <div>Loading users...</div>
         ) : (
@@ -135,6 +135,28 @@ const Login = ({ onLoginSuccess }) => {
     checkLockoutStatus();
   }, []);
 
+  // While locked, let the server push the end of the lockout (also ends early if an admin unlocks)
+  useEffect(() => {
+    if (!isLocked || !username || typeof EventSource === "undefined") return;
+
+    const events = new EventSource(`${getApiBaseUrl()}/events/lockout/${encodeURIComponent(username)}`);
+    events.addEventListener("locked", (e) => {
+      const remainingTime = JSON.parse(e.data).remaining_lockout_time;
+      localStorage.setItem('lockout_end_time', (Date.now() + remainingTime * 1000).toString());
+      setLockoutCountdown(remainingTime);
+    });
+    events.addEventListener("lockout_expired", () => {
+      events.close();
+      setIsLocked(false);
+      setLockoutCountdown(0);
+      setLockoutMessage("");
+      setError(null);
+      localStorage.removeItem('locked_username');
+      localStorage.removeItem('lockout_end_time');
+    });
+    return () => events.close();
+  }, [isLocked, username]);
+
   // Countdown timer effect
   useEffect(() => {
     let timer;
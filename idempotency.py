@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from singleflight import SingleFlight
+from invalidation_bus import USER_CHANGED, USER_DELETED, TOKENS_REVOKED, TOKEN_EPOCH_BUMPED, ROLE_CHANGED
+
+class IdempotencyWindow:
+    """Share the result of an async call for a short window after it completes.
+
+    Concurrent calls for the same key are coalesced into one, and calls
+    repeated within `window_seconds` of a successful call get its result
+    without redoing the work.  Failures are shared with concurrent callers
+    but never remembered.  At most `max_entries` results are kept (LRU).
+
+    A result can belong to an `owner` (a username).  Invalidation-bus events
+    of the `invalidated_by` kinds for that owner drop its results, and a
+    call that was in flight when the event arrived is not remembered, so a
+    replay never hands out something the event has just made stale.
+    """
+
+    def __init__(self, name: str, window_seconds: float, max_entries: int,
+                 invalidated_by: Iterable[str] = ()):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.max_entries = max(1, max_entries)
+        self.invalidated_by = frozenset(invalidated_by)
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (stored_at, result, owner)
+        self._owned: Dict[Hashable, Set[Hashable]] = {}  # owner -> keys
+        self._invalidated: "OrderedDict[Hashable, float]" = OrderedDict()  # owner -> last invalidation
+        self._flushed_at = 0.0
+        # Bus events arrive on other threads
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(name)
+        self.replayed = 0
+        self.discarded = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._results.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self._owned.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._owned[entry[2]]
+
+    def _lookup(self, key: Hashable):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.window_seconds:
+                self._remove(key)
+                return None
+            return entry
+
+    async def _run_and_store(self, key: Hashable, owner: Optional[Hashable],
+                             func: Callable[..., Awaitable[Any]], *args) -> Any:
+        started = time.monotonic()
+        result = await func(*args)
+        with self._lock:
+            if self._flushed_at >= started or (owner is not None and self._invalidated.get(owner, 0.0) >= started):
+                return result
+            self._remove(key)
+            self._results[key] = (time.monotonic(), result, owner)
+            if owner is not None:
+                self._owned.setdefault(owner, set()).add(key)
+            while len(self._results) > self.max_entries:
+                self._remove(next(iter(self._results)))
+        return result
+
+    async def run(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args,
+                  owner: Optional[Hashable] = None) -> Any:
+        if self.window_seconds <= 0:
+            return await func(*args)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.replayed += 1
+            return entry[1]
+        return await self._flight.run(key, self._run_and_store, key, owner, func, *args)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def discard_owner(self, owner: Hashable):
+        """Drop every result of `owner`, including calls still in flight"""
+        with self._lock:
+            self._invalidated[owner] = time.monotonic()
+            self._invalidated.move_to_end(owner)
+            while len(self._invalidated) > self.max_entries:
+                self._invalidated.popitem(last=False)
+            for key in list(self._owned.get(owner, ())):
+                self._remove(key)
+                self.discarded += 1
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._owned.clear()
+            self._invalidated.clear()
+            # Anything still in flight may predate a missed event
+            self._flushed_at = time.monotonic()
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in self.invalidated_by and username is not None:
+            self.discard_owner(username)
+
+    def stats(self) -> Dict[str, Any]:
+        flight = self._flight.stats()
+        return {
+            "window_seconds": self.window_seconds,
+            "held_results": len(self._results),
+            "executed": flight["executed"],
+            "coalesced": flight["coalesced"],
+            "replayed": self.replayed,
+            "discarded": self.discarded
+        }
+
+# Global idempotency window for /refresh, keyed by refresh-token jti and owned
+# by the user, so logout-all, role changes and epoch bumps end replays at once
+refresh_idempotency = IdempotencyWindow(
+    'refresh',
+    float(os.environ.get('REFRESH_IDEMPOTENCY_WINDOW_SECONDS', '5')),
+    int(os.environ.get('REFRESH_IDEMPOTENCY_MAX_ENTRIES', '10000')),
+    (USER_CHANGED, USER_DELETED, TOKENS_REVOKED, TOKEN_EPOCH_BUMPED, ROLE_CHANGED)
+)
@@ -0,0 +1,168 @@
+import os
+import json
+import random
+import select
+import threading
+import uuid
+from typing import Callable, Dict, Any, Optional
+import logging
+
+import psycopg2
+from psycopg2 import extensions
+
+from database_service import db_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Event kinds published by admin mutations
+USER_CHANGED = 'user'          # role, authorization level or employee id changed
+USER_DELETED = 'user_deleted'
+LOCKOUT_CHANGED = 'lockout'    # account unlocked / lockout state reset
+TOKENS_REVOKED = 'tokens'      # refresh tokens revoked
+TOKEN_EPOCH_BUMPED = 'epoch'   # a user's access tokens were invalidated
+PASSWORD_CHANGED = 'password'  # password reset by an admin
+USERS_IMPORTED = 'import'      # users created by a bulk import
+USERS_SYNCED = 'sync'          # users re-synced from LDAP in bulk
+ROLE_CHANGED = 'role'          # a user's role changed (published alongside USER_CHANGED)
+
+class InvalidationBus:
+    """Cross-replica cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+    In-process caches subscribe with an `on_event(kind, username)` callback
+    and an `on_flush()` callback.  `publish()` applies an event locally at
+    once and sends it as a compact NOTIFY payload; a listener thread in every
+    replica applies events from the other replicas.  Whenever the listener
+    connection is lost (and again once it is re-established) every
+    subscriber is flushed, because events may have been missed in between.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get('CACHE_INVALIDATION_ENABLED', 'true').lower() == 'true'
+        self.channel = os.environ.get('CACHE_INVALIDATION_CHANNEL', 'cache_invalidation')
+        self.backoff_max = float(os.environ.get('CACHE_INVALIDATION_RECONNECT_MAX', '30'))
+        self.origin = uuid.uuid4().hex[:12]
+        self._subscribers: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listening = False
+        self.published = 0
+        self.received = 0
+        self.flushes = 0
+
+    def subscribe(self, name: str, on_event: Callable[[str, Optional[str]], None],
+                  on_flush: Optional[Callable[[], None]] = None):
+        """Register a local cache; re-subscribing under the same name replaces it"""
+        with self._lock:
+            self._subscribers[name] = (on_event, on_flush)
+
+    def is_listening(self) -> bool:
+        """True while events from other replicas are being received"""
+        return self._listening
+
+    def _dispatch(self, kind: str, username: Optional[str]):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for name, (on_event, _) in subscribers:
+            try:
+                on_event(kind, username)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber {name} failed on {kind} event: {e}")
+
+    def flush_all(self):
+        """Drop everything every subscriber has cached"""
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for name, (_, on_flush) in subscribers:
+            if on_flush is None:
+                continue
+            try:
+                on_flush()
+            except Exception as e:
+                logger.error(f"Invalidation subscriber {name} failed to flush: {e}")
+        self.flushes += 1
+
+    def publish(self, kind: str, username: Optional[str] = None):
+        """Invalidate locally and notify the other replicas; never raises"""
+        self._dispatch(kind, username)
+        if not self.enabled:
+            return
+        payload = json.dumps({"o": self.origin, "k": kind, "u": username}, separators=(',', ':'))
+        try:
+            db_service.notify(self.channel, payload)
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"Failed to publish {kind} invalidation for {username}: {e}")
+
+    def _handle(self, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation payload: {payload[:100]}")
+            return
+        if event.get("o") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(event.get("k"), event.get("u"))
+
+    def _listen_once(self):
+        conn = psycopg2.connect(**db_service.db_config, keepalives=1, keepalives_idle=30,
+                                keepalives_interval=10, keepalives_count=3)
+        try:
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self._listening = True
+            # Anything published before LISTEN took effect was missed
+            self.flush_all()
+            logger.info(f"Listening for cache invalidations on channel {self.channel}")
+
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    # Idle: make sure the connection is still alive
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._handle(conn.notifies.pop(0).payload)
+        finally:
+            self._listening = False
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _listen_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self._listen_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Cache invalidation listener disconnected, flushing local caches: {e}")
+            self.flush_all()
+            delay = min(self.backoff_max, 0.5 * (2 ** min(failures, 10))) * random.uniform(0.8, 1.2)
+            self._stop.wait(delay)
+
+    def start(self):
+        """Start the listener thread (idempotent)"""
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._listen_loop, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "listening": self._listening,
+            "subscribers": sorted(self._subscribers),
+            "published": self.published,
+            "received": self.received,
+            "flushes": self.flushes
+        }
+
+# Global invalidation bus instance
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict
+import logging
+
+from database_service import db_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class JobLostError(Exception):
+    """Raised inside a job whose claim was taken over by another worker"""
+    pass
+
+class JobProgress:
+    """Progress reporter handed to a job handler"""
+
+    def __init__(self, job_id: int, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+    def __call__(self, done: int, total: int = None):
+        """Record progress; raises JobLostError if another worker took the job over"""
+        if not db_service.update_job_progress(self.job_id, self.worker_id, done, total):
+            raise JobLostError(f"job {self.job_id} was claimed by another worker")
+
+class JobQueue:
+    """Small in-process worker pool for long-running admin operations.
+
+    Jobs are rows in admin_jobs.  Workers in every replica claim queued jobs
+    with SELECT ... FOR UPDATE SKIP LOCKED, so a job runs on exactly one
+    worker at a time, and keep a heartbeat on the row while it runs.  A job
+    whose heartbeat is older than JOB_STALE_SECONDS (its replica died) is
+    claimed again and re-run from the start, which is why every handler
+    must be idempotent; after JOB_MAX_ATTEMPTS claims it is failed instead.
+    Handlers take (params, progress) and return a JSON-serialisable result.
+    """
+
+    def __init__(self):
+        self.workers = int(os.environ.get('JOB_WORKERS', '2'))
+        self.poll_interval = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+        self.stale_seconds = float(os.environ.get('JOB_STALE_SECONDS', '120'))
+        self.max_attempts = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, Callable[[Dict[str, Any], JobProgress], Any]] = {}
+        self._running: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self.completed = 0
+        self.failed = 0
+        self.lost = 0
+
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any], JobProgress], Any]):
+        self._handlers[job_type] = handler
+
+    def submit(self, job_type: str, params: Dict[str, Any], created_by: str = None) -> int:
+        """Queue a job; returns its id (raises if the database is unavailable)"""
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job_id = db_service.create_job(job_type, params, created_by)
+        self._wake.set()
+        return job_id
+
+    def _run_job(self, job: Dict[str, Any], worker_id: str):
+        job_id = job['id']
+        if job['attempts'] > self.max_attempts:
+            db_service.finish_job(job_id, worker_id, 'failed',
+                                  error=f"Abandoned after {self.max_attempts} attempts")
+            self.failed += 1
+            return
+        with self._lock:
+            self._running[job_id] = worker_id
+        try:
+            logger.info(f"Worker {worker_id} running {job['job_type']} job {job_id} (attempt {job['attempts']})")
+            result = self._handlers[job['job_type']](job['params'] or {}, JobProgress(job_id, worker_id))
+            if db_service.finish_job(job_id, worker_id, 'succeeded', result=result):
+                self.completed += 1
+        except JobLostError as e:
+            self.lost += 1
+            logger.warning(f"Stopped {job['job_type']} job {job_id}: {e}")
+        except Exception as e:
+            # HTTPException from shared endpoint helpers carries its message in .detail
+            error = str(getattr(e, 'detail', None) or e)
+            logger.error(f"{job['job_type']} job {job_id} failed: {error}")
+            try:
+                if db_service.finish_job(job_id, worker_id, 'failed', error=error):
+                    self.failed += 1
+            except Exception as finish_error:
+                # The heartbeat stops with this attempt; the job is retried once it is stale
+                logger.error(f"Could not record failure of job {job_id}: {finish_error}")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def _work_loop(self, worker_id: str):
+        while True:
+            job = None
+            try:
+                job = db_service.claim_job(worker_id, list(self._handlers), self.stale_seconds)
+            except Exception as e:
+                logger.warning(f"Job worker {worker_id} could not poll for jobs: {e}")
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._run_job(job, worker_id)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed on job {job['id']}: {e}")
+
+    def _heartbeat_loop(self):
+        # Handlers report progress between steps; this covers long single steps
+        while True:
+            time.sleep(self.stale_seconds / 4)
+            with self._lock:
+                running = list(self._running.items())
+            for job_id, worker_id in running:
+                db_service.update_job_progress(job_id, worker_id)
+
+    def start(self):
+        """Start the workers and the heartbeat thread (idempotent)"""
+        if self._threads or self.workers <= 0:
+            return
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._work_loop, args=(f"{self.origin}-{n}",),
+                                      name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "lost": self.lost
+        }
+
+# Global job queue instance
+job_queue = JobQueue()
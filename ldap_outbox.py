@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+import psycopg2
+from psycopg2 import extensions
+
+from database_service import db_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# pg advisory lock held by the replica that relays the outbox
+OUTBOX_LOCK_KEY = 0x6c646170
+
+class LdapOutboxRelay:
+    """Applies the LDAP writes that admin mutations commit to ldap_outbox.
+
+    An admin endpoint commits its database change together with an outbox
+    row describing the matching LDAP modify and answers straight away; the
+    relay then replaces the listed attributes on the user's entry.  Rows
+    are applied in id order, and a failed row (retried with capped
+    exponential backoff) holds back the later rows of the same user so
+    changes never land out of order.  After LDAP_OUTBOX_MAX_ATTEMPTS
+    failures a row is dead-lettered: it stops holding back the user's later
+    rows and waits for an admin to retry or discard it.  Only one replica relays at a time:
+    it holds a session advisory lock on a dedicated connection, and another
+    replica takes over as soon as that connection goes away.  Rows carry a
+    unique idempotency key and replace semantics, so re-applying a row
+    after a crash is harmless.  A batch is applied over one LDAP connection,
+    opened again only after a failure.
+    """
+
+    def __init__(self):
+        self.poll_interval = float(os.environ.get('LDAP_OUTBOX_POLL_INTERVAL', '1'))
+        self.batch_size = int(os.environ.get('LDAP_OUTBOX_BATCH_SIZE', '100'))
+        self.retry_max = float(os.environ.get('LDAP_OUTBOX_RETRY_MAX', '300'))
+        self.retention = float(os.environ.get('LDAP_OUTBOX_RETENTION', '86400'))
+        self.max_attempts = max(1, int(os.environ.get('LDAP_OUTBOX_MAX_ATTEMPTS', '12')))
+        self._connect: Optional[Callable[[], Any]] = None
+        self._apply: Optional[Callable[[Any, str, Dict[str, List[str]]], bool]] = None
+        self._on_applied: Optional[Callable[[str], None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._last_cleanup = 0.0
+        self._ldap_conn = None
+        self.leader = False
+        self.applied = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.pending = None
+        self.dead = None
+        self.oldest_pending_seconds = None
+
+    def wake(self):
+        """Apply newly committed rows now instead of at the next poll"""
+        self._wake.set()
+
+    def _apply_row(self, cursor, row_id: int, username: str, changes: Dict[str, List[str]], attempts: int) -> bool:
+        """Apply one row; False when it is left for a retry (holding back the user's later rows)"""
+        try:
+            if self._ldap_conn is None:
+                self._ldap_conn = self._connect()
+            exists = self._apply(self._ldap_conn, username, changes)
+        except Exception as e:
+            self.failures += 1
+            self._close_ldap()
+            if attempts + 1 >= self.max_attempts:
+                cursor.execute("""
+                    UPDATE ldap_outbox SET attempts = attempts + 1, last_error = %s, dead_at = NOW()
+                    WHERE id = %s
+                """, (str(e)[:1000], row_id))
+                self.dead_lettered += 1
+                logger.error(f"LDAP outbox row {row_id} for {username} dead-lettered after {attempts + 1} attempts: {e}")
+                return True
+            delay = min(self.retry_max, 2 ** min(attempts, 16)) * random.uniform(0.8, 1.2)
+            cursor.execute("""
+                UPDATE ldap_outbox
+                SET attempts = attempts + 1, last_error = %s, next_attempt_at = NOW() + make_interval(secs => %s)
+                WHERE id = %s
+            """, (str(e)[:1000], delay, row_id))
+            logger.warning(f"LDAP outbox row {row_id} for {username} failed (attempt {attempts + 1}), retrying in {delay:.0f}s: {e}")
+            return False
+        cursor.execute("""
+            UPDATE ldap_outbox SET attempts = attempts + 1, applied_at = NOW(), last_error = %s
+            WHERE id = %s
+        """, (None if exists else "entry no longer exists", row_id))
+        self.applied += 1
+        if exists:
+            try:
+                self._on_applied(username)
+            except Exception as e:
+                logger.error(f"LDAP outbox callback failed for {username}: {e}")
+        return True
+
+    def _close_ldap(self):
+        if self._ldap_conn is not None:
+            try:
+                self._ldap_conn.unbind()
+            except Exception:
+                pass
+            self._ldap_conn = None
+
+    def _relay_batch(self, cursor) -> int:
+        """Apply due rows in id order; returns how many were settled (applied or dead-lettered)"""
+        cursor.execute("""
+            SELECT id, username, changes, attempts, next_attempt_at <= NOW()
+            FROM ldap_outbox
+            WHERE applied_at IS NULL AND dead_at IS NULL
+            ORDER BY id
+            LIMIT %s
+        """, (self.batch_size,))
+        held_back = set()
+        settled = 0
+        try:
+            for row_id, username, changes, attempts, due in cursor.fetchall():
+                if username in held_back:
+                    continue
+                if due and self._apply_row(cursor, row_id, username, changes, attempts):
+                    settled += 1
+                else:
+                    held_back.add(username)
+        finally:
+            self._close_ldap()
+        return settled
+
+    def _housekeeping(self, cursor):
+        cursor.execute("""
+            SELECT COUNT(*) FILTER (WHERE dead_at IS NULL),
+                   COUNT(*) FILTER (WHERE dead_at IS NOT NULL),
+                   EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE dead_at IS NULL))
+            FROM ldap_outbox WHERE applied_at IS NULL
+        """)
+        self.pending, self.dead, oldest = cursor.fetchone()
+        self.oldest_pending_seconds = round(float(oldest), 1) if oldest is not None else None
+        if time.monotonic() - self._last_cleanup >= 3600:
+            cursor.execute("DELETE FROM ldap_outbox WHERE applied_at < NOW() - make_interval(secs => %s)",
+                           (self.retention,))
+            self._last_cleanup = time.monotonic()
+
+    def _relay_once(self):
+        conn = psycopg2.connect(**db_service.db_config)
+        try:
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                while True:
+                    cursor.execute("SELECT pg_try_advisory_lock(%s)", (OUTBOX_LOCK_KEY,))
+                    if cursor.fetchone()[0]:
+                        break
+                    # Another replica is relaying; be ready to take over
+                    self._wake.wait(self.poll_interval * 5)
+                    self._wake.clear()
+                self.leader = True
+                logger.info("Relaying the LDAP outbox")
+                while True:
+                    # Drain while there is work, then wait for a wake-up or the next poll
+                    if self._relay_batch(cursor) >= self.batch_size:
+                        continue
+                    self._housekeeping(cursor)
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            self.leader = False
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                self._relay_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.warning(f"LDAP outbox relay disconnected: {e}")
+            time.sleep(min(30.0, 0.5 * (2 ** min(failures, 10))) * random.uniform(0.8, 1.2))
+
+    def start(self, connect: Callable[[], Any], apply: Callable[[Any, str, Dict[str, List[str]]], bool],
+              on_applied: Callable[[str], None]):
+        """Start relaying (idempotent).
+
+        `connect()` opens an admin LDAP connection.  `apply(conn, username,
+        changes)` performs the LDAP modify: True when done, False when the
+        entry no longer exists, an exception to retry.  `on_applied(username)`
+        runs after each applied change.
+        """
+        self._connect = connect
+        self._apply = apply
+        self._on_applied = on_applied
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ldap-outbox", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "leader": self.leader,
+            "pending": self.pending,
+            "oldest_pending_seconds": self.oldest_pending_seconds,
+            "dead": self.dead,
+            "applied": self.applied,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered
+        }
+
+# Global LDAP outbox relay instance
+ldap_outbox = LdapOutboxRelay()
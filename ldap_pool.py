@@ -0,0 +1,372 @@
+import os
+import threading
+import time
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+from ldap3 import Server, Connection, ALL, ANONYMOUS, SYNC
+from ldap3.core.exceptions import LDAPBindError, LDAPCommunicationError, LDAPSocketOpenError, LDAPException, \
+    LDAPResponseTimeoutError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LDAPUnavailableError(Exception):
+    """Raised when no LDAP server in the pool could be reached"""
+    pass
+
+class CircuitBreaker:
+    """Error-rate circuit breaker for one LDAP server.
+
+    closed    -> calls flow; opens when the failure rate over the last
+                 `window` outcomes reaches `error_rate` (with at least
+                 `min_calls` outcomes recorded)
+    open      -> the server is skipped until `open_seconds` have passed
+    half_open -> one trial call is let through; success closes the
+                 breaker, failure opens it again
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, open_seconds: float):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=window)
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls \
+                    and failures / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._outcomes.count(False)
+            }
+
+class LDAPServerPool:
+    """Primary + replica LDAP servers with failover, timeouts and health checks.
+
+    Servers come from LDAP_SERVERS (comma-separated, in priority order) or the
+    single LDAP_SERVER.  With the `first` strategy the first healthy server is
+    always preferred; with `round_robin` successive connections rotate over the
+    healthy servers.  Every server gets strict connect/receive timeouts and its
+    own circuit breaker, fed by every connection attempt, by the outcome of
+    each operation on connections handed out by the pool (timeouts and
+    dropped connections count as failures) and by a background health-check
+    thread.
+    """
+
+    def __init__(self):
+        urls = os.environ.get('LDAP_SERVERS') or os.environ.get('LDAP_SERVER', 'ldap://localhost:389')
+        self.urls: List[str] = [url.strip() for url in urls.split(',') if url.strip()]
+        self.strategy = os.environ.get('LDAP_POOL_STRATEGY', 'first').lower()
+        self.connect_timeout = float(os.environ.get('LDAP_CONNECT_TIMEOUT', '3'))
+        # ldap3 packs the receive timeout into SO_RCVTIMEO, so it must be whole seconds
+        self.receive_timeout = max(1, int(os.environ.get('LDAP_RECEIVE_TIMEOUT', '10')))
+        self.health_check_interval = float(os.environ.get('LDAP_HEALTH_CHECK_INTERVAL', '10'))
+        self.start_tls = os.environ.get('LDAP_START_TLS', 'false').lower() == 'true'
+
+        window = int(os.environ.get('LDAP_BREAKER_WINDOW', '20'))
+        min_calls = int(os.environ.get('LDAP_BREAKER_MIN_CALLS', '3'))
+        error_rate = float(os.environ.get('LDAP_BREAKER_ERROR_RATE', '0.5'))
+        open_seconds = float(os.environ.get('LDAP_BREAKER_OPEN_SECONDS', '30'))
+
+        self.servers: Dict[str, Server] = {
+            url: Server(url, get_info=ALL, connect_timeout=self.connect_timeout) for url in self.urls
+        }
+        self.breakers: Dict[str, CircuitBreaker] = {
+            url: CircuitBreaker(window, min_calls, error_rate, open_seconds) for url in self.urls
+        }
+        self._rotation = itertools.cycle(range(len(self.urls)))
+        self._rotation_lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _candidates(self) -> List[str]:
+        if self.strategy == 'round_robin' and len(self.urls) > 1:
+            with self._rotation_lock:
+                start = next(self._rotation)
+            return self.urls[start:] + self.urls[:start]
+        return list(self.urls)
+
+    def _new_connection(self, url: str, user: Optional[str] = None, password: Optional[str] = None,
+                        client_strategy: str = SYNC) -> Connection:
+        server = self.servers[url]
+        # Availability is tracked by our circuit breaker; stop ldap3 from
+        # remembering a failed address and silently refusing to reconnect
+        server.reset_availability()
+        return Connection(server, user=user, password=password, receive_timeout=self.receive_timeout,
+                          client_strategy=client_strategy)
+
+    def connect(self, user: Optional[str] = None, password: Optional[str] = None,
+                auto_bind: bool = True, client_strategy: str = SYNC) -> Connection:
+        """Open a connection to the first available server.
+
+        Failover only happens while opening the socket and binding, before
+        any operation is sent, so writes are never replayed on a second server.  With
+        auto_bind=False the caller binds (e.g. to check user credentials) and
+        a rejected bind is not counted against the server.  client_strategy=ASYNC
+        gives a connection that can pipeline requests.
+        """
+        return self.open_connection(user, password, auto_bind, client_strategy)[0]
+
+    def open_connection(self, user: Optional[str] = None, password: Optional[str] = None,
+                        auto_bind: bool = True, client_strategy: str = SYNC) -> Tuple[Connection, str]:
+        """Like connect(), but also return the URL of the server that was used"""
+        last_error = None
+        for url in self._candidates():
+            breaker = self.breakers[url]
+            if not breaker.allow():
+                continue
+            conn = self._new_connection(url, user, password, client_strategy)
+            # Every attempt ends in exactly one record(), so a half-open
+            # breaker's trial can never be left in flight
+            try:
+                conn.open()
+                if self.start_tls:
+                    conn.start_tls()
+                bound = conn.bind() if auto_bind else True
+            except Exception as e:
+                breaker.record(False)
+                self._close(conn)
+                last_error = e
+                logger.warning(f"LDAP server {url} unavailable, failing over: {e}")
+                continue
+            # The server answered, even if it rejected the credentials
+            breaker.record(True)
+            if not bound:
+                description = conn.result.get('description')
+                self._close(conn)
+                raise LDAPBindError(f"Bind as {user} failed on {url}: {description}")
+            self._watch_operations(conn, breaker)
+            return conn, url
+        raise LDAPUnavailableError(f"No LDAP server available (last error: {last_error})")
+
+    @staticmethod
+    def _close(conn: Connection):
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _watch_operations(conn: Connection, breaker: CircuitBreaker):
+        """Feed the outcome of every response read on `conn` to the server's breaker"""
+        strategy = conn.strategy
+        get_response = strategy.get_response
+
+        def watched_get_response(*args, **kwargs):
+            try:
+                response = get_response(*args, **kwargs)
+            except (LDAPCommunicationError, LDAPResponseTimeoutError):
+                breaker.record(False)
+                raise
+            breaker.record(True)
+            return response
+
+        # Both SYNC operations and ASYNC get_response() read through the strategy
+        strategy.get_response = watched_get_response
+
+    def is_healthy(self) -> bool:
+        """True unless every server's circuit breaker is open"""
+        return any(breaker.state != CircuitBreaker.OPEN for breaker in self.breakers.values())
+
+    def check_health(self):
+        """Probe every server once and feed the outcome to its circuit breaker"""
+        for url in self.urls:
+            breaker = self.breakers[url]
+            # Respect an open breaker until its cool-down allows a trial probe
+            if breaker.state != CircuitBreaker.CLOSED and not breaker.allow():
+                continue
+            conn = self._new_connection(url)
+            try:
+                # An anonymous bind needs a full round trip, so a server that
+                # accepts TCP but does not answer is caught by the receive timeout
+                conn.open()
+                conn.bind()
+                breaker.record(True)
+            except Exception as e:
+                breaker.record(False)
+                logger.warning(f"LDAP health check failed for {url}: {e}")
+            finally:
+                self._close(conn)
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_check_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"LDAP health check loop error: {e}")
+
+    def start_health_checks(self):
+        """Start the background health-check thread (idempotent)"""
+        if self._health_thread is None and self.health_check_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, name="ldap-health", daemon=True)
+            self._health_thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "servers": {url: self.breakers[url].stats() for url in self.urls}
+        }
+
+class LDAPBindPool:
+    """Long-lived connections reused to check user credentials by rebinding.
+
+    Opening a connection per login costs a TCP (and StartTLS) handshake, and
+    ldap3 re-reads the root DSE and schema on every bind.  Instead a checked
+    out connection is rebound as the user, the caller does its reads under
+    that identity, and the connection is rebound anonymously before it goes
+    back to the pool.  If that reset fails the connection is closed instead,
+    so an idle pooled connection never carries a user's identity.  Idle
+    connections older than LDAP_BIND_POOL_MAX_IDLE, or to a server whose
+    circuit breaker has opened, are closed rather than reused.
+    """
+
+    def __init__(self, server_pool: LDAPServerPool):
+        self.server_pool = server_pool
+        self.size = int(os.environ.get('LDAP_BIND_POOL_SIZE', '4'))
+        self.max_idle = float(os.environ.get('LDAP_BIND_POOL_MAX_IDLE', '60'))
+        self._idle: deque = deque()  # (connection, url, released_at)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    @staticmethod
+    def _close(conn: Connection):
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    def _discard(self, conn: Connection):
+        self.discarded += 1
+        self._close(conn)
+
+    def _checkout(self) -> Tuple[Optional[Connection], Optional[str]]:
+        stale = []
+        found = (None, None)
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                # Most recently used first, so surplus connections age out
+                conn, url, released_at = self._idle.pop()
+                if now - released_at < self.max_idle and not conn.closed \
+                        and self.server_pool.breakers[url].state != CircuitBreaker.OPEN:
+                    found = (conn, url)
+                    break
+                stale.append(conn)
+        for conn in stale:
+            self._discard(conn)
+        return found
+
+    def _release(self, conn: Connection, url: str):
+        # Forget the user's identity on the server and in ldap3 before reuse
+        conn.user = None
+        conn.password = None
+        try:
+            reset = conn.rebind(authentication=ANONYMOUS, read_server_info=False)
+        except LDAPException:
+            reset = False
+        if not reset:
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, url, time.monotonic()))
+                return
+        self._discard(conn)
+
+    def _bind(self, user_dn: str, password: str) -> Tuple[Connection, str, bool]:
+        conn, url = self._checkout()
+        if conn is not None:
+            try:
+                bound = conn.rebind(user=user_dn, password=password, read_server_info=False)
+                self.reused += 1
+                return conn, url, bound
+            except LDAPException as e:
+                # The server probably closed the idle connection; use a fresh one
+                logger.info(f"Pooled LDAP connection to {url} is dead, reconnecting: {e}")
+                self._discard(conn)
+        conn, url = self.server_pool.open_connection(auto_bind=False)
+        self.created += 1
+        try:
+            return conn, url, conn.rebind(user=user_dn, password=password, read_server_info=False)
+        except Exception:
+            self._discard(conn)
+            raise
+
+    @contextmanager
+    def bound_as(self, user_dn: str, password: str):
+        """Yield a pooled connection bound as the user, or None if the credentials are rejected"""
+        conn, url, bound = self._bind(user_dn, password)
+        healthy = True
+        try:
+            yield conn if bound else None
+        except (LDAPCommunicationError, LDAPSocketOpenError):
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                self._release(conn, url)
+            else:
+                self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded
+        }
+
+# Global LDAP server pool instance
+ldap_pool = LDAPServerPool()
+
+# Global pool of connections for checking user credentials
+ldap_bind_pool = LDAPBindPool(ldap_pool)
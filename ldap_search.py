@@ -0,0 +1,58 @@
+import os
+from typing import Any, Dict, Iterable, Iterator, List
+
+from ldap3 import Connection
+from ldap3.core.exceptions import LDAPOperationResult
+
+# Entries requested per page; must stay below the server's size limit (olcSizeLimit, 500 by default)
+LDAP_PAGE_SIZE = int(os.environ.get('LDAP_PAGE_SIZE', '250'))
+
+def _value(values: Any) -> Any:
+    """Collapse an attribute the way ldap3's Entry.value does: None, a single value or a list"""
+    if isinstance(values, list):
+        if not values:
+            return None
+        return values[0] if len(values) == 1 else values
+    return values
+
+def paged_search(conn: Connection, search_base: str, search_filter: str, attributes: List[str],
+                 page_size: int = None) -> Iterator[Dict[str, Any]]:
+    """Stream matching entries as compact records using the simple paged results control.
+
+    Only the current page is held in memory and no ldap3 Entry objects are
+    built.  Each record maps the requested attribute names to their value(s)
+    (None when absent) plus "dn".  Raises LDAPOperationResult if the search
+    ends with an error, so a caller never mistakes a truncated result for the
+    whole directory.
+    """
+    pages = conn.extend.standard.paged_search(
+        search_base=search_base,
+        search_filter=search_filter,
+        attributes=attributes,
+        paged_size=page_size or LDAP_PAGE_SIZE,
+        generator=True
+    )
+    for item in pages:
+        if item.get('type') != 'searchResEntry':
+            continue
+        found = item.get('attributes', {})
+        record = {name: _value(found.get(name)) for name in attributes}
+        record['dn'] = item['dn']
+        yield record
+
+    result = conn.result or {}
+    if result.get('result', 0) != 0:
+        raise LDAPOperationResult(result=result['result'], description=result.get('description'),
+                                  dn=result.get('dn'), message=result.get('message'))
+
+def batched(records: Iterable[Any], size: int = None) -> Iterator[List[Any]]:
+    """Group a stream of records into lists of at most `size` (default: one LDAP page)"""
+    size = size or LDAP_PAGE_SIZE
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
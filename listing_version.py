@@ -0,0 +1,62 @@
+import threading
+import uuid
+from typing import Any, Dict, Optional
+import logging
+
+from invalidation_bus import USER_CHANGED, USER_DELETED, USERS_IMPORTED, USERS_SYNCED, ROLE_CHANGED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Invalidation bus kinds that can change a user or role-table listing
+LISTING_KINDS = (USER_CHANGED, USER_DELETED, USERS_IMPORTED, USERS_SYNCED, ROLE_CHANGED)
+
+class ListingVersion:
+    """Version stamp of the user directory and role tables, served as ETags.
+
+    The counter moves on every invalidation-bus event that can change a
+    listing (admin mutations, imports and syncs on any replica), whenever
+    the bus may have missed events, and after every full directory rebuild
+    (which also catches LDAP edits made outside this service).  ETags carry
+    a per-process origin, so a tag issued by one replica never matches
+    another's.  Checking If-None-Match is a string comparison: a 304 needs
+    no LDAP or database query.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._lock = threading.Lock()
+        self.not_modified = 0
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in LISTING_KINDS:
+            self.bump()
+
+    def etag(self, listing: str) -> str:
+        """The current ETag of a listing; take it before reading the data"""
+        return f'W/"{listing}-{self.origin}-{self._version}"'
+
+    def matches(self, if_none_match: Optional[str], etag: str) -> bool:
+        """True if an If-None-Match header names `etag` (the client's copy is current)"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' in tags or etag in tags or etag[2:] in tags:
+            self.not_modified += 1
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._version,
+            "not_modified": self.not_modified
+        }
+
+# Global listing version instance
+listing_version = ListingVersion()
@@ -1,19 +1,50 @@
-from fastapi import FastAPI, HTTPException, Form, Depends, Request
+from fastapi import FastAPI, HTTPException, Form, Depends, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 import jwt
 from cryptography.fernet import Fernet
 import base64
-from ldap3 import Server, Connection, ALL, MODIFY_REPLACE
+from ldap3 import Connection, MODIFY_REPLACE, ASYNC
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 import json
+import csv
+import io
+from collections import Counter, deque
 from ldap3.core.exceptions import LDAPEntryAlreadyExistsResult
+from ldap3.utils.conv import escape_filter_chars
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import secrets
+import itertools
+import ipaddress
 import uuid
-from database_service import db_service
+import time
+import asyncio
+from database_service import db_service, DatabaseUnavailableError, OutboxRowSupersededError
+from profiling_service import profiling_service, ProfilingBusyError, request_route
+from bulkhead import ldap_bulkhead, db_bulkhead, hash_bulkhead, BulkheadFullError, after_each_call
+from ldap_pool import ldap_pool, ldap_bind_pool, LDAPUnavailableError
+from ldap_search import paged_search, batched
+from rate_limiter import login_ip_limiter, login_user_limiter, event_stream_ip_limiter, event_stream_ip_slots, event_stream_user_slots
+from token_store import fallback_tokens
+from revocation_set import revocation_set
+from singleflight import ldap_single_flight
+from idempotency import refresh_idempotency
+from invalidation_bus import invalidation_bus, USER_CHANGED, USER_DELETED, LOCKOUT_CHANGED, TOKENS_REVOKED, TOKEN_EPOCH_BUMPED, PASSWORD_CHANGED, USERS_IMPORTED, USERS_SYNCED, ROLE_CHANGED
+from credential_cache import credential_cache
+from user_claims import user_claims
+from token_epoch import token_epochs
+from user_directory import user_directory, SORT_FIELDS, SEARCH_FIELDS
+from job_queue import job_queue
+from ldap_outbox import ldap_outbox
+from employee_number_reconciler import employee_number_reconciler
+from event_stream import event_hub
+from listing_version import listing_version
+import anyio
+from starlette.routing import Match
+from starlette.background import BackgroundTask
 
 load_dotenv()
 
@@ -22,40 +53,43 @@ def sync_ldap_users_on_startup():
     """Sync LDAP users to database when the application starts"""
     try:
         print("Starting automatic LDAP user sync...")
-        server = Server(os.environ.get('LDAP_SERVER', 'ldap://ldap-service:389'), get_info=ALL)
-        conn = Connection(server, os.environ.get('LDAP_ADMIN_DN', 'cn=admin,dc=example,dc=com'), 
-                        os.environ.get('LDAP_ADMIN_PASS', 'admin123'), auto_bind=True)
+        conn = ldap_pool.connect(os.environ.get('LDAP_ADMIN_DN', 'cn=admin,dc=example,dc=com'), 
+                                 os.environ.get('LDAP_ADMIN_PASS', 'admin123'))
         
-        # Search for all users in LDAP
-        conn.search(
+        # Stream all users from LDAP page by page, syncing each page as it arrives
+        records = paged_search(
+            conn,
             os.environ.get('LDAP_BASE_DN', 'ou=users,dc=example,dc=com'),
             '(objectClass=inetOrgPerson)',
-            attributes=['uid', 'cn', 'employeeType', 'description', 'employeeNumber']
+            ['uid', 'cn', 'employeeType', 'description', 'employeeNumber']
         )
         
-        ldap_users = []
-        for entry in conn.entries:
-            auth_level = 1
-            if "description" in entry and entry.description.value:
-                desc = entry.description.value
-                if desc.startswith("auth_level:"):
+        synced = 0
+        for page in batched(records):
+            ldap_users = []
+            for record in page:
+                auth_level = 1
+                desc = record["description"]
+                if desc and desc.startswith("auth_level:"):
                     try:
                         auth_level = int(desc.split(":")[1])
                     except (ValueError, IndexError):
                         auth_level = 1
+                
+                ldap_users.append({
+                    "uid": record["uid"],
+                    "dn": record["dn"],
+                    "cn": record["cn"],
+                    "role": record["employeeType"] or "user",
+                    "authorization_level": auth_level,
+                    "employee_id": record["employeeNumber"]
+                })
             
-            ldap_users.append({
-                "uid": entry.uid.value,
-                "dn": str(entry.entry_dn),
-                "cn": entry.cn.value,
-                "role": entry.employeeType.value if "employeeType" in entry else "user",
-                "authorization_level": auth_level,
-                "employee_id": entry.employeeNumber.value if hasattr(entry, 'employeeNumber') else None
-            })
-        
-        if ldap_users:
             db_service.sync_ldap_users_to_db(ldap_users)
-            print(f"✓ Successfully synced {len(ldap_users)} LDAP users to database")
+            synced += len(ldap_users)
+        
+        if synced:
+            print(f"✓ Successfully synced {synced} LDAP users to database")
         else:
             print("⚠ No LDAP users found to sync")
             
@@ -64,6 +98,33 @@ def sync_ldap_users_on_startup():
 
 # Run automatic sync on startup
 sync_ldap_users_on_startup()
+db_service.release_connection()
+
+# Request threads borrow a database connection per call and hand it back to the pool
+after_each_call(db_service.release_connection)
+
+# Keep LDAP server health (and circuit breakers) current in the background
+ldap_pool.start_health_checks()
+
+# Write refresh tokens issued during a database outage back into jwt_sessions
+fallback_tokens.start_reconciler()
+
+# Load the cluster-wide revocation set and keep polling it for new revocations
+revocation_set.start()
+
+# Apply cache invalidations published by admin mutations on other replicas
+invalidation_bus.subscribe("revocation_set", revocation_set.on_invalidation)
+invalidation_bus.subscribe("user_claims", user_claims.on_invalidation, user_claims.clear)
+invalidation_bus.subscribe("token_epochs", token_epochs.on_invalidation, token_epochs.request_reload)
+invalidation_bus.subscribe("credential_cache", credential_cache.on_invalidation, credential_cache.clear)
+invalidation_bus.subscribe("user_directory", user_directory.on_invalidation, user_directory.request_rebuild)
+invalidation_bus.subscribe("event_hub", event_hub.on_invalidation, event_hub.on_flush)
+invalidation_bus.subscribe("listing_version", listing_version.on_invalidation, listing_version.bump)
+invalidation_bus.subscribe("refresh_idempotency", refresh_idempotency.on_invalidation, refresh_idempotency.clear)
+invalidation_bus.start()
+
+# Keep every user's access-token epoch in memory
+token_epochs.start()
 
 JWE_SECRET_KEY = os.environ.get("JWE_SECRET_KEY", "thisIsA32ByteSecretKey1234567890!!")
 print("JWE_SECRET_KEY (len={}):".format(len(JWE_SECRET_KEY)), repr(JWE_SECRET_KEY))
@@ -83,6 +144,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if profiling_service.enabled:
+    @app.middleware("http")
+    async def tag_request_route(request: Request, call_next):
+        """Record the matched route so profiling can attribute worker-thread samples to it"""
+        for route in app.router.routes:
+            match, _ = route.matches(request.scope)
+            if match == Match.FULL:
+                request_route.set(getattr(route, "path", None))
+                break
+        return await call_next(request)
+
 # JWT Configuration
 ACCESS_TOKEN_EXPIRE_HOURS = 1  # 1 hour for access tokens
 REFRESH_TOKEN_EXPIRE_DAYS = 7  # 7 days for refresh tokens
@@ -92,12 +164,16 @@ LOCKOUT_THRESHOLD = 3  # Number of failed attempts before lockout
 LOCKOUT_DURATION = 30  # Lockout duration in seconds
 MAX_ATTEMPTS = 3  # Maximum failed attempts before lockout
 
-# Database service handles all storage now
-# Fallback in-memory storage for refresh tokens (used when database is unavailable)
-refresh_tokens: Dict[str, dict] = {}  # {token_id: {username, created_at, expires_at}}
+# Database service handles all storage now; refresh tokens issued while it is
+# unavailable are held in the bounded fallback_tokens store (token_store.py)
+
+def generate_access_token(username: str, role: str, name: str = None, claims: dict = None) -> str:
+    """Generate a JWT access token with 1-hour expiration.
 
-def generate_access_token(username: str, role: str) -> str:
-    """Generate a JWT access token with 1-hour expiration"""
+    `claims` is the user's row from user_claims (employee_id,
+    authorization_level, claims_version); when given, those values travel in
+    the token so self-lookups can be answered without LDAP or the database.
+    """
     now = datetime.utcnow()
     payload = {
         "sub": username,
@@ -106,6 +182,14 @@ def generate_access_token(username: str, role: str) -> str:
         "exp": now + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS),
         "type": "access"
     }
+    if name:
+        payload["name"] = name
+    if claims:
+        payload["authorization_level"] = claims["authorization_level"]
+        payload["employee_id"] = claims["employee_id"]
+        payload["cv"] = claims["claims_version"]
+    # Token epoch: bumping the user's epoch invalidates this token
+    payload["te"] = max((claims or {}).get("token_epoch") or 0, token_epochs.current(username))
     # Create JWT token
     jwt_token = jwt.encode(payload, JWE_SECRET_KEY, algorithm="HS256")
     # Encrypt the JWT token
@@ -124,12 +208,7 @@ def generate_refresh_token(username: str) -> tuple[str, str]:
     except Exception as e:
         print(f"Error storing refresh token: {e}")
         # Fallback to in-memory storage if database fails
-        refresh_tokens[token_id] = {
-            "username": username,
-            "created_at": now,
-            "expires_at": expires_at,
-            "is_active": True
-        }
+        fallback_tokens.add(token_id, username, now, expires_at)
     
     # Create the actual refresh token
     refresh_payload = {
@@ -156,29 +235,63 @@ def verify_access_token(encrypted_token: str) -> dict:
         # Check if it's an access token
         if payload.get("type") != "access":
             raise HTTPException(status_code=401, detail="Invalid token type")
+        
+        # Tokens minted before the user's last epoch bump are no longer valid
+        if payload.get("te", 0) < token_epochs.current(payload.get("sub")):
+            raise HTTPException(status_code=401, detail="Access token revoked")
             
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Access token expired")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid access token: {str(e)}")
 
-def verify_refresh_token(encrypted_token: str) -> dict:
-    """Verify and decode a refresh token"""
+def check_fallback_refresh_token(token_id: str):
+    """Validate a refresh token held in the in-memory fallback store"""
+    token = fallback_tokens.get(token_id)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Refresh token not found")
+    if not token.is_active:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    if datetime.utcnow() > token.expires_at:
+        fallback_tokens.discard(token_id)
+        raise HTTPException(status_code=401, detail="Refresh token expired")
+
+def decode_refresh_token(encrypted_token: str) -> dict:
+    """Decrypt and decode a refresh token without consulting the session store"""
     try:
         # Decrypt the token first
         decrypted_bytes = cipher_suite.decrypt(encrypted_token.encode())
         # Then decode the JWT
         payload = jwt.decode(decrypted_bytes, JWE_SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Refresh token expired")
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Invalid refresh token: {str(e)}")
+    
+    # Check if it's a refresh token
+    if payload.get("type") != "refresh":
+        raise HTTPException(status_code=401, detail="Invalid token type")
+    if not payload.get("jti"):
+        raise HTTPException(status_code=401, detail="Refresh token not found")
+    return payload
+
+def verify_refresh_token(encrypted_token: str) -> dict:
+    """Verify and decode a refresh token"""
+    try:
+        payload = decode_refresh_token(encrypted_token)
         
-        # Check if it's a refresh token
-        if payload.get("type") != "refresh":
-            raise HTTPException(status_code=401, detail="Invalid token type")
-            
         # Check if refresh token exists and is active in database
         token_id = payload.get("jti")
-        if not token_id:
-            raise HTTPException(status_code=401, detail="Refresh token not found")
+        
+        # Revocations from every replica are mirrored in memory; while that
+        # copy is fresh a signed, unexpired, unrevoked token needs no DB lookup
+        if revocation_set.is_revoked(token_id):
+            raise HTTPException(status_code=401, detail="Refresh token revoked")
+        if revocation_set.is_fresh():
+            return payload
         
         try:
             # Try database first
@@ -197,31 +310,15 @@ def verify_refresh_token(encrypted_token: str) -> dict:
             
             if not token_found:
                 # Fallback to in-memory check
-                if token_id not in refresh_tokens:
-                    raise HTTPException(status_code=401, detail="Refresh token not found")
-                token_data = refresh_tokens[token_id]
-                if not token_data["is_active"]:
-                    raise HTTPException(status_code=401, detail="Refresh token revoked")
-                if datetime.utcnow() > token_data["expires_at"]:
-                    del refresh_tokens[token_id]
-                    raise HTTPException(status_code=401, detail="Refresh token expired")
+                check_fallback_refresh_token(token_id)
         except HTTPException:
             raise
         except Exception as e:
             print(f"Database error in token verification: {e}")
             # Fallback to in-memory verification
-            if token_id not in refresh_tokens:
-                raise HTTPException(status_code=401, detail="Refresh token not found")
-            token_data = refresh_tokens[token_id]
-            if not token_data["is_active"]:
-                raise HTTPException(status_code=401, detail="Refresh token revoked")
-            if datetime.utcnow() > token_data["expires_at"]:
-                del refresh_tokens[token_id]
-                raise HTTPException(status_code=401, detail="Refresh token expired")
+            check_fallback_refresh_token(token_id)
             
         return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Refresh token expired")
     except HTTPException:
         raise
     except Exception as e:
@@ -231,22 +328,35 @@ def revoke_refresh_token(token_id: str):
     """Revoke a refresh token"""
     try:
         db_service.revoke_refresh_token(token_id)
+        revocation_set.add(token_id)
+        invalidation_bus.publish(TOKENS_REVOKED)
     except Exception as e:
         print(f"Error revoking token in database: {e}")
-        # Fallback to in-memory revocation
-        if token_id in refresh_tokens:
-            refresh_tokens[token_id]["is_active"] = False
+        # Fallback to in-memory revocation; tokens the database already holds
+        # are revoked there (and published to other replicas) once it is back
+        if fallback_tokens.revoke(token_id):
+            revocation_set.add(token_id)
+        else:
+            revocation_set.add_pending(token_id)
 
 def revoke_all_user_tokens(username: str):
     """Revoke all refresh tokens for a user"""
     try:
         db_service.revoke_all_user_tokens(username)
+        invalidation_bus.publish(TOKENS_REVOKED, username)
     except Exception as e:
         print(f"Error revoking all user tokens in database: {e}")
         # Fallback to in-memory revocation
-        for token_id, token_data in refresh_tokens.items():
-            if token_data["username"] == username:
-                token_data["is_active"] = False
+        for token_id in fallback_tokens.revoke_user(username):
+            revocation_set.add(token_id)
+
+def invalidate_access_tokens(username: str):
+    """Bump a user's token epoch so all of their outstanding access tokens are rejected"""
+    try:
+        token_epochs.bump(username)
+        invalidation_bus.publish(TOKEN_EPOCH_BUMPED, username)
+    except Exception as e:
+        print(f"Error bumping token epoch for {username}: {e}")
 
 def cleanup_expired_tokens():
     """Clean up expired refresh tokens"""
@@ -255,13 +365,7 @@ def cleanup_expired_tokens():
     except Exception as e:
         print(f"Error cleaning up expired tokens in database: {e}")
         # Fallback to in-memory cleanup
-        now = datetime.utcnow()
-        expired_tokens = [
-            token_id for token_id, token_data in refresh_tokens.items()
-            if now > token_data["expires_at"]
-        ]
-        for token_id in expired_tokens:
-            del refresh_tokens[token_id]
+        fallback_tokens.purge_expired()
 
 def is_account_locked(username: str) -> bool:
     """Check if an account is currently locked"""
@@ -301,7 +405,7 @@ def get_lockout_remaining_time(username: str) -> Optional[int]:
         print(f"Error getting lockout remaining time: {e}")
         return None
 
-def record_failed_attempt(username: str) -> bool:
+def record_failed_attempt(username: str, ip_address: str = None, user_agent: str = None) -> bool:
     """Record a failed login attempt and return True if account should be locked"""
     try:
         # Get current failed attempts count before recording new attempt
@@ -309,7 +413,7 @@ def record_failed_attempt(username: str) -> bool:
         current_failed_count = lockout_status['failed_attempts_count']
         
         # Record the failed attempt in database
-        db_service.record_login_attempt(username, 'failure')
+        db_service.record_login_attempt(username, 'failure', ip_address=ip_address, user_agent=user_agent)
         
         # Check if this attempt should trigger a lockout
         new_failed_count = current_failed_count + 1
@@ -332,6 +436,16 @@ def reset_failed_attempts(username: str):
     except Exception as e:
         print(f"Error resetting failed attempts: {e}")
 
+def record_successful_login(username: str, user_dn: str, role: str, auth_level: int,
+                            ip_address: str = None, user_agent: str = None):
+    """Record a successful login and refresh the user's metadata in the database"""
+    try:
+        db_service.record_login_attempt(username, 'success', ip_address=ip_address, user_agent=user_agent)
+        # Upsert user in database for metadata tracking with correct role and auth level
+        db_service.upsert_user(username, user_dn, role, auth_level)
+    except Exception as e:
+        print(f"Error recording successful login: {e}")
+
 def get_failed_attempts_count(username: str) -> int:
     """Get the number of failed attempts for a user"""
     try:
@@ -341,22 +455,13 @@ def get_failed_attempts_count(username: str) -> int:
         print(f"Error getting failed attempts count: {e}")
         return 0
 
-def user_exists_in_ldap(username: str) -> bool:
+def user_exists_in_ldap(username: str, raise_unavailable: bool = False) -> bool:
     """Check if a user exists in LDAP directory"""
     try:
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        
-        # Search for the user
-        user_dn = f"uid={username},{LDAP_BASE_DN}"
-        conn.search(
-            search_base=user_dn,
-            search_filter="(objectClass=inetOrgPerson)",
-            attributes=["uid"]
-        )
-        
-        return len(conn.entries) > 0
+        return fetch_ldap_user(username, ["uid"], "(objectClass=inetOrgPerson)") is not None
     except Exception as e:
+        if raise_unavailable and isinstance(e, LDAPUnavailableError):
+            raise
         print(f"Error checking user existence: {e}")
         return False
 
@@ -374,27 +479,293 @@ LDAP_BASE_DN = os.environ.get("LDAP_BASE_DN", "ou=users,dc=example,dc=com")
 LDAP_ADMIN_DN = os.environ.get("LDAP_ADMIN_DN", "cn=admin,dc=example,dc=com")
 LDAP_ADMIN_PASS = os.environ.get("LDAP_ADMIN_PASS", "admin")
 
-def get_next_employee_id(role: str, conn=None) -> str:
-    """Get the next employee ID from database (deprecated - use database function)"""
-    # This function is now deprecated - the database handles ID generation
-    # Keeping for backward compatibility but it should use the database function
+# --- LDAP HELPERS ---
+# Blocking helpers; request handlers run them through ldap_bulkhead
+
+def get_ldap_admin_connection() -> Connection:
+    """Open a connection bound as the LDAP admin on the first available server"""
+    return ldap_pool.connect(LDAP_ADMIN_DN, LDAP_ADMIN_PASS)
+
+def parse_auth_level(entry) -> int:
+    """Get authorization level from an entry's description field (auth_level:N)"""
+    return auth_level_from_description(entry.description.value if "description" in entry else None)
+
+def auth_level_from_description(desc) -> int:
+    """Get authorization level from a description value (auth_level:N)"""
+    auth_level = 1  # Default level
+    if desc and desc.startswith("auth_level:"):
+        try:
+            auth_level = int(desc.split(":")[1])
+        except (ValueError, IndexError):
+            auth_level = 1
+    return auth_level
+
+def fetch_ldap_user(username: str, attributes: list, search_filter: str = "(objectClass=*)"):
+    """Return a user's LDAP entry (searched as admin), or None if not found"""
+    conn = get_ldap_admin_connection()
+    conn.search(
+        search_base=f"uid={username},{LDAP_BASE_DN}",
+        search_filter=search_filter,
+        attributes=attributes
+    )
+    return conn.entries[0] if conn.entries else None
+
+def stream_ldap_users(search_filter: str, attributes: list):
+    """Search the users subtree as admin, yielding compact records one LDAP page at a time.
+
+    The admin connection is opened on the first next() and unbound when the
+    search is exhausted or the generator is closed.
+    """
+    conn = get_ldap_admin_connection()
+    try:
+        yield from paged_search(conn, LDAP_BASE_DN, search_filter, attributes)
+    finally:
+        conn.unbind()
+
+async def next_ldap_page(pages):
+    """Pull the next page of records from a batched LDAP stream (None when exhausted)"""
+    return await ldap_bulkhead.run(next, pages, None)
+
+async def stream_json_list(key: str, search_filter: str, attributes: list, convert) -> StreamingResponse:
+    """Respond with {key: [...]} built from an LDAP user search, one page at a time.
+
+    `convert` is an async function turning a page of LDAP records into the
+    response items.  The first page is fetched before the response starts,
+    so a failing search still gets an error status; after that only one page
+    is held in memory however large the directory is.  If the search fails
+    mid-stream the transfer is aborted (the JSON is never closed) and the
+    listing version is bumped, so a partial copy is never revalidated with
+    a 304.  The LDAP connection is released however the stream ends,
+    including when the client goes away.
+    """
+    records = stream_ldap_users(search_filter, attributes)
+    pages = batched(records)
+    try:
+        first = await next_ldap_page(pages)
+        first_items = await convert(first) if first else []
+    except BaseException:
+        records.close()
+        raise
+    
+    async def body():
+        try:
+            yield f'{{"{key}": ['.encode()
+            items, total = first_items, 0
+            while items:
+                chunk = b",".join(json.dumps(item, default=str).encode() for item in items)
+                yield (b"," if total else b"") + chunk
+                total += len(items)
+                page = await next_ldap_page(pages)
+                items = await convert(page) if page else None
+            yield b"]}"
+        except Exception as e:
+            print(f"❌ Streaming {key} failed mid-response, aborting it: {e}")
+            listing_version.bump()
+            raise
+        finally:
+            records.close()
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+LISTING_CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+def check_listing_etag(request: Request, listing: str) -> tuple:
+    """(ETag for a listing, 304 response if the caller's copy is still current, else None)
+
+    Taken before the data is read, so a change made meanwhile yields a new
+    ETag on the next request.  Browsers revalidate such responses by
+    themselves because of Cache-Control: no-cache.
+    """
+    etag = listing_version.etag(listing)
+    if listing_version.matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(status_code=304, headers={"ETag": etag, **LISTING_CACHE_HEADERS})
+    return etag, None
+
+def set_listing_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    for name, value in LISTING_CACHE_HEADERS.items():
+        response.headers[name] = value
+
+USER_SUMMARY_ATTRIBUTES = ["uid", "cn", "employeeType", "description", "employeeNumber"]
+
+def user_summary(record: dict, employee_id: Optional[str]) -> dict:
+    """The admin view of a user, built from an LDAP record and their database employee_id"""
+    cn = record["cn"]
+    return {
+        "uid": record["uid"],
+        "cn": cn[0] if isinstance(cn, list) else cn,
+        "role": record["employeeType"] or "user",
+        "authorization_level": auth_level_from_description(record["description"]),
+        "employee_id": employee_id
+    }
+
+def load_directory_users():
+    """Yield every user for the in-memory directory, one LDAP page (and one DB query) at a time"""
+    records = stream_ldap_users("(objectClass=inetOrgPerson)", USER_SUMMARY_ATTRIBUTES)
+    try:
+        for page in batched(records):
+            employee_ids = db_service.get_employee_ids([record["uid"] for record in page])
+            for record in page:
+                yield user_summary(record, employee_ids.get(record["uid"]))
+    finally:
+        records.close()
+
+def first_directory_users(limit: int) -> list:
+    """Up to `limit` users straight from LDAP, reading only the pages needed for them"""
+    users = load_directory_users()
+    try:
+        return list(itertools.islice(users, limit))
+    finally:
+        users.close()
+
+def load_directory_user(username: str) -> Optional[dict]:
+    """Load one user for the in-memory directory, or None if they are not in LDAP"""
+    search_filter = f"(&(objectClass=inetOrgPerson)(uid={escape_filter_chars(username)}))"
+    for record in stream_ldap_users(search_filter, USER_SUMMARY_ATTRIBUTES):
+        return user_summary(record, db_service.get_employee_ids([username]).get(username))
+    return None
+
+# Build the searchable user directory and keep it current in the background
+user_directory.start(load_directory_users, load_directory_user, listing_version.bump)
+
+async def coalesced_ldap_read(func, *args):
+    """Run an LDAP read helper, sharing one lookup between identical concurrent requests"""
+    key = (func.__name__,) + tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+    return await ldap_single_flight.run(key, ldap_bulkhead.run, func, *args)
+
+def modify_ldap_user(username: str, changes: dict) -> bool:
+    """Apply a modify to a user's LDAP entry as admin"""
+    conn = get_ldap_admin_connection()
+    return conn.modify(f"uid={username},{LDAP_BASE_DN}", changes)
+
+def apply_outbox_change(conn, username: str, changes: dict) -> bool:
+    """Outbox relay: replace attributes on a user's entry; False if the entry is gone"""
+    if conn.modify(f"uid={username},{LDAP_BASE_DN}",
+                   {attribute: [(MODIFY_REPLACE, values)] for attribute, values in changes.items()}):
+        return True
+    if conn.result.get("result") == 32:  # noSuchObject: the user was deleted meanwhile
+        return False
+    raise Exception(conn.result.get("description") or "LDAP modify failed")
+
+def on_outbox_applied(username: str):
+    """LDAP now agrees with the database: drop cached entries and tokens minted from the old one"""
+    invalidation_bus.publish(USER_CHANGED, username)
+    invalidate_access_tokens(username)
+
+def bind_and_fetch_user(username: str, password: str):
+    """Bind as the user and return their entry, or None if the credentials are rejected"""
+    user_dn = f"uid={username},{LDAP_BASE_DN}"
+    with ldap_bind_pool.bound_as(user_dn, password) as conn:
+        if conn is None:
+            return None
+        conn.search(
+            search_base=user_dn,
+            search_filter="(objectClass=*)",
+            attributes=["cn", "mail", "employeeType", "employeeNumber", "description"]
+        )
+        if not conn.entries:
+            raise HTTPException(status_code=404, detail="User not found in LDAP after bind")
+        return conn.entries[0]
+
+def login_record_from_entry(entry) -> dict:
+    """The parts of a user's LDAP entry that login needs (also what the credential cache keeps)"""
+    return {
+        "role": entry.employeeType.value if "employeeType" in entry else "user",
+        "auth_level": parse_auth_level(entry),
+        "name": entry.cn.value if "cn" in entry else None,
+        "employee_number": entry.employeeNumber.value if hasattr(entry, 'employeeNumber') else None
+    }
+
+def bind_and_get_login_record(username: str, password: str) -> Optional[dict]:
+    """Bind as the user and return their login record, or None if the credentials are rejected"""
+    entry = bind_and_fetch_user(username, password)
+    return login_record_from_entry(entry) if entry is not None else None
+
+def serve_login_from_cache(username: str) -> bool:
+    """Whether this login should be checked against the credential cache before LDAP"""
+    if credential_cache.serves_first(username):
+        return True
+    return credential_cache.has(username) and not ldap_pool.is_healthy()
+
+async def authenticate_user(username: str, password: str, from_cache: bool) -> Optional[dict]:
+    """Check a user's password and return their login record, or None if it is wrong.
+
+    With `from_cache` the cached verifier is tried first; a mismatch still
+    goes to LDAP so a password changed directly in LDAP is picked up.  If
+    LDAP is unreachable, a cached verifier is the last resort.  Hashing
+    has its own bulkhead: when it is full the cache is simply skipped,
+    except as that last resort.
+    """
+    if from_cache:
+        try:
+            record = await hash_bulkhead.run(credential_cache.verify, username, password)
+        except BulkheadFullError:
+            record = None
+        if record is not None:
+            return record
     try:
-        # Use database function for consistent ID generation
-        db_conn = db_service.get_connection()
+        record = await ldap_bulkhead.run(bind_and_get_login_record, username, password)
+    except LDAPUnavailableError:
+        if not credential_cache.has(username):
+            raise
+        print(f"⚠️ LDAP unavailable, checking {username} against cached credentials")
+        return await hash_bulkhead.run(credential_cache.verify, username, password)
+    if record is not None and credential_cache.needs_refresh(username):
+        try:
+            await hash_bulkhead.run(credential_cache.store, username, password, record)
+        except BulkheadFullError:
+            pass
+    return record
+
+def get_db_employee_id(username: str) -> Optional[str]:
+    """Get the persistent employee_id for a user from the database"""
+    db_conn = db_service.get_connection()
+    if db_conn:
         with db_conn.cursor() as cursor:
-            cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-            result = cursor.fetchone()
-            return result[0] if result else f"{role.upper()}_01"
-    except Exception as e:
-        print(f"Error getting next employee ID: {e}")
-        # Fallback to simple generation
-        role_prefixes = {
-            "admin": "ADMIN_",
-            "operator": "OP_",
-            "personnel": "PER_"
-        }
-        prefix = role_prefixes.get(role, "USER_")
-        return f"{prefix}01"
+            cursor.execute("SELECT employee_id FROM users WHERE username = %s", (username,))
+            res = cursor.fetchone()
+            if res and res[0]:
+                return res[0]
+    return None
+
+def get_next_employee_id(role: str, conn=None) -> str:
+    """Get the next employee ID for a role (deprecated - use db_service.employee_ids)"""
+    return db_service.employee_ids.next(role)
+
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "false").lower() == "true"
+# Only these peers (the frontend nginx / ingress controllers) may set X-Forwarded-For
+TRUSTED_PROXY_NETWORKS = [
+    ipaddress.ip_network(cidr.strip(), strict=False)
+    for cidr in os.environ.get("TRUSTED_PROXY_CIDRS", "").split(",") if cidr.strip()
+]
+if TRUST_PROXY_HEADERS and not TRUSTED_PROXY_NETWORKS:
+    print("⚠️ TRUST_PROXY_HEADERS is set but TRUSTED_PROXY_CIDRS is empty; ignoring X-Forwarded-For")
+
+def is_trusted_proxy(address: Optional[str]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXY_NETWORKS)
+
+def get_client_ip(request: Request) -> Optional[str]:
+    """Client IP of a request, honouring X-Forwarded-For only when it comes from a trusted proxy.
+
+    Each proxy appends the address it received the request from, so the
+    list is walked from the right and the first address that is not a
+    trusted proxy is the client; anything left of it is client-supplied.
+    """
+    peer = request.client.host if request.client else None
+    if not TRUST_PROXY_HEADERS or not is_trusted_proxy(peer):
+        return peer
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
 
 class User(BaseModel):
     username: str
@@ -416,7 +787,26 @@ def get_jwt_payload(request: Request):
         print(f"DEBUG: Error in get_jwt_payload: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def require_admin(request: Request):
+async def current_claims_version(username: str) -> Optional[int]:
+    """The user's current claims version, from memory when cached"""
+    claims = user_claims.cached(username)
+    if claims is None:
+        claims = await db_bulkhead.run(user_claims.load, username)
+    return claims["claims_version"] if claims else None
+
+async def claims_are_current(payload: dict) -> bool:
+    """True if the token's role/level/employee_id claims still match the users table"""
+    if "cv" not in payload:
+        return False
+    try:
+        return await current_claims_version(payload["sub"]) == payload["cv"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Could not check claims version for {payload.get('sub')}: {e}")
+        return False
+
+async def require_admin(request: Request):
     """Require admin role for access"""
     try:
         payload = get_jwt_payload(request)
@@ -432,30 +822,51 @@ def require_admin(request: Request):
         raise HTTPException(status_code=403, detail="Admin access required")
 
 @app.post("/login")
-def login(username: str = Form(...), password: str = Form(...)):
+async def login(request: Request, username: str = Form(...), password: str = Form(...)):
+    client_ip = get_client_ip(request)
+    user_agent = request.headers.get("user-agent")
+    
+    # Rate limit per client IP and per username before any LDAP or DB work
+    for limiter, key in ((login_ip_limiter, client_ip or "unknown"), (login_user_limiter, username.lower())):
+        allowed, retry_after = limiter.acquire(key)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many login attempts. Try again in {retry_after} seconds.",
+                headers={"Retry-After": str(retry_after)}
+            )
+    
+    # Users with a usable cached credential can log in without touching LDAP
+    from_cache = serve_login_from_cache(username)
+    
     # First, check if the user exists in LDAP
-    if not user_exists_in_ldap(username):
-        raise HTTPException(
-            status_code=404,
-            detail="User not found. Please check your username."
-        )
+    if not from_cache:
+        try:
+            user_exists = await coalesced_ldap_read(user_exists_in_ldap, username, credential_cache.has(username))
+        except LDAPUnavailableError:
+            # LDAP went down before its circuit breakers noticed; use the cached credential
+            from_cache, user_exists = True, True
+        if not user_exists:
+            raise HTTPException(
+                status_code=404,
+                detail="User not found. Please check your username."
+            )
     
     # Check if account is locked (only for existing users)
-    if is_account_locked(username):
-        remaining_time = get_lockout_remaining_time(username)
+    if await db_bulkhead.run(is_account_locked, username):
+        remaining_time = await db_bulkhead.run(get_lockout_remaining_time, username)
         raise HTTPException(
             status_code=423,  # 423 Locked
             detail=f"Account temporarily locked due to multiple failed login attempts. Try again in {remaining_time} seconds."
         )
     
     user_dn = f"uid={username},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
     try:
-        conn = Connection(server, user=user_dn, password=password)
-        if not conn.bind():
+        record = await authenticate_user(username, password, from_cache)
+        if record is None:
             # User exists but password is wrong - record failed attempt
-            should_lock = record_failed_attempt(username)
-            attempts_count = get_failed_attempts_count(username)
+            should_lock = await db_bulkhead.run(record_failed_attempt, username, client_ip, user_agent)
+            attempts_count = await db_bulkhead.run(get_failed_attempts_count, username)
             remaining_attempts = LOCKOUT_THRESHOLD - attempts_count
             
             if should_lock:
@@ -470,61 +881,29 @@ def login(username: str = Form(...), password: str = Form(...)):
                 )
         
         # Successful login - reset failed attempts and record success
-        reset_failed_attempts(username)
+        await db_bulkhead.run(reset_failed_attempts, username)
         
-        conn.search(
-            search_base=user_dn,
-            search_filter="(objectClass=*)",
-            attributes=["cn", "mail", "employeeType", "employeeNumber", "description"]
-        )
-        if not conn.entries:
-            raise HTTPException(status_code=404, detail="User not found in LDAP after bind")
-        entry = conn.entries[0]
-        role = entry.employeeType.value if "employeeType" in entry else "user"
+        role = record["role"]
         
         # Get authorization level from description field
-        auth_level = 1  # Default level
-        if "description" in entry and entry.description.value:
-            desc = entry.description.value
-            if desc.startswith("auth_level:"):
-                try:
-                    auth_level = int(desc.split(":")[1])
-                except (ValueError, IndexError):
-                    auth_level = 1
+        auth_level = record["auth_level"]
         
         # Record successful login in database
-        try:
-            db_service.record_login_attempt(username, 'success')
-            # Upsert user in database for metadata tracking with correct role and auth level
-            db_service.upsert_user(username, user_dn, role, auth_level)
-        except Exception as e:
-            print(f"Error recording successful login: {e}")
+        await db_bulkhead.run(record_successful_login, username, user_dn, role, auth_level, client_ip, user_agent)
         
-        # Ensure LDAP employeeNumber matches persistent DB employee_id
-        try:
-            db_conn = db_service.get_connection()
-            db_employee_id = None
-            if db_conn:
-                with db_conn.cursor() as cursor:
-                    cursor.execute("SELECT employee_id FROM users WHERE username = %s", (username,))
-                    res = cursor.fetchone()
-                    if res and res[0]:
-                        db_employee_id = res[0]
-            ldap_employee_num = entry.employeeNumber.value if hasattr(entry, 'employeeNumber') else None
-            if db_employee_id and db_employee_id != ldap_employee_num:
-                # Update LDAP to persist the DB employee_id
-                conn_admin = Connection(Server(LDAP_SERVER, get_info=ALL), user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-                conn_admin.modify(user_dn, {"employeeNumber": [(MODIFY_REPLACE, [db_employee_id])]})
-                print(f"✅ Synchronized LDAP employeeNumber for {username} to {db_employee_id}")
-        except Exception as sync_err:
-            print(f"⚠️ Could not synchronize LDAP employeeNumber for {username}: {sync_err}")
+        # The upsert above may have bumped the claims version; reload it
+        # (LDAP employeeNumber drift is fixed by employee_number_reconciler, not here)
+        claims = await db_bulkhead.run(user_claims.load, username)
+        # The database holds admin role changes the outbox has not written to LDAP yet
+        if claims and claims.get("role"):
+            role = claims["role"]
 
         # Generate both access and refresh tokens
-        access_token = generate_access_token(username, role)
-        refresh_token, refresh_token_id = generate_refresh_token(username)
+        access_token = generate_access_token(username, role, record["name"], claims)
+        refresh_token, refresh_token_id = await db_bulkhead.run(generate_refresh_token, username)
         
         # Clean up expired tokens periodically
-        cleanup_expired_tokens()
+        await db_bulkhead.run(cleanup_expired_tokens)
         
         return {
             "message": "Login successful",
@@ -549,11 +928,22 @@ def login(username: str = Form(...), password: str = Form(...)):
         )
 
 @app.post("/refresh")
-def refresh_access_token(refresh_token: str = Form(...)):
+async def refresh_access_token(refresh_token: str = Form(...)):
     """Refresh an access token using a valid refresh token"""
+    # Several tabs and retrying interceptors refresh with the same token at
+    # once; within a short window they all get the same freshly minted token
+    claims = decode_refresh_token(refresh_token)
+    token_id = claims["jti"]
+    if revocation_set.is_revoked(token_id):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    return await refresh_idempotency.run(token_id, mint_refreshed_access_token, refresh_token,
+                                         owner=claims.get("sub"))
+
+async def mint_refreshed_access_token(refresh_token: str) -> dict:
+    """Verify a refresh token and mint a new access token from current LDAP data"""
     try:
         # Verify the refresh token
-        payload = verify_refresh_token(refresh_token)
+        payload = await db_bulkhead.run(verify_refresh_token, refresh_token)
         username = payload.get("sub")
         
         if not username:
@@ -561,39 +951,31 @@ def refresh_access_token(refresh_token: str = Form(...)):
         
         # Get user role from LDAP
         user_dn = f"uid={username},{LDAP_BASE_DN}"
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        
-        conn.search(
-            search_base=user_dn,
-            search_filter="(objectClass=*)",
-            attributes=["employeeType", "description"]
-        )
+        entry = await coalesced_ldap_read(fetch_ldap_user, username, ["cn", "employeeType", "description"])
         
-        if not conn.entries:
+        if entry is None:
             raise HTTPException(status_code=404, detail="User not found")
             
-        entry = conn.entries[0]
         role = entry.employeeType.value if "employeeType" in entry else "user"
         
         # Get authorization level from description field
-        auth_level = 1  # Default level
-        if "description" in entry and entry.description.value:
-            desc = entry.description.value
-            if desc.startswith("auth_level:"):
-                try:
-                    auth_level = int(desc.split(":")[1])
-                except (ValueError, IndexError):
-                    auth_level = 1
+        auth_level = parse_auth_level(entry)
         
         # Update database with current auth level from LDAP
-        try:
-            db_service.upsert_user(username, user_dn, role, auth_level)
-        except Exception as e:
-            print(f"Error updating user auth level during refresh: {e}")
+        def update_user():
+            try:
+                db_service.upsert_user(username, user_dn, role, auth_level)
+            except Exception as e:
+                print(f"Error updating user auth level during refresh: {e}")
+            return user_claims.load(username)
+        claims = await db_bulkhead.run(update_user)
+        # The database holds admin role changes the outbox has not written to LDAP yet
+        if claims and claims.get("role"):
+            role = claims["role"]
         
         # Generate new access token
-        new_access_token = generate_access_token(username, role)
+        name = entry.cn.value if "cn" in entry else None
+        new_access_token = generate_access_token(username, role, name, claims)
         
         return {
             "access_token": new_access_token,
@@ -611,16 +993,18 @@ def refresh_access_token(refresh_token: str = Form(...)):
         raise HTTPException(status_code=401, detail=f"Token refresh failed: {str(e)}")
 
 @app.post("/logout")
-def logout(request: Request, refresh_token: str = Form(...)):
+async def logout(request: Request, refresh_token: str = Form(...)):
     """Logout and revoke refresh token"""
-    try:
+    def verify_and_revoke():
         # Verify the refresh token and get its ID
         payload = verify_refresh_token(refresh_token)
         token_id = payload.get("jti")
         
         if token_id:
             revoke_refresh_token(token_id)
-            
+    
+    try:
+        await db_bulkhead.run(verify_and_revoke)
         return {"message": "Logged out successfully"}
         
     except HTTPException:
@@ -630,14 +1014,15 @@ def logout(request: Request, refresh_token: str = Form(...)):
         return {"message": "Logged out successfully"}
 
 @app.post("/logout-all")
-def logout_all_devices(request: Request):
+async def logout_all_devices(request: Request):
     """Logout from all devices by revoking all refresh tokens for the user"""
     try:
         payload = get_jwt_payload(request)
         username = payload.get("sub")
         
         if username:
-            revoke_all_user_tokens(username)
+            await db_bulkhead.run(revoke_all_user_tokens, username)
+            await db_bulkhead.run(invalidate_access_tokens, username)
             
         return {"message": "Logged out from all devices successfully"}
         
@@ -646,11 +1031,22 @@ def logout_all_devices(request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Logout failed: {str(e)}")
 
+def get_lockout_summary(username: str) -> dict:
+    """Collect lockout state for a user from the database"""
+    is_locked = is_account_locked(username)
+    remaining_time = get_lockout_remaining_time(username) if is_locked else None
+    failed_count = get_failed_attempts_count(username)
+    return {
+        "is_locked": is_locked,
+        "remaining_lockout_time": remaining_time,
+        "failed_attempts": failed_count
+    }
+
 @app.get("/lockout-status/{username}")
-def get_lockout_status(username: str):
+async def get_lockout_status(username: str):
     """Get the current lockout status of an account (public endpoint)"""
     # Only check lockout status for existing users
-    if not user_exists_in_ldap(username):
+    if not await coalesced_ldap_read(user_exists_in_ldap, username):
         return {
             "username": username,
             "user_exists": False,
@@ -661,59 +1057,146 @@ def get_lockout_status(username: str):
             "lockout_threshold": LOCKOUT_THRESHOLD
         }
     
-    is_locked = is_account_locked(username)
-    remaining_time = get_lockout_remaining_time(username) if is_locked else None
-    failed_count = get_failed_attempts_count(username)
+    summary = await db_bulkhead.run(get_lockout_summary, username)
+    is_locked = summary["is_locked"]
+    failed_count = summary["failed_attempts"]
     remaining_attempts = LOCKOUT_THRESHOLD - failed_count if failed_count > 0 and not is_locked else None
     
     return {
         "username": username,
         "user_exists": True,
         "is_locked": is_locked,
-        "remaining_lockout_time": remaining_time,
+        "remaining_lockout_time": summary["remaining_lockout_time"],
         "failed_attempts": failed_count,
         "remaining_attempts": remaining_attempts,
         "lockout_threshold": LOCKOUT_THRESHOLD
     }
 
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+EVENT_STREAM_TICKET_TTL = int(os.environ.get('EVENT_STREAM_TICKET_TTL', '30'))
+
+def event_stream_response(events, request: Request, username: str, lockout: bool = False) -> StreamingResponse:
+    """Answer with a server-sent event stream.
+
+    New streams are rate limited per client IP (429), each username may
+    hold EVENT_STREAM_MAX_PER_USER streams and, for the public lockout
+    streams, each client IP EVENT_STREAM_MAX_PER_IP (429); the hub answers
+    503 once its pool is full.  The slots are given back when the stream ends.
+    """
+    client_ip = get_client_ip(request) or "unknown"
+    allowed, retry_after = event_stream_ip_limiter.acquire(client_ip)
+    if not allowed:
+        raise HTTPException(status_code=429, detail="Too many event streams opened, poll instead",
+                            headers={"Retry-After": str(retry_after)})
+    if not event_hub.accepting(lockout):
+        raise HTTPException(status_code=503, detail="Too many event streams, poll instead", headers={"Retry-After": "30"})
+    
+    slots = [(event_stream_user_slots, username.lower())]
+    if lockout:
+        slots.append((event_stream_ip_slots, client_ip))
+    taken = []
+    for limiter, key in slots:
+        if not limiter.acquire(key):
+            for held, held_key in taken:
+                held.release(held_key)
+            raise HTTPException(status_code=429, detail="Too many open event streams, poll instead",
+                                headers={"Retry-After": "30"})
+        taken.append((limiter, key))
+    
+    def release():
+        # Called when the stream ends and again after the response (a stream never started)
+        while taken:
+            limiter, key = taken.pop()
+            limiter.release(key)
+    
+    async def stream():
+        try:
+            async for chunk in events:
+                yield chunk
+        finally:
+            release()
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=EVENT_STREAM_HEADERS,
+                             background=BackgroundTask(release))
+
+def generate_stream_ticket(payload: dict) -> str:
+    """A ticket, good for EVENT_STREAM_TICKET_TTL seconds, that only opens the user's /events/session stream"""
+    now = datetime.utcnow()
+    ticket = {
+        "sub": payload["sub"],
+        "iat": now,
+        "exp": now + timedelta(seconds=EVENT_STREAM_TICKET_TTL),
+        "type": "stream",
+        "te": payload.get("te", 0),
+        "sx": payload["exp"]  # the stream still ends when the access token expires
+    }
+    return cipher_suite.encrypt(jwt.encode(ticket, JWE_SECRET_KEY, algorithm="HS256").encode()).decode()
+
+def verify_stream_ticket(ticket: str) -> dict:
+    """Check a stream ticket; returns the stream's owner ("sub") and end ("exp")"""
+    try:
+        payload = jwt.decode(cipher_suite.decrypt(ticket.encode()), JWE_SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Stream ticket expired")
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    if payload.get("type") != "stream":
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    if payload.get("te", 0) < token_epochs.current(payload.get("sub")):
+        raise HTTPException(status_code=401, detail="Access token revoked")
+    return {"sub": payload["sub"], "exp": payload["sx"]}
+
+@app.get("/events/lockout/{username}")
+async def lockout_events(username: str, request: Request):
+    """Server-sent events replacing /lockout-status polling (public endpoint)
+
+    Sends `locked` with the seconds left, then `lockout_expired` as soon as
+    the lockout runs out or an admin unlocks the account, and closes.
+    """
+    async def remaining_time():
+        return await db_bulkhead.run(get_lockout_remaining_time, username)
+    return event_stream_response(event_hub.lockout_events(username, remaining_time), request, username, lockout=True)
+
 # Add endpoint to check account status (for debugging/admin purposes)
 @app.get("/admin/account-status/{username}")
-def get_account_status(username: str, payload: dict = Depends(require_admin)):
+async def get_account_status(username: str, payload: dict = Depends(require_admin)):
     """Get the current lockout status of an account"""
-    is_locked = is_account_locked(username)
-    failed_count = get_failed_attempts_count(username)
-    remaining_time = get_lockout_remaining_time(username) if is_locked else None
+    summary = await db_bulkhead.run(get_lockout_summary, username)
     
     return {
         "username": username,
-        "is_locked": is_locked,
-        "failed_attempts": failed_count,
-        "remaining_lockout_time": remaining_time,
+        "is_locked": summary["is_locked"],
+        "failed_attempts": summary["failed_attempts"],
+        "remaining_lockout_time": summary["remaining_lockout_time"],
         "lockout_threshold": LOCKOUT_THRESHOLD,
         "lockout_duration": LOCKOUT_DURATION
     }
 
 # Add endpoint to manually unlock account (admin only)
 @app.post("/admin/unlock-account")
-def unlock_account(username: str = Form(...), payload: dict = Depends(require_admin)):
+async def unlock_account(username: str = Form(...), payload: dict = Depends(require_admin)):
     """Manually unlock a locked account"""
     admin_username = payload.get("sub")
-    reset_failed_attempts(username)
     
-    # Record admin action
-    try:
-        db_service.record_admin_action(admin_username, 'unlock_account', username)
-    except Exception as e:
-        print(f"Error recording admin action: {e}")
+    def unlock_and_audit():
+        reset_failed_attempts(username)
+        invalidation_bus.publish(LOCKOUT_CHANGED, username)
+        
+        # Record admin action
+        try:
+            db_service.record_admin_action(admin_username, 'unlock_account', username)
+        except Exception as e:
+            print(f"Error recording admin action: {e}")
     
+    await db_bulkhead.run(unlock_and_audit)
     return {"message": f"Account {username} has been unlocked and failed attempts reset"}
 
 @app.get("/admin/refresh-tokens")
-def list_refresh_tokens(payload: dict = Depends(require_admin)):
+async def list_refresh_tokens(payload: dict = Depends(require_admin)):
     """List all active refresh tokens (admin only)"""
     try:
         # Get active tokens from database
-        active_tokens = db_service.get_active_refresh_tokens()
+        active_tokens = await db_bulkhead.run(db_service.get_active_refresh_tokens)
         
         # Format tokens for response
         formatted_tokens = []
@@ -728,26 +1211,27 @@ def list_refresh_tokens(payload: dict = Depends(require_admin)):
             })
         
         return {"active_refresh_tokens": formatted_tokens, "total": len(formatted_tokens)}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error getting refresh tokens from database: {e}")
         # Fallback to in-memory tokens
         active_tokens = []
         now = datetime.utcnow()
         
-        for token_id, token_data in refresh_tokens.items():
-            if token_data["is_active"] and now <= token_data["expires_at"]:
-                active_tokens.append({
-                    "token_id": token_id,
-                    "username": token_data["username"],
-                    "created_at": token_data["created_at"].isoformat(),
-                    "expires_at": token_data["expires_at"].isoformat(),
-                    "days_remaining": (token_data["expires_at"] - now).days
-                })
+        for token in fallback_tokens.active_tokens():
+            active_tokens.append({
+                "token_id": token.token_id,
+                "username": token.username,
+                "created_at": token.created_at.isoformat(),
+                "expires_at": token.expires_at.isoformat(),
+                "days_remaining": (token.expires_at - now).days
+            })
         
         return {"active_refresh_tokens": active_tokens, "total": len(active_tokens)}
 
 @app.post("/verify-token")
-def verify_token(token: str = Form(...)):
+async def verify_token(token: str = Form(...)):
     """Verify a token (backwards compatibility)"""
     try:
         payload = verify_access_token(token)
@@ -774,236 +1258,299 @@ def verify_token(token: str = Form(...)):
             "error": "Invalid token"
         }
 
+@app.post("/events/session/ticket")
+async def session_event_ticket(request: Request):
+    """Exchange the access token (Authorization header) for a short-lived ticket opening /events/session
+
+    EventSource cannot set headers, and a query string ends up in proxy and
+    access logs, so the stream is opened with ?ticket= rather than the
+    access token itself.
+    """
+    payload = get_jwt_payload(request)
+    return {"ticket": generate_stream_ticket(payload), "expires_in": EVENT_STREAM_TICKET_TTL}
+
+@app.get("/events/session")
+async def session_events(request: Request, ticket: Optional[str] = None):
+    """Server-sent events about the caller's session, so pages need not re-verify their token
+
+    Sends `role_changed`, `resync` (check the token again) and finally
+    `session_revoked` or `session_expired`, after which the stream closes.
+    Authenticate with an Authorization header or ?ticket= from
+    POST /events/session/ticket.
+    """
+    payload = verify_stream_ticket(ticket) if ticket else get_jwt_payload(request)
+    return event_stream_response(event_hub.session_events(payload["sub"], payload["exp"]), request, payload["sub"])
+
 # --- ADMIN ENDPOINTS ---
 
 @app.get("/admin/users")
-def list_users(payload: dict = Depends(require_admin)):
-    """Get all users from LDAP with employee IDs from database - Admin only"""
+async def list_users(request: Request, payload: dict = Depends(require_admin)):
+    """Get all users from LDAP with employee IDs from database - Admin only (supports If-None-Match)"""
     try:
         print("DEBUG: Admin users endpoint called")
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        
-        conn.search(
-            search_base=LDAP_BASE_DN,
-            search_filter="(objectClass=inetOrgPerson)",
-            attributes=["uid", "cn", "employeeType", "description", "employeeNumber"]
-        )
+        etag, not_modified = check_listing_etag(request, "users")
+        if not_modified:
+            return not_modified
         
-        users = []
-        for entry in conn.entries:
-            auth_level = 1
-            if "description" in entry and entry.description.value:
-                desc = entry.description.value
-                if desc.startswith("auth_level:"):
-                    try:
-                        auth_level = int(desc.split(":")[1])
-                    except (ValueError, IndexError):
-                        auth_level = 1
-            
-            # Get employee_id from database
-            employee_id = None
-            try:
-                db_conn = db_service.get_connection()
-                if db_conn:
-                    with db_conn.cursor() as cursor:
-                        cursor.execute("SELECT employee_id FROM users WHERE username = %s", (entry.uid.value,))
-                        result = cursor.fetchone()
-                        if result:
-                            employee_id = result[0]
-            except Exception as e:
-                print(f"DEBUG: Error getting employee_id for {entry.uid.value}: {e}")
-            
-            users.append({
-                "uid": entry.uid.value,
-                "cn": entry.cn.value,
-                "role": entry.employeeType.value if "employeeType" in entry else "user",
-                "authorization_level": auth_level,
-                "employee_id": employee_id
-            })
+        async def attach_employee_ids(records):
+            # One database query per LDAP page for the persistent employee ids
+            employee_ids = await db_bulkhead.run(db_service.get_employee_ids, [record["uid"] for record in records])
+            return [user_summary(record, employee_ids.get(record["uid"])) for record in records]
         
-        print(f"DEBUG: Found {len(users)} users")
-        return {"users": users}
+        response = await stream_json_list("users", "(objectClass=inetOrgPerson)", USER_SUMMARY_ATTRIBUTES, attach_employee_ids)
+        set_listing_etag(response, etag)
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error in list_users: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get users: {str(e)}")
 
+@app.get("/admin/users/search")
+async def search_users(
+    q: str = "",
+    field: str = "any",
+    role: Optional[str] = None,
+    authorization_level: Optional[int] = None,
+    sort: str = "uid",
+    order: str = "asc",
+    offset: int = 0,
+    limit: int = 50,
+    payload: dict = Depends(require_admin),
+):
+    """Prefix search, filter, sort and page users from the in-memory directory - Admin only"""
+    if field not in SEARCH_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of: {', '.join(SEARCH_FIELDS)}")
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if not user_directory.loaded:
+        raise HTTPException(status_code=503, detail="User directory is still loading", headers={"Retry-After": "5"})
+    
+    total, users = user_directory.search(q, field, role, authorization_level, sort, order == "desc", offset, limit)
+    return {
+        "users": users,
+        "total": total,
+        "offset": offset,
+        "limit": min(limit, user_directory.max_page_size),
+        "directory_age_seconds": user_directory.stats()["age_seconds"]
+    }
+
 @app.get("/admin/users-db")
-def list_users_from_db(payload: dict = Depends(require_admin)):
+async def list_users_from_db(payload: dict = Depends(require_admin)):
     """Get all users from database - Admin only"""
     try:
         print("DEBUG: Admin users-db endpoint called")
-        users = db_service.get_all_users()
+        users = await db_bulkhead.run(db_service.get_all_users)
         print(f"DEBUG: Found {len(users)} users in database")
         return {"users": users}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error in list_users_from_db: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get users from database: {str(e)}")
 
+LDAP_SYNC_ATTRIBUTES = ["uid", "cn", "mail", "employeeType", "employeeNumber", "description"]
+
+def ldap_sync_record(record: dict) -> dict:
+    """The user dict db_service.sync_ldap_users_to_db expects for one LDAP record"""
+    return {
+        "uid": record["uid"],
+        "dn": record["dn"],
+        "cn": record["cn"],
+        "mail": record["mail"],
+        "role": record["employeeType"] or "user",
+        "employee_id": record["employeeNumber"],
+        "authorization_level": auth_level_from_description(record["description"])
+    }
+
+def sync_ldap_users_job(params: dict, progress) -> dict:
+    """Background /admin/sync-ldap-users (re-running it is harmless: every write is an upsert)"""
+    synced = 0
+    for page in batched(stream_ldap_users("(objectClass=inetOrgPerson)", LDAP_SYNC_ATTRIBUTES)):
+        db_service.sync_ldap_users_to_db([ldap_sync_record(record) for record in page])
+        synced += len(page)
+        progress(synced)
+    invalidation_bus.publish(USERS_SYNCED)
+    return {"message": f"Successfully synced {synced} LDAP users to database", "users_synced": synced}
+
+async def submit_admin_job(job_type: str, params: dict, payload: dict) -> JSONResponse:
+    """Queue a background admin job and answer 202 with where to poll for it"""
+    try:
+        job_id = await db_bulkhead.run(job_queue.submit, job_type, params, payload.get("sub"))
+    except DatabaseUnavailableError:
+        raise HTTPException(status_code=503, detail="Database unavailable, cannot queue job", headers={"Retry-After": "5"})
+    return JSONResponse(status_code=202, content={
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/admin/jobs/{job_id}"
+    })
+
 @app.post("/admin/sync-ldap-users")
-def sync_ldap_users_to_database(payload: dict = Depends(require_admin)):
-    """Sync all LDAP users to database permanently"""
+async def sync_ldap_users_to_database(background: bool = Form(False), payload: dict = Depends(require_admin)):
+    """Sync all LDAP users to database permanently (as a background job with background=true)"""
+    if background:
+        return await submit_admin_job("sync_ldap_users", {}, payload)
     try:
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        conn.search(
-            search_base=LDAP_BASE_DN,
-            search_filter="(objectClass=inetOrgPerson)",
-            attributes=["uid", "cn", "mail", "employeeType", "employeeNumber", "description"]
-        )
-        
-        ldap_users = []
-        for entry in conn.entries:
-            # Parse authorization level from description field
-            auth_level = 1  # Default level
-            if "description" in entry and entry.description.value:
-                desc = entry.description.value
-                if desc.startswith("auth_level:"):
-                    try:
-                        auth_level = int(desc.split(":")[1])
-                    except (ValueError, IndexError):
-                        auth_level = 1
-            
-            ldap_users.append({
-                "uid": entry.uid.value,
-                "dn": str(entry.entry_dn),
-                "cn": entry.cn.value,
-                "mail": entry.mail.value if "mail" in entry else None,
-                "role": entry.employeeType.value if "employeeType" in entry else "user",
-                "employee_id": entry.employeeNumber.value if hasattr(entry, 'employeeNumber') else None,
-                "authorization_level": auth_level
-            })
+        records = stream_ldap_users("(objectClass=inetOrgPerson)", LDAP_SYNC_ATTRIBUTES)
+        pages = batched(records)
         
-        # Sync to database
-        db_service.sync_ldap_users_to_db(ldap_users)
+        # Sync each LDAP page to the database as it arrives
+        synced = 0
+        try:
+            while True:
+                page = await next_ldap_page(pages)
+                if page is None:
+                    break
+                ldap_users = [ldap_sync_record(record) for record in page]
+                await db_bulkhead.run(db_service.sync_ldap_users_to_db, ldap_users)
+                synced += len(ldap_users)
+        finally:
+            records.close()
         
-        return {"message": f"Successfully synced {len(ldap_users)} LDAP users to database", "users_synced": len(ldap_users)}
-    except Exception as e:
+        await db_bulkhead.run(invalidation_bus.publish, USERS_SYNCED)
+        return {"message": f"Successfully synced {synced} LDAP users to database", "users_synced": synced}
+    except HTTPException:
+        raise
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to sync LDAP users: {str(e)}")
 
 @app.post("/admin/reset-password")
-def reset_password(username: str = Form(...), new_password: str = Form(...), payload: dict = Depends(require_admin)):
-    user_dn = f"uid={username},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-    success = conn.modify(user_dn, {"userPassword": [(MODIFY_REPLACE, [new_password])]})
+async def reset_password(username: str = Form(...), new_password: str = Form(...), payload: dict = Depends(require_admin)):
+    success = await ldap_bulkhead.run(modify_ldap_user, username, {"userPassword": [(MODIFY_REPLACE, [new_password])]})
     if not success:
         raise HTTPException(status_code=400, detail="Failed to reset password")
+    await db_bulkhead.run(invalidation_bus.publish, PASSWORD_CHANGED, username)
     return {"message": f"Password reset for {username}"}
 
+def apply_role_change_in_db(username: str, new_role: str, admin_username: str, client_ip: Optional[str]) -> tuple:
+    """Move a user to a new role in the database; returns (old_role, old_employee_id, new_employee_id).
+
+    The audit record and the outbox row for the LDAP side (employeeType and
+    employeeNumber) commit in the same transaction.
+    """
+    db_conn = db_service.get_connection()
+    if db_conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    with db_service.transaction(db_conn):
+        return _apply_role_change(db_conn, username, new_role, admin_username, client_ip)
+
+def _apply_role_change(db_conn, username: str, new_role: str, admin_username: str, client_ip: Optional[str]) -> tuple:
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT role, authorization_level, employee_id FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found in database")
+        
+        current_role, auth_level, old_employee_id = user
+        print(f"📊 Current role: {current_role}, New role: {new_role}, Current employee_id: {old_employee_id}")
+        
+        # Generate new employee ID for the new role
+        new_employee_id = db_service.employee_ids.next(new_role, cursor)
+        print(f"✅ Generated new employee_id: {new_employee_id} for user {username}")
+        
+        # Update user role and employee_id in users table
+        cursor.execute("UPDATE users SET role = %s, employee_id = %s, claims_version = claims_version + 1, updated_at = NOW() WHERE username = %s", 
+                     (new_role, new_employee_id, username))
+        print(f"✅ Updated role and employee_id in users table for {username}")
+        
+        # Remove from old role table
+        if current_role == 'operator':
+            cursor.execute("DELETE FROM operators WHERE username = %s", (username,))
+            print(f"✅ Removed {username} from operators table")
+        elif current_role == 'personnel':
+            cursor.execute("DELETE FROM personnel WHERE username = %s", (username,))
+            print(f"✅ Removed {username} from personnel table")
+        
+        # Add to new role table using database service
+        if new_role == 'operator':
+            db_service._upsert_operator(cursor, username, new_employee_id, auth_level)
+            print(f"✅ Added {username} to operators table")
+        elif new_role == 'personnel':
+            db_service._upsert_personnel(cursor, username, new_employee_id, auth_level)
+            print(f"✅ Added {username} to personnel table")
+        
+        db_service.insert_admin_action(
+            cursor,
+            admin_username=admin_username,
+            action_type="change_role",
+            target_username=username,
+            action_details={
+                "old_role": current_role,
+                "new_role": new_role,
+                "old_employee_id": old_employee_id,
+                "new_employee_id": new_employee_id
+            },
+            ip_address=client_ip
+        )
+        # The new employee ID is unique, so it identifies this change
+        db_service.enqueue_ldap_change(cursor, f"change_role:{username}:{new_employee_id}", username,
+                                       {"employeeType": [new_role], "employeeNumber": [new_employee_id]})
+        
+        print(f"✅ Prepared database changes for {username}")
+        return current_role, old_employee_id, new_employee_id
+
 @app.post("/admin/change-role")
-def change_role(username: str = Form(...), new_role: str = Form(...), payload: dict = Depends(require_admin), request: Request = None):
-    """Change user role in both LDAP and database"""
+async def change_role(username: str = Form(...), new_role: str = Form(...), payload: dict = Depends(require_admin), request: Request = None):
+    """Change a user's role in the database now and in LDAP through the outbox relay"""
     try:
         print(f"🔄 Starting role change for {username} to {new_role}")
+        client_ip = request.client.host if request and request.client else None
+        current_role, old_employee_id, new_employee_id = await db_bulkhead.run(
+            apply_role_change_in_db, username, new_role, payload.get("sub"), client_ip
+        )
+        print(f"✅ Committed role change for {username}; LDAP update queued")
+        ldap_outbox.wake()
         
-        # Update LDAP first
-        user_dn = f"uid={username},{LDAP_BASE_DN}"
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        success = conn.modify(user_dn, {"employeeType": [(MODIFY_REPLACE, [new_role])]})
-        if not success:
-            raise HTTPException(status_code=400, detail="Failed to change role in LDAP")
-        
-        print(f"✅ Successfully updated role in LDAP for {username}")
+        await db_bulkhead.run(invalidation_bus.publish, USER_CHANGED, username)
+        await db_bulkhead.run(invalidation_bus.publish, ROLE_CHANGED, username)
+        # Access tokens carry the old role; force the user to re-authenticate
+        await db_bulkhead.run(invalidate_access_tokens, username)
         
-        # Update database using the simplified database service
-        try:
-            # Get current user info from database
-            db_conn = db_service.get_connection()
-            with db_conn.cursor() as cursor:
-                cursor.execute("SELECT role, authorization_level, employee_id FROM users WHERE username = %s", (username,))
-                user = cursor.fetchone()
-                
-                if not user:
-                    raise HTTPException(status_code=404, detail="User not found in database")
-                
-                current_role, auth_level, old_employee_id = user
-                print(f"📊 Current role: {current_role}, New role: {new_role}, Current employee_id: {old_employee_id}")
-                
-                # Generate new employee ID for the new role
-                try:
-                    cursor.execute("SELECT get_next_employee_id(%s)", (new_role,))
-                    result = cursor.fetchone()
-                    if result:
-                        new_employee_id = result[0]
-                        print(f"✅ Generated new employee_id: {new_employee_id} for user {username}")
-                    else:
-                        # Fallback if function doesn't work
-                        new_employee_id = f"{new_role.upper()}_01"
-                        print(f"⚠️ Using fallback employee_id: {new_employee_id} for user {username}")
-                except Exception as e:
-                    print(f"❌ Error generating employee_id: {e}")
-                    # Fallback employee_id
-                    new_employee_id = f"{new_role.upper()}_01"
-                    print(f"⚠️ Using fallback employee_id: {new_employee_id} for user {username}")
-                
-                # Update user role and employee_id in users table
-                cursor.execute("UPDATE users SET role = %s, employee_id = %s, updated_at = NOW() WHERE username = %s", 
-                             (new_role, new_employee_id, username))
-                print(f"✅ Updated role and employee_id in users table for {username}")
-                
-                # Remove from old role table
-                if current_role == 'operator':
-                    cursor.execute("DELETE FROM operators WHERE username = %s", (username,))
-                    print(f"✅ Removed {username} from operators table")
-                elif current_role == 'personnel':
-                    cursor.execute("DELETE FROM personnel WHERE username = %s", (username,))
-                    print(f"✅ Removed {username} from personnel table")
-                
-                # Add to new role table using database service
-                if new_role == 'operator':
-                    db_service._upsert_operator(cursor, username, new_employee_id, auth_level)
-                    print(f"✅ Added {username} to operators table")
-                elif new_role == 'personnel':
-                    db_service._upsert_personnel(cursor, username, new_employee_id, auth_level)
-                    print(f"✅ Added {username} to personnel table")
-                
-                db_conn.commit()
-                print(f"✅ Successfully committed database changes for {username}")
-
-                # Persist updated employee_id to LDAP so it remains across restarts
-                try:
-                    admin_conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-                    admin_conn.modify(user_dn, {"employeeNumber": [(MODIFY_REPLACE, [new_employee_id])]})
-                    print(f"✅ Updated LDAP employeeNumber for {username} to {new_employee_id}")
-                except Exception as ldap_set_err:
-                    print(f"⚠️ Failed to update LDAP employeeNumber for {username}: {ldap_set_err}")
-                
-                # Record admin action
-                client_ip = request.client.host if request and request.client else None
-                db_service.record_admin_action(
-                    admin_username=payload.get("sub"),
-                    action_type="change_role",
-                    target_username=username,
-                    action_details={
-                        "old_role": current_role,
-                        "new_role": new_role,
-                        "old_employee_id": old_employee_id,
-                        "new_employee_id": new_employee_id
-                    },
-                    ip_address=client_ip
-                )
-                
-                return {"message": f"Role changed for {username} from {current_role} to {new_role} with employee ID {new_employee_id}"}
-                
-        except Exception as e:
-            print(f"❌ Error updating database: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to update database: {str(e)}")
-            
+        return {"message": f"Role changed for {username} from {current_role} to {new_role} with employee ID {new_employee_id}"}
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error changing role: {str(e)}")
 
+def apply_authorization_level_in_db(username: str, authorization_level: int):
+    """Update a user's authorization level in the users and role-specific tables.
+
+    The outbox row for the LDAP description commits in the same transaction.
+    """
+    db_conn = db_service.get_connection()
+    if db_conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    with db_service.transaction(db_conn):
+        _apply_authorization_level(db_conn, username, authorization_level)
+
+def _apply_authorization_level(db_conn, username: str, authorization_level: int):
+    with db_conn.cursor() as cursor:
+        # Update authorization level in users table
+        cursor.execute("UPDATE users SET authorization_level = %s, claims_version = claims_version + 1, updated_at = NOW() WHERE username = %s", (authorization_level, username))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="User not found in database")
+        
+        # Update authorization level in role-specific tables
+        cursor.execute("UPDATE operators SET access_level = %s, updated_at = NOW() WHERE username = %s", (authorization_level, username))
+        print(f"Updated operators table for {username} to level {authorization_level}")
+        cursor.execute("UPDATE personnel SET access_level = %s, updated_at = NOW() WHERE username = %s", (authorization_level, username))
+        print(f"Updated personnel table for {username} to level {authorization_level}")
+        
+        db_service.enqueue_ldap_change(cursor, f"auth_level:{username}:{uuid.uuid4().hex}", username,
+                                       {"description": [f"auth_level:{authorization_level}"]})
+
 @app.post("/admin/change-authorization-level")
-def change_authorization_level(
+async def change_authorization_level(
     username: str = Form(...), 
     authorization_level: int = Form(...), 
     payload: dict = Depends(require_admin)
 ):
-    """Change user authorization level in both LDAP and database"""
+    """Change a user's authorization level in the database now and in LDAP through the outbox relay"""
     try:
         print(f"Starting auth level change for {username} to level {authorization_level}")
         
@@ -1011,31 +1558,11 @@ def change_authorization_level(
         if authorization_level < 1 or authorization_level > 5:
             raise HTTPException(status_code=400, detail="Authorization level must be between 1 and 5")
         
-        # Update LDAP
-        user_dn = f"uid={username},{LDAP_BASE_DN}"
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        
-        # Store authorization level in description field
-        auth_level_desc = f"auth_level:{authorization_level}"
-        success = conn.modify(user_dn, {"description": [(MODIFY_REPLACE, [auth_level_desc])]})
-        
-        if not success:
-            raise HTTPException(status_code=400, detail="Failed to change authorization level in LDAP")
-        
-        # Update database
-        db_conn = db_service.get_connection()
-        with db_conn.cursor() as cursor:
-            # Update authorization level in users table
-            cursor.execute("UPDATE users SET authorization_level = %s, updated_at = NOW() WHERE username = %s", (authorization_level, username))
-            
-            # Update authorization level in role-specific tables
-            cursor.execute("UPDATE operators SET access_level = %s, updated_at = NOW() WHERE username = %s", (authorization_level, username))
-            print(f"Updated operators table for {username} to level {authorization_level}")
-            cursor.execute("UPDATE personnel SET access_level = %s, updated_at = NOW() WHERE username = %s", (authorization_level, username))
-            print(f"Updated personnel table for {username} to level {authorization_level}")
-            
-            db_conn.commit()
+        # The LDAP description (auth_level:N) follows through the outbox relay
+        await db_bulkhead.run(apply_authorization_level_in_db, username, authorization_level)
+        ldap_outbox.wake()
+        await db_bulkhead.run(invalidation_bus.publish, USER_CHANGED, username)
+        await db_bulkhead.run(invalidate_access_tokens, username)
         
         return {"message": f"Authorization level changed for {username} to level {authorization_level} in both LDAP and database"}
         
@@ -1044,35 +1571,129 @@ def change_authorization_level(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error changing authorization level: {str(e)}")
 
+BULK_CHANGE_MAX_USERS = int(os.environ.get("BULK_CHANGE_MAX_USERS", "1000"))
+
+class RoleChange(BaseModel):
+    username: str
+    new_role: str
+
+class AuthorizationLevelChange(BaseModel):
+    username: str
+    authorization_level: int
+
+def publish_bulk_change(outcomes: dict):
+    """Invalidate caches and access tokens of the users a bulk change moved"""
+    for username, outcome in outcomes.items():
+        if outcome["status"] != "changed":
+            continue
+        # The token epoch was bumped in the same transaction
+        token_epochs.observe(username, outcome.pop("token_epoch", None))
+        invalidation_bus.publish(USER_CHANGED, username)
+        if "new_role" in outcome:
+            invalidation_bus.publish(ROLE_CHANGED, username)
+        invalidation_bus.publish(TOKEN_EPOCH_BUMPED, username)
+
+async def run_bulk_change(changes: list, field: str, check, apply, payload: dict, request: Request) -> dict:
+    """Validate a bulk change, apply it in one database transaction and report per-user outcomes.
+
+    `check(value)` returns an error message or None; `apply(changes, admin,
+    client_ip)` is the database_service bulk method.  The LDAP side follows
+    through the outbox relay.
+    """
+    if len(changes) > BULK_CHANGE_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_CHANGE_MAX_USERS} users per request")
+    occurrences = Counter(change.username for change in changes)
+    valid = {}
+    errors = {}
+    for change in changes:
+        value = getattr(change, field)
+        if not change.username:
+            error = "username is required"
+        elif occurrences[change.username] > 1:
+            error = "Duplicate username in this request"
+        else:
+            error = check(value)
+        if error:
+            errors[change.username] = error
+        else:
+            valid[change.username] = value
+    
+    client_ip = request.client.host if request and request.client else None
+    try:
+        outcomes = await db_bulkhead.run(apply, valid, payload.get("sub"), client_ip) if valid else {}
+    except DatabaseUnavailableError:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error applying bulk change: {str(e)}")
+    
+    if any(outcome["status"] == "changed" for outcome in outcomes.values()):
+        ldap_outbox.wake()
+        await db_bulkhead.run(publish_bulk_change, outcomes)
+    
+    results = [
+        {"username": change.username, **(outcomes.get(change.username) or {"status": "invalid", "error": errors.get(change.username)})}
+        for change in changes
+    ]
+    summary = Counter(result["status"] for result in results)
+    print(f"✅ Bulk {field} change by {payload.get('sub')}: {summary['changed']} of {len(results)} users changed")
+    return {
+        "total": len(results),
+        "changed": summary["changed"],
+        "unchanged": summary["unchanged"],
+        "not_found": summary["not_found"],
+        "invalid": summary["invalid"],
+        "results": results
+    }
+
+@app.post("/admin/bulk-change-role")
+async def bulk_change_role(changes: List[RoleChange], payload: dict = Depends(require_admin), request: Request = None):
+    """Change the role of many users at once - Admin only
+
+    Body: a JSON list of {"username", "new_role"}.  Every database change
+    (new employee IDs, operators/personnel moves, audit records, outbox rows)
+    commits in one transaction; the LDAP modifies are applied by the outbox
+    relay over one admin connection per batch.
+    """
+    return await run_bulk_change(
+        changes, "new_role", lambda role: None if role.strip() else "new_role is required",
+        db_service.apply_role_changes, payload, request
+    )
+
+@app.post("/admin/bulk-change-authorization-level")
+async def bulk_change_authorization_level(changes: List[AuthorizationLevelChange], payload: dict = Depends(require_admin),
+                                          request: Request = None):
+    """Change the authorization level of many users at once - Admin only
+
+    Body: a JSON list of {"username", "authorization_level"}; applied like
+    /admin/bulk-change-role.
+    """
+    return await run_bulk_change(
+        changes, "authorization_level",
+        lambda level: None if 1 <= level <= 5 else "Authorization level must be between 1 and 5",
+        db_service.apply_authorization_levels, payload, request
+    )
+
 @app.get("/user/authorization-level/{username}")
-def get_user_authorization_level(username: str, request: Request):
+async def get_user_authorization_level(username: str, request: Request):
     """Get user's authorization level - accessible by authenticated users"""
     # Validate JWT token
     payload = get_jwt_payload(request)
     
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
+    # Callers asking about themselves are answered from their token's claims
+    if payload.get("sub") == username and "authorization_level" in payload and await claims_are_current(payload):
+        auth_level = payload["authorization_level"]
+        return {
+            "username": username,
+            "authorization_level": auth_level,
+            "level_description": get_authorization_level_description(auth_level)
+        }
     
-    user_dn = f"uid={username},{LDAP_BASE_DN}"
-    conn.search(
-        search_base=user_dn,
-        search_filter="(objectClass=inetOrgPerson)",
-        attributes=["description"]
-    )
+    entry = await coalesced_ldap_read(fetch_ldap_user, username, ["description"], "(objectClass=inetOrgPerson)")
     
-    if not conn.entries:
+    if entry is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    entry = conn.entries[0]
-    auth_level = 1  # Default level
-    
-    if "description" in entry and entry.description.value:
-        desc = entry.description.value
-        if desc.startswith("auth_level:"):
-            try:
-                auth_level = int(desc.split(":")[1])
-            except (ValueError, IndexError):
-                auth_level = 1
+    auth_level = parse_auth_level(entry)
     
     return {
         "username": username,
@@ -1121,7 +1742,7 @@ def validate_password_strength(password: str) -> dict:
     }
 
 @app.post("/admin/reset-password-with-validation")
-def reset_password_with_validation(
+async def reset_password_with_validation(
     username: str = Form(...), 
     new_password: str = Form(...), 
     confirm_password: str = Form(...),
@@ -1145,124 +1766,90 @@ def reset_password_with_validation(
         )
     
     # Reset the password in LDAP
-    user_dn = f"uid={username},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-    success = conn.modify(user_dn, {"userPassword": [(MODIFY_REPLACE, [new_password])]})
+    success = await ldap_bulkhead.run(modify_ldap_user, username, {"userPassword": [(MODIFY_REPLACE, [new_password])]})
     
     if not success:
         raise HTTPException(status_code=400, detail="Failed to reset password")
     
+    await db_bulkhead.run(invalidation_bus.publish, PASSWORD_CHANGED, username)
     return {"message": f"Password reset successfully for {username}"}
 
-@app.post("/admin/create-user")
-def create_user(
-    username: str = Form(...),
-    password: str = Form(...),
-    name: str = Form(...),
-    role: str = Form(...),
-    authorization_level: int = Form(None),  # Will be set based on role
-    payload: dict = Depends(require_admin),
-    request: Request = None,
-):
-    # Set default authorization level based on role if not provided
-    if authorization_level is None:
-        role_defaults = {
-            "admin": 5,      # Maximum access
-            "operator": 3,   # Moderate access
-            "personnel": 1   # Basic access
-        }
-        authorization_level = role_defaults.get(role, 1)
-    
-    # Validate authorization level
-    if authorization_level < 1 or authorization_level > 5:
-        raise HTTPException(status_code=400, detail="Authorization level must be between 1 and 5")
-    
+def add_ldap_user(username: str, password: str, name: str, role: str, authorization_level: int,
+                  employee_id: str = None):
+    """Create a user entry in LDAP"""
+    user_dn = f"uid={username},{LDAP_BASE_DN}"
+    attributes = {
+        "uid": username,
+        "cn": name,
+        "sn": name.split(" ")[-1] if " " in name else name,
+        "userPassword": password,
+        "employeeType": role,
+        "description": f"auth_level:{authorization_level}",
+    }
+    if employee_id:
+        attributes["employeeNumber"] = employee_id
+    conn = get_ldap_admin_connection()
+    conn.add(user_dn, ["inetOrgPerson", "top"], attributes)
+    if not conn.result["description"] == "success":
+        raise Exception(conn.result["description"])
+
+async def provision_user(username: str, password: str, name: str, role: str, authorization_level: int,
+                         admin_username: str, client_ip: Optional[str]) -> dict:
+    """Create a user in LDAP, then sync it to the database with a persistent employee ID.
+
+    The employee ID is issued before the LDAP add so employeeNumber goes in
+    with the entry, and the users row, role table row and audit record
+    commit in one database transaction.
+    """
     user_dn = f"uid={username},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
     
     try:
-        # Create user in LDAP first
-        conn.add(
-            user_dn,
-            ["inetOrgPerson", "top"],
-            {
-                "uid": username,
-                "cn": name,
-                "sn": name.split(" ")[-1] if " " in name else name,
-                "userPassword": password,
-                "employeeType": role,
-                "description": f"auth_level:{authorization_level}",
-            },
-        )
-        if not conn.result["description"] == "success":
-            raise Exception(conn.result["description"])
+        # Issued locally from a reserved block; without one the user still gets created
+        employee_id = None
+        try:
+            employee_id = await db_bulkhead.run(db_service.employee_ids.next, role)
+            print(f"✅ Generated employee_id: {employee_id} for user {username}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"⚠️ Could not issue employee_id for {username}: {e}")
+        
+        # Create user in LDAP first (the password never leaves this request)
+        await ldap_bulkhead.run(add_ldap_user, username, password, name, role, authorization_level, employee_id)
         
         print(f"✅ Successfully created user {username} in LDAP")
         
         # Sync the new user to database with persistent employee ID
         try:
-            # Generate employee_id first
-            employee_id = None
-            try:
-                # Try to get employee_id from database function
-                db_conn = db_service.get_connection()
-                if db_conn:
-                    with db_conn.cursor() as cursor:
-                        cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-                        result = cursor.fetchone()
-                        if result:
-                            employee_id = result[0]
-                            print(f"✅ Generated employee_id: {employee_id} for user {username}")
-                        else:
-                            # Fallback employee_id
-                            employee_id = f"{role.upper()}_01"
-                            print(f"⚠️ Using fallback employee_id: {employee_id} for user {username}")
-                else:
-                    # Fallback employee_id if no database connection
-                    employee_id = f"{role.upper()}_01"
-                    print(f"⚠️ Using fallback employee_id: {employee_id} for user {username} (no DB connection)")
-            except Exception as e:
-                print(f"⚠️ Error generating employee_id: {e}")
-                # Fallback employee_id
-                employee_id = f"{role.upper()}_01"
-                print(f"⚠️ Using fallback employee_id: {employee_id} for user {username}")
-            
-            # Use database service to create user with the generated employee_id
-            user_id = db_service.upsert_user(
+            if employee_id is None:
+                raise Exception("no employee_id could be issued")
+            await db_bulkhead.run(
+                db_service.upsert_user,
                 username=username,
                 ldap_dn=user_dn,
                 role=role,
                 authorization_level=authorization_level,
-                employee_id=employee_id
+                employee_id=employee_id,
+                admin_action={
+                    "admin_username": admin_username,
+                    "action_type": "create_user",
+                    "target_username": username,
+                    "action_details": {
+                        "role": role,
+                        "authorization_level": authorization_level,
+                        "employee_id": employee_id
+                    },
+                    "ip_address": client_ip
+                }
             )
             
             print(f"✅ Successfully synced user {username} to database with employee_id {employee_id}")
-
-            # Persist employee_id to LDAP so it remains across restarts
-            try:
-                conn.modify(user_dn, {"employeeNumber": [(MODIFY_REPLACE, [employee_id])]})
-                print(f"✅ Set LDAP employeeNumber for {username} to {employee_id}")
-            except Exception as ldap_set_err:
-                print(f"⚠️ Failed to set LDAP employeeNumber for {username}: {ldap_set_err}")
-            
-            # Record admin action
-            db_service.record_admin_action(
-                admin_username=payload.get("sub"),  # Use "sub" from JWT payload
-                action_type="create_user",
-                target_username=username,
-                action_details={
-                    "role": role,
-                    "authorization_level": authorization_level,
-                    "employee_id": employee_id
-                },
-                ip_address=request.client.host if request else None
-            )
-            print(f"✅ Successfully recorded admin action for user {username}")
+            await db_bulkhead.run(invalidation_bus.publish, USER_CHANGED, username)
             
             return {"message": f"User {username} created successfully with authorization level {authorization_level} and employee ID {employee_id}"}
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"❌ Error: Failed to sync new user to database: {e}")
             # Don't fail the entire operation, but log the error
@@ -1271,38 +1858,114 @@ def create_user(
             
     except LDAPEntryAlreadyExistsResult:
         raise HTTPException(status_code=400, detail="User already exists")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to create user: {e}")
 
+@app.post("/admin/create-user")
+async def create_user(
+    username: str = Form(...),
+    password: str = Form(...),
+    name: str = Form(...),
+    role: str = Form(...),
+    authorization_level: int = Form(None),  # Will be set based on role
+    payload: dict = Depends(require_admin),
+    request: Request = None,
+):
+    # Set default authorization level based on role if not provided
+    if authorization_level is None:
+        role_defaults = {
+            "admin": 5,      # Maximum access
+            "operator": 3,   # Moderate access
+            "personnel": 1   # Basic access
+        }
+        authorization_level = role_defaults.get(role, 1)
+    
+    # Validate authorization level
+    if authorization_level < 1 or authorization_level > 5:
+        raise HTTPException(status_code=400, detail="Authorization level must be between 1 and 5")
+    
+    return await provision_user(
+        username, password, name, role, authorization_level,
+        admin_username=payload.get("sub"),  # Use "sub" from JWT payload
+        client_ip=request.client.host if request and request.client else None
+    )
+
+def get_user_role_and_employee_id(username: str):
+    """Get (role, employee_id) for a user from the database, or None"""
+    db_conn = db_service.get_connection()
+    with db_conn.cursor() as cursor:
+        cursor.execute("SELECT role, employee_id FROM users WHERE username = %s", (username,))
+        return cursor.fetchone()
+
+def delete_ldap_user(username: str) -> bool:
+    """Delete a user's entry from LDAP"""
+    conn = get_ldap_admin_connection()
+    return conn.delete(f"uid={username},{LDAP_BASE_DN}")
+
+def delete_user_job(params: dict, progress) -> dict:
+    """Background /admin/delete-user; a resumed job skips the LDAP entry if it is already gone"""
+    username = params["username"]
+    progress(0, 3)
+    if not delete_ldap_user(username) and user_exists_in_ldap(username, raise_unavailable=True):
+        raise Exception("Failed to delete user from LDAP")
+    progress(1, 3)
+    db_service.remove_user_completely(username)
+    invalidation_bus.publish(USER_DELETED, username)
+    progress(2, 3)
+    db_service.record_admin_action(
+        admin_username=params["admin_username"],
+        action_type="delete_user",
+        target_username=username,
+        action_details={
+            "user_dn": f"uid={username},{LDAP_BASE_DN}",
+            "old_role": params.get("old_role"),
+            "old_employee_id": params.get("old_employee_id"),
+            "job_id": progress.job_id
+        },
+        ip_address=params.get("ip_address")
+    )
+    progress(3, 3)
+    return {"message": f"User {username} deleted from both LDAP and database"}
+
 @app.post("/admin/delete-user")
-def delete_user(
+async def delete_user(
     username: str = Form(...),
+    background: bool = Form(False),
     payload: dict = Depends(require_admin),
     request: Request = None,
 ):
     try:
         # First, get user info from database for audit
-        db_conn = db_service.get_connection()
-        with db_conn.cursor() as cursor:
-            cursor.execute("SELECT role, employee_id FROM users WHERE username = %s", (username,))
-            user_info = cursor.fetchone()
+        user_info = await db_bulkhead.run(get_user_role_and_employee_id, username)
+        
+        if background:
+            # Audit details are captured now: a resumed job may run after the rows are gone
+            return await submit_admin_job("delete_user", {
+                "username": username,
+                "admin_username": payload.get("sub"),
+                "old_role": user_info[0] if user_info else None,
+                "old_employee_id": user_info[1] if user_info else None,
+                "ip_address": request.client.host if request and request.client else None
+            }, payload)
         
         # Delete from LDAP
         user_dn = f"uid={username},{LDAP_BASE_DN}"
-        server = Server(LDAP_SERVER, get_info=ALL)
-        conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-        success = conn.delete(user_dn)
+        success = await ldap_bulkhead.run(delete_ldap_user, username)
         if not success:
             raise HTTPException(status_code=400, detail="Failed to delete user from LDAP")
         
         # Remove user from database and related data
         try:
-            db_service.remove_user_completely(username)
+            await db_bulkhead.run(db_service.remove_user_completely, username)
             print(f"Successfully removed user {username} from database")
+            await db_bulkhead.run(invalidation_bus.publish, USER_DELETED, username)
             
             # Record admin action
             client_ip = request.client.host if request and request.client else None
-            db_service.record_admin_action(
+            await db_bulkhead.run(
+                db_service.record_admin_action,
                 admin_username=payload.get("sub"),  # Use "sub" from JWT payload
                 action_type="delete_user",
                 target_username=username,
@@ -1316,6 +1979,8 @@ def delete_user(
             
             return {"message": f"User {username} deleted from both LDAP and database"}
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Warning: Failed to remove user from database: {e}")
             # Still return success since LDAP deletion worked
@@ -1327,66 +1992,176 @@ def delete_user(
         raise HTTPException(status_code=500, detail=f"Failed to delete user: {str(e)}")
 
 @app.get("/users/for-operator")
-def users_for_operator(request: Request):
+async def users_for_operator(request: Request):
     payload = get_jwt_payload(request)
     if payload.get("role") != "operator":
         raise HTTPException(status_code=403, detail="Operator access required")
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-    conn.search(
-        search_base=LDAP_BASE_DN,
-        search_filter="(&(objectClass=inetOrgPerson)(employeeType=personnel))",
-        attributes=["uid", "cn", "employeeType", "employeeNumber"]
+    etag, not_modified = check_listing_etag(request, "personnel")
+    if not_modified:
+        return not_modified
+    
+    async def to_personnel(records):
+        return [{
+            "uid": record["uid"],
+            "cn": record["cn"],
+            "role": record["employeeType"],
+            "employee_id": record["employeeNumber"]
+        } for record in records]
+    
+    response = await stream_json_list(
+        "personnel",
+        "(&(objectClass=inetOrgPerson)(employeeType=personnel))",
+        ["uid", "cn", "employeeType", "employeeNumber"],
+        to_personnel
     )
-    users = []
-    for entry in conn.entries:
-        users.append({
-            "uid": entry.uid.value,
-            "cn": entry.cn.value,
-            "role": entry.employeeType.value if "employeeType" in entry else None,
-            "employee_id": entry.employeeNumber.value if hasattr(entry, 'employeeNumber') else None
-        })
-    return {"personnel": users}
+    set_listing_etag(response, etag)
+    return response
 
 @app.get("/users/operator-count")
-def operator_count(request: Request):
+async def operator_count(request: Request, response: Response):
     payload = get_jwt_payload(request)
     if payload.get("role") != "personnel":
         raise HTTPException(status_code=403, detail="Personnel access required")
+    etag, not_modified = check_listing_etag(request, "operator-count")
+    if not_modified:
+        return not_modified
     
     # Get operator count from database
-    operators = db_service.get_operators()
+    operators = await db_bulkhead.run(db_service.get_operators)
+    set_listing_etag(response, etag)
     return {"operator_count": len(operators)}
 
 @app.get("/admin/operators")
-def get_operators(payload: dict = Depends(require_admin)):
+async def get_operators(payload: dict = Depends(require_admin)):
     """Get all operators from database - Admin only"""
     try:
         print("DEBUG: Admin operators endpoint called")
-        operators = db_service.get_operators()
+        operators = await db_bulkhead.run(db_service.get_operators)
         print(f"DEBUG: Found {len(operators)} operators")
         return {"operators": operators}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error in get_operators: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get operators: {str(e)}")
 
 @app.get("/admin/personnel")
-def get_personnel(payload: dict = Depends(require_admin)):
+async def get_personnel(payload: dict = Depends(require_admin)):
     """Get all personnel from database - Admin only"""
     try:
         print("DEBUG: Admin personnel endpoint called")
-        personnel = db_service.get_personnel()
+        personnel = await db_bulkhead.run(db_service.get_personnel)
         print(f"DEBUG: Found {len(personnel)} personnel")
         return {"personnel": personnel}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Error in get_personnel: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get personnel: {str(e)}")
 
+DASHBOARD_SECTION_TIMEOUT = float(os.environ.get("DASHBOARD_SECTION_TIMEOUT", "3"))
+
+ROLE_TABLE_FIELDS = ("username", "employee_id", "access_level", "last_login_at")
+
+def get_role_tables() -> dict:
+    """Compact operators and personnel rows for the admin dashboard"""
+    return {
+        "operators": [{field: row.get(field) for field in ROLE_TABLE_FIELDS} for row in db_service.get_operators()],
+        "personnel": [{field: row.get(field) for field in ROLE_TABLE_FIELDS} for row in db_service.get_personnel()]
+    }
+
+def summarize_sessions(counts: Optional[dict]) -> dict:
+    if counts is None:
+        raise DatabaseUnavailableError("database unavailable")
+    return {"active": sum(counts.values()), "users": len(counts), "by_user": counts}
+
+def summarize_lockouts(rows: Optional[list]) -> dict:
+    if rows is None:
+        raise DatabaseUnavailableError("database unavailable")
+    return {
+        "locked": sum(1 for row in rows if row["is_locked"]),
+        "with_failed_attempts": sum(1 for row in rows if row["failed_attempts"]),
+        "users": rows
+    }
+
+async def directory_listing(limit: int) -> dict:
+    """The dashboard's user list: from the in-memory directory, or LDAP while it is still loading.
+
+    `more` says whether there are users beyond the page; straight from LDAP
+    only one page is read, so the total is unknown (None) when there are.
+    """
+    if user_directory.loaded:
+        total, users = user_directory.search(sort="employee_id", limit=limit)
+        return {"items": users, "total": total, "more": total > len(users), "source": "directory"}
+    users = await ldap_bulkhead.run(first_directory_users, limit + 1)
+    more = len(users) > limit
+    return {"items": users[:limit], "total": None if more else len(users), "more": more, "source": "ldap"}
+
+async def run_dashboard_section(call, timeout: float) -> tuple:
+    """Await one section until its deadline; returns (result, error, elapsed ms).
+
+    A section past its deadline is left to finish in the background (a
+    worker thread cannot be interrupted) instead of holding up the response.
+    """
+    started = time.perf_counter()
+    task = asyncio.ensure_future(call)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    elapsed = round((time.perf_counter() - started) * 1000, 1)
+    if not done:
+        return None, f"timed out after {timeout:g}s", elapsed
+    try:
+        return task.result(), None, elapsed
+    except HTTPException as e:
+        return None, str(e.detail), elapsed
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__, elapsed
+
+@app.get("/admin/dashboard")
+async def admin_dashboard(users_limit: int = None, payload: dict = Depends(require_admin)):
+    """Everything the admin dashboard shows on load, in one request - Admin only
+
+    The user list, role tables, active session counts, lockout summary and
+    dead-lettered LDAP changes are fetched concurrently, each with its own DASHBOARD_SECTION_TIMEOUT
+    deadline.  A section that fails or times out is null and listed under
+    "errors"; "timings_ms" has the time spent on each section.
+    """
+    started = time.perf_counter()
+    limit = user_directory.max_page_size if users_limit is None else max(0, min(users_limit, user_directory.max_page_size))
+    
+    async def sessions():
+        return summarize_sessions(await db_bulkhead.run(db_service.get_session_counts))
+    
+    async def lockouts():
+        return summarize_lockouts(await db_bulkhead.run(db_service.get_lockout_overview))
+    
+    sections = {
+        "users": directory_listing(limit),
+        "role_tables": db_bulkhead.run(get_role_tables),
+        "sessions": sessions(),
+        "lockouts": lockouts(),
+        "ldap_outbox_dead_letters": db_bulkhead.run(db_service.get_ldap_outbox_dead_letters, 20)
+    }
+    outcomes = await asyncio.gather(*(run_dashboard_section(call, DASHBOARD_SECTION_TIMEOUT) for call in sections.values()))
+    
+    response = {"admin": {"username": payload.get("sub"), "role": payload.get("role")}}
+    errors = {}
+    timings = {}
+    for name, (result, error, elapsed) in zip(sections, outcomes):
+        response[name] = result
+        timings[name] = elapsed
+        if error:
+            errors[name] = error
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    response["errors"] = errors
+    response["timings_ms"] = timings
+    return response
+
 @app.get("/admin/user/{employee_id}")
-def get_user_by_employee_id(employee_id: str, payload: dict = Depends(require_admin)):
+async def get_user_by_employee_id(employee_id: str, payload: dict = Depends(require_admin)):
     """Get user by employee ID"""
     try:
-        user = db_service.get_user_by_employee_id(employee_id)
+        user = await db_bulkhead.run(db_service.get_user_by_employee_id, employee_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return {"user": user}
@@ -1395,77 +2170,149 @@ def get_user_by_employee_id(employee_id: str, payload: dict = Depends(require_ad
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user: {str(e)}")
 
+def sync_user_role_tables(username: str) -> dict:
+    """Add a database user to the role-specific table for their role"""
+    # Get user from database
+    conn = db_service.get_connection()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    with db_service.transaction(conn), conn.cursor() as cursor:
+        cursor.execute("SELECT username, role, employee_id, authorization_level FROM users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+    
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found in database")
+    
+        username, role, employee_id, auth_level = user
+    
+        # Generate employee ID if missing
+        if not employee_id:
+            employee_id = db_service.employee_ids.next(role, cursor)
+            cursor.execute("UPDATE users SET employee_id = %s, claims_version = claims_version + 1 WHERE username = %s", (employee_id, username))
+    
+        # Add to appropriate table
+        if role == 'operator':
+            cursor.execute("""
+                INSERT INTO operators (username, employee_id, full_name, access_level)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (username) DO UPDATE SET
+                    employee_id = EXCLUDED.employee_id,
+                    access_level = EXCLUDED.access_level,
+                    updated_at = NOW()
+            """, (username, employee_id, username, auth_level))
+        elif role == 'personnel':
+            cursor.execute("""
+                INSERT INTO personnel (username, employee_id, full_name, access_level)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (username) DO UPDATE SET
+                    employee_id = EXCLUDED.employee_id,
+                    access_level = EXCLUDED.access_level,
+                    updated_at = NOW()
+            """, (username, employee_id, username, auth_level))
+    invalidation_bus.publish(USER_CHANGED, username)
+    return {"message": f"Successfully synced user {username} to {role} table with employee_id {employee_id}"}
+
+def sync_user_to_tables_job(params: dict, progress) -> dict:
+    """Background /admin/sync-user-to-tables"""
+    return sync_user_role_tables(params["username"])
+
 @app.post("/admin/sync-user-to-tables")
-def sync_user_to_tables(username: str = Form(...), payload: dict = Depends(require_admin)):
+async def sync_user_to_tables(username: str = Form(...), background: bool = Form(False),
+                              payload: dict = Depends(require_admin)):
     """Manually sync a user to the appropriate role-specific table"""
+    if background:
+        return await submit_admin_job("sync_user_to_tables", {"username": username}, payload)
     try:
-        # Get user from database
-        conn = db_service.get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT username, role, employee_id, authorization_level FROM users WHERE username = %s", (username,))
-            user = cursor.fetchone()
-            
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found in database")
-            
-            username, role, employee_id, auth_level = user
-            
-            # Generate employee ID if missing
-            if not employee_id:
-                cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-                employee_id = cursor.fetchone()[0]
-                cursor.execute("UPDATE users SET employee_id = %s WHERE username = %s", (employee_id, username))
-            
-            # Add to appropriate table
-            if role == 'operator':
-                cursor.execute("""
-                    INSERT INTO operators (username, employee_id, full_name, access_level)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (username) DO UPDATE SET
-                        employee_id = EXCLUDED.employee_id,
-                        access_level = EXCLUDED.access_level,
-                        updated_at = NOW()
-                """, (username, employee_id, username, auth_level))
-            elif role == 'personnel':
-                cursor.execute("""
-                    INSERT INTO personnel (username, employee_id, full_name, access_level)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (username) DO UPDATE SET
-                        employee_id = EXCLUDED.employee_id,
-                        access_level = EXCLUDED.access_level,
-                        updated_at = NOW()
-                """, (username, employee_id, username, auth_level))
-            
-            conn.commit()
-            return {"message": f"Successfully synced user {username} to {role} table with employee_id {employee_id}"}
-            
+        return await db_bulkhead.run(sync_user_role_tables, username)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error syncing user: {e}")
 
+@app.get("/admin/jobs/{job_id}")
+async def get_admin_job(job_id: int, payload: dict = Depends(require_admin)):
+    """Status, progress counters and result of a background admin job"""
+    try:
+        job = await db_bulkhead.run(db_service.get_job, job_id)
+    except DatabaseUnavailableError:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get job: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": job}
+
+@app.get("/admin/ldap-outbox/dead-letters")
+async def get_ldap_outbox_dead_letters(limit: int = 100, payload: dict = Depends(require_admin)):
+    """LDAP changes the outbox relay gave up on after LDAP_OUTBOX_MAX_ATTEMPTS - Admin only
+
+    Until a dead letter is retried or discarded, the database keeps the
+    user's role and level and LDAP still has the old values.
+    """
+    try:
+        rows = await db_bulkhead.run(db_service.get_ldap_outbox_dead_letters, max(1, min(limit, 1000)))
+    except DatabaseUnavailableError:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    return {"dead_letters": rows, "relay": ldap_outbox.stats()}
+
+async def resolve_ldap_outbox_dead_letter(row_id: int, retry: bool, request: Request, payload: dict) -> str:
+    try:
+        username = await db_bulkhead.run(db_service.resolve_ldap_outbox_dead_letter, row_id, retry,
+                                         payload.get("sub"), get_client_ip(request))
+    except OutboxRowSupersededError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DatabaseUnavailableError:
+        raise HTTPException(status_code=503, detail="Database unavailable", headers={"Retry-After": "5"})
+    if username is None:
+        raise HTTPException(status_code=404, detail="No dead-lettered LDAP change with that id")
+    return username
+
+@app.post("/admin/ldap-outbox/dead-letters/{row_id}/retry")
+async def retry_ldap_outbox_dead_letter(row_id: int, request: Request, payload: dict = Depends(require_admin)):
+    """Queue a dead-lettered LDAP change for the relay again - Admin only"""
+    username = await resolve_ldap_outbox_dead_letter(row_id, True, request, payload)
+    ldap_outbox.wake()
+    return {"message": f"LDAP change {row_id} for {username} queued again"}
+
+@app.post("/admin/ldap-outbox/dead-letters/{row_id}/discard")
+async def discard_ldap_outbox_dead_letter(row_id: int, request: Request, payload: dict = Depends(require_admin)):
+    """Give up on a dead-lettered LDAP change; LDAP's values win again at the next login or sync - Admin only"""
+    username = await resolve_ldap_outbox_dead_letter(row_id, False, request, payload)
+    return {"message": f"LDAP change {row_id} for {username} discarded"}
+
+# Long-running admin operations that can run on the background job workers
+job_queue.register("sync_ldap_users", sync_ldap_users_job)
+job_queue.register("delete_user", delete_user_job)
+job_queue.register("sync_user_to_tables", sync_user_to_tables_job)
+job_queue.start()
+
+# Apply the LDAP side of admin changes committed with an outbox row
+ldap_outbox.start(get_ldap_admin_connection, apply_outbox_change, on_outbox_applied)
+
 @app.get("/users/me")
-def get_my_info(request: Request):
+async def get_my_info(request: Request):
     payload = get_jwt_payload(request)
-    user_dn = f"uid={payload['sub']},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
-    conn.search(
-        search_base=user_dn,
-        search_filter="(objectClass=inetOrgPerson)",
-        attributes=["uid", "cn", "employeeType", "employeeNumber"]
+    if "name" in payload and await claims_are_current(payload):
+        return {
+            "uid": payload["sub"],
+            "cn": payload["name"],
+            "role": payload["role"],
+            "employee_id": payload.get("employee_id")
+        }
+    entry = await coalesced_ldap_read(
+        fetch_ldap_user,
+        payload['sub'],
+        ["uid", "cn", "employeeType", "employeeNumber"],
+        "(objectClass=inetOrgPerson)"
     )
-    if not conn.entries:
+    if entry is None:
         raise HTTPException(status_code=404, detail="User not found")
-    entry = conn.entries[0]
     # Prefer employee_id from database; fall back to LDAP employeeNumber
     employee_id = None
     try:
-        db_conn = db_service.get_connection()
-        if db_conn:
-            with db_conn.cursor() as cursor:
-                cursor.execute("SELECT employee_id FROM users WHERE username = %s", (payload['sub'],))
-                result = cursor.fetchone()
-                if result and result[0]:
-                    employee_id = result[0]
+        employee_id = await db_bulkhead.run(get_db_employee_id, payload['sub'])
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"DEBUG: Could not fetch employee_id from DB for {payload['sub']}: {e}")
     if not employee_id:
@@ -1479,7 +2326,7 @@ def get_my_info(request: Request):
     }
 
 @app.post("/admin/create-user-with-validation")
-def create_user_with_validation(
+async def create_user_with_validation(
     username: str = Form(...),
     password: str = Form(...),
     name: str = Form(...),
@@ -1511,104 +2358,235 @@ def create_user_with_validation(
     if authorization_level < 1 or authorization_level > 5:
         raise HTTPException(status_code=400, detail="Authorization level must be between 1 and 5")
     
-    user_dn = f"uid={username},{LDAP_BASE_DN}"
-    server = Server(LDAP_SERVER, get_info=ALL)
-    conn = Connection(server, user=LDAP_ADMIN_DN, password=LDAP_ADMIN_PASS, auto_bind=True)
+    return await provision_user(
+        username, password, name, role, authorization_level,
+        admin_username=payload.get("sub"),  # Use "sub" from JWT payload
+        client_ip=request.client.host if request and request.client else None
+    )
+
+# Bulk import settings
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get("BULK_IMPORT_BATCH_SIZE", "200"))
+BULK_IMPORT_MAX_ROWS = int(os.environ.get("BULK_IMPORT_MAX_ROWS", "10000"))
+BULK_IMPORT_PIPELINE_DEPTH = int(os.environ.get("BULK_IMPORT_PIPELINE_DEPTH", "32"))
+
+ROLE_DEFAULT_AUTH_LEVELS = {
+    "admin": 5,      # Maximum access
+    "operator": 3,   # Moderate access
+    "personnel": 1   # Basic access
+}
+
+def iter_import_rows(upload: UploadFile, file_format: str):
+    """Yield (row number, row dict or None if unparseable) from an uploaded CSV or NDJSON file"""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        # Row 1 is the header
+        for row_number, row in enumerate(csv.DictReader(text), start=2):
+            yield row_number, row
+        return
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row_number, row if isinstance(row, dict) else None
+
+def validate_import_row(row: Optional[dict], seen: set):
+    """Return (user, None) for a valid import row, or (None, error message)"""
+    if row is None:
+        return None, "Row could not be parsed"
+    username = str(row.get("username") or "").strip()
+    password = str(row.get("password") or "")
+    name = str(row.get("name") or "").strip()
+    role = str(row.get("role") or "").strip()
+    if not username or not password or not name or not role:
+        return None, "username, password, name and role are required"
+    if username.lower() in seen:
+        return None, "Duplicate username in this file"
     
+    level = row.get("authorization_level")
     try:
-        # Create user in LDAP first
-        conn.add(
-            user_dn,
+        authorization_level = int(level) if level not in (None, "") else ROLE_DEFAULT_AUTH_LEVELS.get(role, 1)
+    except (TypeError, ValueError):
+        return None, "authorization_level must be a number"
+    if authorization_level < 1 or authorization_level > 5:
+        return None, "Authorization level must be between 1 and 5"
+    
+    validation_result = validate_password_strength(password)
+    if not validation_result["valid"]:
+        return None, f"Password validation failed: {'; '.join(validation_result['errors'])}"
+    
+    seen.add(username.lower())
+    return {
+        "username": username,
+        "password": password,
+        "name": name,
+        "role": role,
+        "authorization_level": authorization_level,
+        "ldap_dn": f"uid={username},{LDAP_BASE_DN}"
+    }, None
+
+def open_pipelined_admin_connection():
+    """An admin connection that can have many requests in flight at once"""
+    return ldap_pool.connect(LDAP_ADMIN_DN, LDAP_ADMIN_PASS, client_strategy=ASYNC)
+
+def add_ldap_users_pipelined(conn, users: list) -> dict:
+    """Add users over one connection, keeping up to BULK_IMPORT_PIPELINE_DEPTH adds in flight.
+
+    Returns username -> None on success or the LDAP error description.
+    """
+    results = {}
+    in_flight = deque()
+    
+    def collect_oldest():
+        username, message_id = in_flight.popleft()
+        _, result = conn.get_response(message_id, timeout=ldap_pool.receive_timeout)
+        results[username] = None if result["result"] == 0 else result["description"]
+    
+    for user in users:
+        name = user["name"]
+        message_id = conn.add(
+            user["ldap_dn"],
             ["inetOrgPerson", "top"],
             {
-                "uid": username,
+                "uid": user["username"],
                 "cn": name,
                 "sn": name.split(" ")[-1] if " " in name else name,
-                "userPassword": password,
-                "employeeType": role,
-                "description": f"auth_level:{authorization_level}",
+                "userPassword": user["password"],
+                "employeeType": user["role"],
+                "description": f"auth_level:{user['authorization_level']}",
+                # Set with the add instead of a follow-up modify
+                "employeeNumber": user["employee_id"],
             },
         )
-        if not conn.result["description"] == "success":
-            raise Exception(conn.result["description"])
-        
-        print(f"✅ Successfully created user {username} in LDAP")
-        
-        # Sync the new user to database with persistent employee ID
+        in_flight.append((user["username"], message_id))
+        if len(in_flight) >= BULK_IMPORT_PIPELINE_DEPTH:
+            collect_oldest()
+    while in_flight:
+        collect_oldest()
+    return results
+
+def reserve_import_employee_ids(users: list):
+    """Give every user an employee_id, taking one block per role"""
+    by_role = {}
+    for user in users:
+        by_role.setdefault(user["role"], []).append(user)
+    for role, role_users in by_role.items():
+        for user, employee_id in zip(role_users, db_service.employee_ids.take(role, len(role_users))):
+            user["employee_id"] = employee_id
+
+async def import_user_batch(conn, rows: list, seen: set, admin_username: str, client_ip: Optional[str]) -> list:
+    """Validate, add to LDAP and insert into the database one batch of import rows"""
+    results = []
+    users = []
+    for row_number, row in rows:
+        user, error = validate_import_row(row, seen)
+        if error:
+            results.append({"row": row_number, "username": (row or {}).get("username"), "status": "error", "error": error})
+        else:
+            user["row"] = row_number
+            users.append(user)
+    if not users:
+        return results
+    
+    try:
+        await db_bulkhead.run(reserve_import_employee_ids, users)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return results + [{"row": user["row"], "username": user["username"], "status": "error",
+                           "error": f"Could not reserve employee ID: {e}"} for user in users]
+    
+    ldap_errors = await ldap_bulkhead.run(add_ldap_users_pipelined, conn, users)
+    created = [user for user in users if ldap_errors.get(user["username"]) is None]
+    for user in users:
+        if ldap_errors.get(user["username"]) is not None:
+            results.append({"row": user["row"], "username": user["username"], "status": "error",
+                            "error": f"Failed to create user: {ldap_errors[user['username']]}"})
+    
+    try:
+        await db_bulkhead.run(db_service.insert_imported_users, created, admin_username, client_ip)
+        db_error = None
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error: Failed to sync imported users to database: {e}")
+        db_error = str(e)
+    for user in created:
+        result = {"row": user["row"], "username": user["username"], "employee_id": user["employee_id"]}
+        if db_error:
+            result.update(status="created_in_ldap_only", error=f"Database sync failed: {db_error}")
+        else:
+            result["status"] = "created"
+        results.append(result)
+    return results
+
+@app.post("/admin/import-users")
+async def import_users(
+    file: UploadFile = File(...),
+    file_format: str = Form(None),
+    payload: dict = Depends(require_admin),
+    request: Request = None,
+):
+    """Create many users from an uploaded CSV (with header) or NDJSON file - Admin only
+
+    Columns/keys: username, password, name, role and optional authorization_level.
+    Rows are processed in batches: passwords are validated up front, employee
+    IDs are reserved in one block per role, LDAP adds are pipelined over one
+    admin connection and the database rows are inserted in one transaction.
+    """
+    file_format = (file_format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")).lower()
+    if file_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="file_format must be csv or ndjson")
+    
+    admin_username = payload.get("sub")
+    client_ip = request.client.host if request and request.client else None
+    conn = await ldap_bulkhead.run(open_pipelined_admin_connection)
+    
+    results = []
+    seen = set()
+    truncated = False
+    try:
+        batches = batched(iter_import_rows(file, file_format), BULK_IMPORT_BATCH_SIZE)
+        while True:
+            rows = await anyio.to_thread.run_sync(next, batches, None)
+            if rows is None:
+                break
+            if len(results) + len(rows) > BULK_IMPORT_MAX_ROWS:
+                # Import up to the limit and report that the rest was skipped
+                rows = rows[:BULK_IMPORT_MAX_ROWS - len(results)]
+                truncated = True
+            results.extend(await import_user_batch(conn, rows, seen, admin_username, client_ip))
+            if truncated:
+                break
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
         try:
-            # Generate employee_id first
-            employee_id = None
-            try:
-                # Try to get employee_id from database function
-                db_conn = db_service.get_connection()
-                if db_conn:
-                    with db_conn.cursor() as cursor:
-                        cursor.execute("SELECT get_next_employee_id(%s)", (role,))
-                        result = cursor.fetchone()
-                        if result:
-                            employee_id = result[0]
-                            print(f"✅ Generated employee_id: {employee_id} for user {username}")
-                        else:
-                            # Fallback employee_id
-                            employee_id = f"{role.upper()}_01"
-                            print(f"⚠️ Using fallback employee_id: {employee_id} for user {username}")
-                else:
-                    # Fallback employee_id if no database connection
-                    employee_id = f"{role.upper()}_01"
-                    print(f"⚠️ Using fallback employee_id: {employee_id} for user {username} (no DB connection)")
-            except Exception as e:
-                print(f"⚠️ Error generating employee_id: {e}")
-                # Fallback employee_id
-                employee_id = f"{role.upper()}_01"
-                print(f"⚠️ Using fallback employee_id: {employee_id} for user {username}")
-            
-            # Use database service to create user with the generated employee_id
-            user_id = db_service.upsert_user(
-                username=username,
-                ldap_dn=user_dn,
-                role=role,
-                authorization_level=authorization_level,
-                employee_id=employee_id
-            )
-            
-            print(f"✅ Successfully synced user {username} to database with employee_id {employee_id}")
+            conn.unbind()
+        except Exception:
+            pass
+        # Let every replica's user directory pick up whatever was created
+        if any(result["status"] != "error" for result in results):
+            await db_bulkhead.run(invalidation_bus.publish, USERS_IMPORTED)
+    
+    created = sum(1 for result in results if result["status"] == "created")
+    print(f"✅ Bulk import by {admin_username}: {created} of {len(results)} rows created")
+    return {
+        "total": len(results),
+        "created": created,
+        "failed": len(results) - created,
+        "truncated_at_max_rows": truncated,
+        "results": results
+    }
 
-            # Persist employee_id to LDAP so it remains across restarts
-            try:
-                conn.modify(user_dn, {"employeeNumber": [(MODIFY_REPLACE, [employee_id])]})
-                print(f"✅ Set LDAP employeeNumber for {username} to {employee_id}")
-            except Exception as ldap_set_err:
-                print(f"⚠️ Failed to set LDAP employeeNumber for {username}: {ldap_set_err}")
-            
-            # Record admin action
-            db_service.record_admin_action(
-                admin_username=payload.get("sub"),  # Use "sub" from JWT payload
-                action_type="create_user",
-                target_username=username,
-                action_details={
-                    "role": role,
-                    "authorization_level": authorization_level,
-                    "employee_id": employee_id
-                },
-                ip_address=request.client.host if request else None
-            )
-            print(f"✅ Successfully recorded admin action for user {username}")
-            
-            return {"message": f"User {username} created successfully with authorization level {authorization_level} and employee ID {employee_id}"}
-            
-        except Exception as e:
-            print(f"❌ Error: Failed to sync new user to database: {e}")
-            # Don't fail the entire operation, but log the error
-            # The user was created in LDAP successfully
-            return {"message": f"User {username} created in LDAP but database sync failed: {str(e)}"}
-            
-    except LDAPEntryAlreadyExistsResult:
-        raise HTTPException(status_code=400, detail="User already exists")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to create user: {e}")
+# Keep LDAP employeeNumber in line with the database's employee IDs
+employee_number_reconciler.start(get_ldap_admin_connection, open_pipelined_admin_connection, LDAP_BASE_DN,
+                                 lambda uid: invalidation_bus.publish(USER_CHANGED, uid))
 
 @app.get("/password-requirements")
-def get_password_requirements():
+async def get_password_requirements():
     """Get password requirements for frontend validation"""
     return {
         "requirements": [
@@ -1621,12 +2599,102 @@ def get_password_requirements():
         "min_length": 8
     }
 
+# --- PROFILING ENDPOINTS (enabled with PROFILING_ENABLED=true) ---
+
+def require_profiling_enabled():
+    """Reject profiling requests unless the pod was started with profiling enabled"""
+    if not profiling_service.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled on this instance")
+
+@app.get("/admin/profiling/cpu")
+async def profile_cpu(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    route: Optional[str] = None,
+    payload: dict = Depends(require_admin)
+):
+    """Sample live stacks for N seconds and return flamegraph-ready folded stacks - Admin only"""
+    require_profiling_enabled()
+    
+    # Restrict samples to the requested route: its handlers on the event loop
+    # thread and the worker threads tagged with it
+    target_codes = None
+    if route:
+        target_codes = {
+            r.endpoint.__code__ for r in app.routes
+            if getattr(r, "path", None) == route and hasattr(getattr(r, "endpoint", None), "__code__")
+        }
+        if not target_codes:
+            raise HTTPException(status_code=404, detail=f"No route matches {route}")
+    
+    try:
+        result = await anyio.to_thread.run_sync(profiling_service.sample_cpu, seconds, interval_ms, route, target_codes)
+    except ProfilingBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    result["route"] = route
+    return result
+
+@app.get("/admin/profiling/allocations")
+async def profile_allocations(
+    seconds: float = 10,
+    limit: int = 25,
+    payload: dict = Depends(require_admin)
+):
+    """Trace allocations for N seconds and return the top tracemalloc growth - Admin only"""
+    require_profiling_enabled()
+    try:
+        return await anyio.to_thread.run_sync(profiling_service.snapshot_allocations, seconds, limit)
+    except ProfilingBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @app.get("/health")
-def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "message": "Backend is running"}
+async def health_check():
+    """Health check endpoint (public: liveness and database readiness only)"""
+    return {
+        "status": "degraded" if db_service.is_degraded() else "healthy",
+        "message": "Backend is running",
+        "database": db_service.health()["state"]
+    }
+
+@app.get("/admin/health")
+async def admin_health_check(payload: dict = Depends(require_admin)):
+    """Dependency state and the stats of every subsystem - Admin only"""
+    return {
+        "status": "degraded" if db_service.is_degraded() else "healthy",
+        "database": db_service.health(),
+        "bulkheads": {
+            "ldap": ldap_bulkhead.stats(),
+            "database": db_bulkhead.stats(),
+            "password_hashing": hash_bulkhead.stats()
+        },
+        "ldap_pool": ldap_pool.stats(),
+        "ldap_bind_pool": ldap_bind_pool.stats(),
+        "ldap_single_flight": ldap_single_flight.stats(),
+        "refresh_idempotency": refresh_idempotency.stats(),
+        "user_claims": user_claims.stats(),
+        "token_epochs": token_epochs.stats(),
+        "credential_cache": credential_cache.stats(),
+        "user_directory": user_directory.stats(),
+        "jobs": job_queue.stats(),
+        "ldap_outbox": ldap_outbox.stats(),
+        "employee_number_reconciler": employee_number_reconciler.stats(),
+        "event_stream": event_hub.stats(),
+        "listing_version": listing_version.stats(),
+        "employee_ids": db_service.employee_ids.stats(),
+        "fallback_tokens": fallback_tokens.stats(),
+        "revocations": revocation_set.stats(),
+        "cache_invalidation": invalidation_bus.stats(),
+        "rate_limits": {
+            "login_ip": login_ip_limiter.stats(),
+            "login_user": login_user_limiter.stats(),
+            "event_stream_ip": event_stream_ip_limiter.stats(),
+            "event_stream_ip_open": event_stream_ip_slots.stats(),
+            "event_stream_user_open": event_stream_user_slots.stats()
+        }
+    }
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint"""
     return {"message": "LDAP-JWT Authentication Backend", "status": "running"}
@@ -0,0 +1,191 @@
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, Callable, List, Optional, Set
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Path template of the route the current request was routed to (set by main's middleware)
+request_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_route', default=None)
+
+class ProfilingBusyError(Exception):
+    """Raised when a profiling run is requested while another one is in progress"""
+    pass
+
+class ProfilingService:
+    """On-demand statistical CPU sampler and tracemalloc snapshots for live pods.
+
+    Nothing is installed while idle: the sampler thread only exists for the
+    duration of a run and tracemalloc is only started for an allocation run,
+    so there is no overhead unless an admin explicitly asks for a profile.
+
+    Route handlers are async and hand their LDAP/DB work to bulkhead worker
+    threads, whose stacks never contain the handler.  While profiling is
+    enabled those threads are tagged with the request's route (from the
+    `request_route` contextvar) for as long as they run its work, and the
+    sampler attributes them by that tag.  Samples are only kept for threads
+    that used CPU since the previous round, so threads blocked on a socket,
+    lock or the event loop's selector don't show up as hot.
+    """
+
+    MAX_DURATION_SECONDS = 120
+    MIN_INTERVAL_MS = 1
+
+    def __init__(self):
+        self.enabled = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+        self._run_lock = threading.Lock()
+        # Worker thread ident -> route whose work it is running
+        self._thread_routes: Dict[int, str] = {}
+
+    def bind_route(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap `func` (about to be sent to a worker thread) so that thread is tagged with the current route"""
+        route = request_route.get()
+        if not self.enabled or route is None:
+            return func
+
+        @functools.wraps(func)
+        def tagged(*args, **kwargs):
+            ident = threading.get_ident()
+            self._thread_routes[ident] = route
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._thread_routes.pop(ident, None)
+        return tagged
+
+    @staticmethod
+    def _cpu_time(thread_id: int) -> Optional[int]:
+        """CPU time used so far by a thread in nanoseconds, or None if it can't be read"""
+        try:
+            return time.clock_gettime_ns(time.pthread_getcpuclockid(thread_id))
+        except (AttributeError, OSError):
+            return None
+
+    def _acquire(self):
+        if not self._run_lock.acquire(blocking=False):
+            raise ProfilingBusyError("Another profiling run is already in progress")
+
+    def _clamp_duration(self, seconds: float) -> float:
+        return max(0.1, min(float(seconds), self.MAX_DURATION_SECONDS))
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def sample_cpu(self, seconds: float = 10, interval_ms: float = 5, route: Optional[str] = None,
+                   target_codes: Optional[Set[Any]] = None) -> Dict[str, Any]:
+        """Sample the stacks of all threads for `seconds` and return folded stacks.
+
+        If `route` is given, only threads running that route's work are kept:
+        worker threads tagged with the route, and stacks passing through one
+        of `target_codes` (the route's handlers, on the event loop thread).
+        Threads that used no CPU since the previous round are skipped where
+        per-thread CPU clocks are available (`cpu_filtered` in the result).
+        The result's `folded` field is in the `frame;frame;frame count`
+        format consumed by flamegraph.pl / speedscope.
+        """
+        self._acquire()
+        try:
+            duration = self._clamp_duration(seconds)
+            interval = max(self.MIN_INTERVAL_MS, float(interval_ms)) / 1000.0
+            sampler_ident = threading.get_ident()
+            cpu_filtered = self._cpu_time(sampler_ident) is not None
+            last_cpu: Dict[int, int] = {}
+            stacks: Counter = Counter()
+            samples = 0
+            skipped_idle = 0
+            deadline = time.monotonic() + duration
+
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == sampler_ident:
+                        continue
+                    if cpu_filtered:
+                        cpu = self._cpu_time(thread_id)
+                        previous = last_cpu.get(thread_id)
+                        if cpu is not None:
+                            last_cpu[thread_id] = cpu
+                        if cpu is None or previous is None or cpu == previous:
+                            skipped_idle += 1
+                            continue
+                    labels = []
+                    matched = route is None or self._thread_routes.get(thread_id) == route
+                    while frame is not None:
+                        if not matched and target_codes and frame.f_code in target_codes:
+                            matched = True
+                        labels.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    if matched and labels:
+                        stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+            return {
+                "duration_seconds": duration,
+                "interval_ms": interval * 1000,
+                "sampling_rounds": samples,
+                "cpu_filtered": cpu_filtered,
+                "idle_thread_samples_skipped": skipped_idle,
+                "distinct_stacks": len(stacks),
+                "folded": folded
+            }
+        finally:
+            self._run_lock.release()
+
+    def snapshot_allocations(self, seconds: float = 10, limit: int = 25,
+                             frames: int = 10) -> Dict[str, Any]:
+        """Trace allocations for `seconds` and return the top growth by line.
+
+        tracemalloc is started for the run and stopped again afterwards unless
+        it was already tracing when the run began.
+        """
+        self._acquire()
+        started_here = False
+        try:
+            duration = self._clamp_duration(seconds)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, int(frames)))
+                started_here = True
+
+            baseline = tracemalloc.take_snapshot()
+            time.sleep(duration)
+            snapshot = tracemalloc.take_snapshot()
+
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            baseline = baseline.filter_traces(filters)
+            snapshot = snapshot.filter_traces(filters)
+
+            top: List[Dict[str, Any]] = []
+            for stat in snapshot.compare_to(baseline, 'traceback')[:max(1, int(limit))]:
+                top.append({
+                    "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count": stat.count,
+                    "count_diff": stat.count_diff
+                })
+
+            current, peak = tracemalloc.get_traced_memory()
+            return {
+                "duration_seconds": duration,
+                "traced_current_kb": round(current / 1024, 1),
+                "traced_peak_kb": round(peak / 1024, 1),
+                "top_allocations": top
+            }
+        finally:
+            if started_here:
+                tracemalloc.stop()
+            self._run_lock.release()
+
+# Global profiling service instance
+profiling_service = ProfilingService()
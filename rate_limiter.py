@@ -0,0 +1,132 @@
+import os
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenBucketLimiter:
+    """In-process token-bucket rate limiter keyed by an arbitrary string.
+
+    Each key gets a bucket of `burst` tokens refilled at `rate_per_minute`.
+    Buckets live in an LRU capped at `max_keys`, so memory stays bounded no
+    matter how many distinct IPs or usernames are seen; an evicted key simply
+    starts again with a full bucket.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, key: str) -> Tuple[bool, int]:
+        """Take one token for `key`; returns (allowed, retry_after_seconds)"""
+        if self.rate <= 0:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+
+            self.rejected += 1
+            return False, max(1, math.ceil((1 - bucket[0]) / self.rate))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "rejected": self.rejected
+            }
+
+class ConcurrencyLimiter:
+    """Caps how many long-lived requests (event streams) one key holds open at once.
+
+    Only keys with at least one open slot are tracked, so memory is bounded
+    by the number of open streams rather than by how many keys were seen.
+    """
+
+    def __init__(self, name: str, max_per_key: int):
+        self.name = name
+        self.max_per_key = max_per_key
+        self._open: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, key: str) -> bool:
+        """Take a slot for `key`; False if it already holds `max_per_key`"""
+        if self.max_per_key <= 0:
+            return True
+        with self._lock:
+            count = self._open.get(key, 0)
+            if count >= self.max_per_key:
+                self.rejected += 1
+                return False
+            self._open[key] = count + 1
+            return True
+
+    def release(self, key: str):
+        if self.max_per_key <= 0:
+            return
+        with self._lock:
+            count = self._open.get(key, 0) - 1
+            if count > 0:
+                self._open[key] = count
+            else:
+                self._open.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_keys": len(self._open),
+                "max_per_key": self.max_per_key,
+                "rejected": self.rejected
+            }
+
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+
+# Global /login limiters: one bucket per client IP and one per username
+login_ip_limiter = TokenBucketLimiter(
+    'login_ip',
+    float(os.environ.get('LOGIN_IP_RATE_PER_MINUTE', '30')),
+    int(os.environ.get('LOGIN_IP_BURST', '10')),
+    RATE_LIMIT_MAX_KEYS
+)
+login_user_limiter = TokenBucketLimiter(
+    'login_user',
+    float(os.environ.get('LOGIN_USER_RATE_PER_MINUTE', '10')),
+    int(os.environ.get('LOGIN_USER_BURST', '5')),
+    RATE_LIMIT_MAX_KEYS
+)
+
+# Global event stream limits: new streams per client IP, streams held open per
+# username, and public lockout streams held open per client IP
+event_stream_ip_limiter = TokenBucketLimiter(
+    'event_stream_ip',
+    float(os.environ.get('EVENT_STREAM_IP_RATE_PER_MINUTE', '60')),
+    int(os.environ.get('EVENT_STREAM_IP_BURST', '20')),
+    RATE_LIMIT_MAX_KEYS
+)
+event_stream_ip_slots = ConcurrencyLimiter('event_stream_ip', int(os.environ.get('EVENT_STREAM_MAX_PER_IP', '20')))
+event_stream_user_slots = ConcurrencyLimiter('event_stream_user', int(os.environ.get('EVENT_STREAM_MAX_PER_USER', '5')))
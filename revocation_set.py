@@ -0,0 +1,222 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+from database_service import db_service
+from invalidation_bus import TOKENS_REVOKED, USER_DELETED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Revoked ids we learn about locally (without an expiry) are kept this long,
+# which matches the longest refresh-token lifetime
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 3600
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (blake2b double hashing)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class RevocationSet:
+    """Per-replica copy of every revoked, unexpired refresh token id.
+
+    The set is loaded once from jwt_sessions and then kept current by polling
+    rows whose revocation_seq is above the highest one seen, so a revocation
+    made on any replica is visible everywhere within REVOCATION_POLL_INTERVAL.
+    While the last successful poll is younger than REVOCATION_MAX_STALENESS
+    the set is "fresh" and callers may trust it instead of querying the
+    database; once it goes stale they must fall back to the database.
+    """
+
+    def __init__(self):
+        self.poll_interval = float(os.environ.get('REVOCATION_POLL_INTERVAL', '2'))
+        self.max_staleness = float(os.environ.get('REVOCATION_MAX_STALENESS', '10'))
+        # Sequence values are taken before commit, so re-read a small window
+        # below the watermark to catch transactions that committed out of order
+        self.poll_overlap = int(os.environ.get('REVOCATION_POLL_OVERLAP', '100'))
+        self.poll_batch = int(os.environ.get('REVOCATION_POLL_BATCH', '1000'))
+        self.prune_interval = float(os.environ.get('REVOCATION_PRUNE_INTERVAL', '300'))
+        self.bloom_enabled = os.environ.get('REVOCATION_BLOOM_ENABLED', 'false').lower() == 'true'
+        self.bloom_capacity = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', '100000'))
+        self.bloom_error_rate = float(os.environ.get('REVOCATION_BLOOM_ERROR_RATE', '0.01'))
+
+        self._revoked: Dict[str, float] = {}  # token_id -> expiry (epoch seconds)
+        self._pending: List[str] = []  # revoked locally while the database was down
+        self._bloom: Optional[BloomFilter] = None
+        self._watermark = 0
+        self._loaded = False
+        self._last_sync = 0.0
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self.polls = 0
+        self.poll_failures = 0
+
+    @staticmethod
+    def _expiry(expires_at) -> float:
+        if isinstance(expires_at, datetime):
+            return expires_at.timestamp()
+        return time.time() + DEFAULT_RETENTION_SECONDS
+
+    def _rebuild_bloom(self):
+        if not self.bloom_enabled:
+            return
+        bloom = BloomFilter(max(self.bloom_capacity, 2 * len(self._revoked)), self.bloom_error_rate)
+        for token_id in self._revoked:
+            bloom.add(token_id)
+        self._bloom = bloom
+
+    def _add(self, token_id: str, expires_at=None):
+        self._revoked[token_id] = self._expiry(expires_at)
+        if self._bloom is not None:
+            self._bloom.add(token_id)
+
+    def add(self, token_id: str, expires_at=None):
+        """Record a revocation made on this replica so it takes effect immediately"""
+        with self._lock:
+            self._add(token_id, expires_at)
+
+    def add_pending(self, token_id: str):
+        """Record a revocation the database has not seen yet; it is written on the next poll"""
+        with self._lock:
+            self._add(token_id)
+            self._pending.append(token_id)
+
+    def request_poll(self):
+        """Poll now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        # Another replica revoked tokens: pick them up without waiting
+        if kind in (TOKENS_REVOKED, USER_DELETED):
+            self.request_poll()
+
+    def is_revoked(self, token_id: str) -> bool:
+        bloom = self._bloom
+        if bloom is not None and token_id not in bloom:
+            return False
+        return token_id in self._revoked
+
+    def is_fresh(self) -> bool:
+        """True when the set reflects the database to within max_staleness"""
+        return self._loaded and time.monotonic() - self._last_sync <= self.max_staleness
+
+    def load(self):
+        """Replace the set with every unexpired revocation in the database"""
+        rows, max_seq = db_service.get_revoked_tokens()
+        with self._lock:
+            pending = set(self._pending)
+            self._revoked = {token_id: expires for token_id, expires in self._revoked.items() if token_id in pending}
+            for row in rows:
+                self._revoked[row['token_id']] = self._expiry(row['expires_at'])
+            self._watermark = max_seq
+            self._rebuild_bloom()
+            self._loaded = True
+            self._last_sync = time.monotonic()
+        logger.info(f"Loaded {len(rows)} revoked tokens (revocation_seq {max_seq})")
+
+    def poll(self) -> int:
+        """Apply revocations newer than the watermark; returns how many rows were read"""
+        if self._pending:
+            self._flush_pending()
+        since = max(0, self._watermark - self.poll_overlap)
+        total = 0
+        while True:
+            rows = db_service.get_revocations_since(since, self.poll_batch)
+            with self._lock:
+                for row in rows:
+                    self._add(row['token_id'], row['expires_at'])
+                    self._watermark = max(self._watermark, row['revocation_seq'])
+            total += len(rows)
+            if len(rows) < self.poll_batch:
+                break
+            since = rows[-1]['revocation_seq']
+        self._last_sync = time.monotonic()
+        return total
+
+    def _flush_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for i, token_id in enumerate(pending):
+            try:
+                db_service.revoke_refresh_token(token_id)
+            except Exception:
+                with self._lock:
+                    self._pending = pending[i:] + self._pending
+                raise
+
+    def prune(self) -> int:
+        """Forget revocations of tokens that have expired anyway"""
+        now = time.time()
+        with self._lock:
+            expired = [token_id for token_id, expires in self._revoked.items() if expires <= now]
+            for token_id in expired:
+                del self._revoked[token_id]
+            if expired:
+                self._rebuild_bloom()
+        return len(expired)
+
+    def _poll_loop(self):
+        while True:
+            try:
+                if not self._loaded:
+                    self.load()
+                else:
+                    self.poll()
+                self.polls += 1
+                if time.monotonic() >= self._next_prune:
+                    self.prune()
+                    self._next_prune = time.monotonic() + self.prune_interval
+            except Exception as e:
+                self.poll_failures += 1
+                logger.warning(f"Revocation set sync failed, serving from memory: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start loading and polling in the background (idempotent)"""
+        if self._thread is None and self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._poll_loop, name="revocation-poll", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        staleness = time.monotonic() - self._last_sync if self._loaded else None
+        return {
+            "loaded": self._loaded,
+            "fresh": self.is_fresh(),
+            "staleness_seconds": round(staleness, 1) if staleness is not None else None,
+            "revoked_tokens": len(self._revoked),
+            "pending_revocations": len(self._pending),
+            "revocation_seq": self._watermark,
+            "bloom_filter": self._bloom is not None,
+            "polls": self.polls,
+            "poll_failures": self.poll_failures
+        }
+
+# Global revocation set instance
+revocation_set = RevocationSet()
@@ -0,0 +1,67 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import anyio
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'cancelled')
+
+    def __init__(self):
+        self.done = anyio.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls into one in-flight call.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for it and get the same result or exception.  Nothing is
+    cached: once the call finishes, the next caller starts a fresh one.  If
+    the leading caller is cancelled (e.g. the client went away) the waiters
+    do not inherit the cancellation - one of them runs the call instead.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                break
+            self.coalesced += 1
+            await call.done.wait()
+            if call.cancelled:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call = _Call()
+        self._calls[key] = call
+        self.executed += 1
+        try:
+            call.result = await func(*args, **kwargs)
+            return call.result
+        except anyio.get_cancelled_exc_class():
+            call.cancelled = True
+            raise
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls)
+        }
+
+# Global single-flight group for LDAP reads
+ldap_single_flight = SingleFlight('LDAP reads')
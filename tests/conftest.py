@@ -0,0 +1,52 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The backend modules live in the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ldap_stub import StubLdapServer, free_port
+
+# main and the module-level services read their configuration at import time,
+# so point them at a stub LDAP server and an unreachable database up front
+LDAP_STUB_PORT = free_port()
+os.environ.update({
+    'LDAP_SERVER': f'ldap://127.0.0.1:{LDAP_STUB_PORT}',
+    'LDAP_HEALTH_CHECK_INTERVAL': '0',
+    'DB_HOST': '127.0.0.1',
+    'DB_PORT': str(free_port()),
+    'DB_CONNECT_TIMEOUT': '1',
+    'LOGIN_IP_RATE_PER_MINUTE': '0',
+    'LOGIN_USER_RATE_PER_MINUTE': '0'
+})
+
+@pytest.fixture(scope='session')
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture(scope='session')
+def ldap_server():
+    """The stub LDAP server the backend is configured to use"""
+    server = StubLdapServer(LDAP_STUB_PORT).start()
+    yield server
+    server.kill()
+
+@pytest.fixture(scope='session')
+def backend(ldap_server):
+    """The imported `main` module, with its LDAP pointed at the stub server"""
+    return importlib.import_module('main')
+
+@pytest.fixture
+def stub_ldap_servers():
+    """Start extra stub LDAP servers on demand; all are killed after the test"""
+    servers = []
+
+    def start():
+        servers.append(StubLdapServer().start())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.kill()
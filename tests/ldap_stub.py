@@ -0,0 +1,138 @@
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# LDAP request tag -> response tag (RFC 4511 application tags, BER-encoded)
+BIND_REQUEST = 0x60
+SEARCH_REQUEST = 0x63
+MODIFY_REQUEST = 0x66
+ADD_REQUEST = 0x68
+DELETE_REQUEST = 0x4a
+UNBIND_REQUEST = 0x42
+RESPONSES = {
+    BIND_REQUEST: 0x61,
+    SEARCH_REQUEST: 0x65,  # searchResDone: every search returns no entries
+    MODIFY_REQUEST: 0x67,
+    ADD_REQUEST: 0x69,
+    DELETE_REQUEST: 0x6b
+}
+
+def _split_message(buffer: bytes) -> Optional[int]:
+    """Length of the first complete BER message in `buffer`, or None if it is incomplete"""
+    if len(buffer) < 2:
+        return None
+    if buffer[1] < 0x80:
+        header, length = 2, buffer[1]
+    else:
+        octets = buffer[1] & 0x7f
+        if len(buffer) < 2 + octets:
+            return None
+        header, length = 2 + octets, int.from_bytes(buffer[2:2 + octets], "big")
+    return header + length if len(buffer) >= header + length else None
+
+def _response(message: bytes, tag: int, result_code: int) -> bytes:
+    header = 2 if message[1] < 0x80 else 2 + (message[1] & 0x7f)
+    id_length = message[header + 1]
+    message_id = message[header:header + 2 + id_length]
+    # LDAPResult: resultCode ENUMERATED, matchedDN "", diagnosticMessage ""
+    result = bytes([0x0a, 0x01, result_code, 0x04, 0x00, 0x04, 0x00])
+    body = message_id + bytes([tag, len(result)]) + result
+    return bytes([0x30, len(body)]) + body
+
+class StubLdapServer:
+    """Just enough of an LDAP server for tests: every request succeeds (or
+    fails with `result_codes[request_tag]`) after `delay` seconds, searches
+    return no entries, and `kill()` drops the listener and every connection
+    the way a crashed pod would."""
+
+    def __init__(self, port: int = 0):
+        self.delay = 0.0
+        self.result_codes: Dict[int, int] = {}
+        self.requests: Counter = Counter()
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(("127.0.0.1", port))
+        self._listener.listen(128)
+        self.port = self._listener.getsockname()[1]
+        self.url = f"ldap://127.0.0.1:{self.port}"
+        self._clients: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self) -> "StubLdapServer":
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._clients.append(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket):
+        send_lock = threading.Lock()
+
+        def send(packet: bytes):
+            with send_lock:
+                try:
+                    client.sendall(packet)
+                except OSError:
+                    pass
+
+        buffer = b""
+        try:
+            while not self._stopped.is_set():
+                data = client.recv(65536)
+                if not data:
+                    return
+                buffer += data
+                while True:
+                    length = _split_message(buffer)
+                    if length is None:
+                        break
+                    message, buffer = buffer[:length], buffer[length:]
+                    header = 2 if message[1] < 0x80 else 2 + (message[1] & 0x7f)
+                    operation = message[header + 2 + message[header + 1]]
+                    if operation == UNBIND_REQUEST:
+                        return
+                    if operation not in RESPONSES:
+                        continue
+                    self.requests[operation] += 1
+                    packet = _response(message, RESPONSES[operation], self.result_codes.get(operation, 0))
+                    if self.delay:
+                        # Answer later without blocking the connection, so pipelined requests overlap
+                        threading.Timer(self.delay, send, args=(packet,)).start()
+                    else:
+                        send(packet)
+        except OSError:
+            pass
+        finally:
+            client.close()
+
+    def kill(self):
+        """Stop listening and reset every open connection"""
+        self._stopped.set()
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
+        time.sleep(0.05)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,37 @@
+import apply_schema
+
+class FakeCursor:
+    """Answers the sequence state and the MAX(id) queries; records setval calls"""
+    def __init__(self, sequences, max_id=0):
+        self.sequences = sequences
+        self.max_id = max_id
+        self.setvals = []
+        self._result = None
+
+    def execute(self, sql, params=None):
+        if "setval" in sql:
+            self.setvals.append(params or sql)
+            self._result = (None,)
+        elif "last_value" in sql:
+            self._result = self.sequences[sql.split("FROM ")[1].strip()]
+        else:
+            self._result = (self.max_id,)
+
+    def fetchone(self):
+        return self._result
+
+def test_employee_sequence_is_never_moved_backwards():
+    cursor = FakeCursor({'personnel_id_seq': (40, True)})
+    assert not apply_schema.advance_sequence(cursor, 'personnel_id_seq', 12)
+    assert apply_schema.advance_sequence(cursor, 'personnel_id_seq', 41)
+    assert cursor.setvals == [('personnel_id_seq', 41)]
+
+def test_an_unused_sequence_counts_from_before_its_start():
+    cursor = FakeCursor({'admin_id_seq': (1, False)})
+    assert apply_schema.advance_sequence(cursor, 'admin_id_seq', 1)
+    assert cursor.setvals == [('admin_id_seq', 1)]
+
+def test_fix_sequence_gaps_leaves_the_personnel_employee_sequence_alone():
+    cursor = FakeCursor({}, max_id=3)
+    apply_schema.fix_sequence_gaps(cursor)
+    assert not any('personnel_id_seq' in str(call) for call in cursor.setvals)
@@ -0,0 +1,67 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+import pytest
+
+from bulkhead import Bulkhead, BulkheadFullError
+
+LOGINS = 60
+VERIFICATIONS = 50
+
+@pytest.mark.anyio
+async def test_verify_token_stays_fast_while_ldap_is_slow(backend, ldap_server):
+    """Flood /login while every LDAP request takes a second: the LDAP bulkhead
+    fills and sheds load with 503s, and /verify-token never waits on it."""
+    token = backend.generate_access_token("admin", "admin")
+    ldap_server.delay = 1.0
+    try:
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+            logins = [
+                asyncio.ensure_future(client.post("/login", data={"username": f"load{i}", "password": "secret"}))
+                for i in range(LOGINS)
+            ]
+            await asyncio.sleep(0.3)
+
+            latencies = []
+            for _ in range(VERIFICATIONS):
+                started = time.perf_counter()
+                response = await client.post("/verify-token", data={"token": token})
+                latencies.append(time.perf_counter() - started)
+                assert response.json()["valid"]
+
+            responses = await asyncio.gather(*logins)
+    finally:
+        ldap_server.delay = 0.0
+
+    rejected = [response for response in responses if response.status_code == 503]
+    assert rejected, "the LDAP bulkhead should have shed part of the login flood"
+    assert all(response.headers.get("retry-after") for response in rejected)
+    latencies.sort()
+    assert statistics.median(latencies) < 0.05
+    assert latencies[int(len(latencies) * 0.99) - 1] < 0.25
+
+@pytest.mark.anyio
+async def test_full_bulkhead_fails_fast_with_retry_after():
+    bulkhead = Bulkhead('Stub', max_concurrent=2, max_wait_seconds=0.1, retry_after=3)
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def blocking_call():
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+
+    holders = [asyncio.ensure_future(bulkhead.run(blocking_call)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    with pytest.raises(BulkheadFullError) as rejected:
+        await bulkhead.run(blocking_call)
+    assert time.perf_counter() - started < 0.5
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers["Retry-After"] == "3"
+    assert bulkhead.stats()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*holders)
+    assert bulkhead.stats()["in_use"] == 0
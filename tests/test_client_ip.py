@@ -0,0 +1,25 @@
+import ipaddress
+from types import SimpleNamespace
+
+import pytest
+
+@pytest.fixture
+def client_ip(backend, monkeypatch):
+    monkeypatch.setattr(backend, 'TRUST_PROXY_HEADERS', True)
+    monkeypatch.setattr(backend, 'TRUSTED_PROXY_NETWORKS', [ipaddress.ip_network('10.0.0.0/8')])
+
+    def resolve(peer, forwarded=None):
+        headers = {'x-forwarded-for': forwarded} if forwarded else {}
+        return backend.get_client_ip(SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers))
+    return resolve
+
+def test_forwarded_for_is_ignored_from_untrusted_peers(client_ip):
+    assert client_ip('203.0.113.9', '198.51.100.1') == '203.0.113.9'
+
+def test_client_is_the_rightmost_untrusted_hop(client_ip):
+    assert client_ip('10.1.0.5', '198.51.100.1') == '198.51.100.1'
+    # A client-supplied entry left of the real client address is not believed
+    assert client_ip('10.1.0.5', '1.2.3.4, 198.51.100.1, 10.2.0.7') == '198.51.100.1'
+
+def test_proxy_without_forwarded_for_is_the_client(client_ip):
+    assert client_ip('10.1.0.5') == '10.1.0.5'
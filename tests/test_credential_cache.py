@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from credential_cache import CredentialCache
+
+RECORD = {"role": "user", "auth_level": 1, "name": "Alice", "employee_number": "U-1"}
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    def make(mode, **env):
+        monkeypatch.setenv('CREDENTIAL_CACHE_ENABLED', 'true')
+        monkeypatch.setenv('CREDENTIAL_CACHE_MODE', mode)
+        # Cheap scrypt parameters keep the test fast
+        monkeypatch.setenv('CREDENTIAL_CACHE_SCRYPT_N', '16')
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return CredentialCache()
+    return make
+
+def test_cache_first_only_skips_ldap_within_the_window(make_cache):
+    cache = make_cache('cache_first', CREDENTIAL_CACHE_FIRST_WINDOW='0.2', CREDENTIAL_CACHE_TTL='900')
+    cache.store("alice", "old-password", RECORD)
+    assert cache.serves_first("alice")
+    assert cache.verify("alice", "old-password") == RECORD
+
+    time.sleep(0.2)
+    # Past the window the login goes to LDAP, which sees a password changed there
+    assert not cache.serves_first("alice")
+    # ...but the verifier is still there for an LDAP outage, and is refreshed by the next bind
+    assert cache.has("alice")
+    assert cache.needs_refresh("alice")
+
+def test_fallback_mode_never_serves_first(make_cache):
+    cache = make_cache('fallback')
+    cache.store("alice", "password", RECORD)
+    assert not cache.serves_first("alice")
+    assert cache.has("alice")
+    assert not cache.needs_refresh("alice")
+
+def test_wrong_password_does_not_match(make_cache):
+    cache = make_cache('cache_first')
+    cache.store("alice", "password", RECORD)
+    assert cache.verify("alice", "not-the-password") is None
+    assert cache.stats()["local_misses"] == 1
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+import pytest
+
+from database_service import DatabaseService
+
+class FakeConnection:
+    closed = 0
+
+TEST_HOST = 'reconnect-test'
+
+@pytest.fixture
+def service():
+    service = DatabaseService()
+    # psycopg2.connect is patched process-wide; other services' reconnects are told the database is down
+    service.db_config['host'] = TEST_HOST
+    return service
+
+def fake_connect(behaviour, attempts):
+    def connect(**config):
+        if config['host'] != TEST_HOST:
+            raise psycopg2.OperationalError("not the database under test")
+        attempts.append(config)
+        return behaviour()
+    return connect
+
+def connect_concurrently(service, threads=4):
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(service.get_connection())) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+def test_concurrent_callers_wait_for_a_reconnect_in_progress(service, monkeypatch):
+    attempts = []
+    probe_done = []
+
+    def slow_connect():
+        if not probe_done:
+            time.sleep(0.3)
+            probe_done.append(time.monotonic())
+        return FakeConnection()
+
+    monkeypatch.setattr(psycopg2, 'connect', fake_connect(slow_connect, attempts))
+    results = connect_concurrently(service)
+    assert all(isinstance(conn, FakeConnection) for conn in results)
+    assert not service.is_degraded()
+    # One probe while the state was unknown; the others connected only once it succeeded
+    assert len(probe_done) == 1
+
+def test_each_thread_gets_its_own_connection(service, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(psycopg2, 'connect', fake_connect(FakeConnection, attempts))
+    mine = service.get_connection()
+    assert service.get_connection() is mine
+    # Plain reads must not leave the connection idle in a transaction
+    assert mine.autocommit is True
+    others = connect_concurrently(service)
+    assert len({id(conn) for conn in others + [mine]}) == 5
+    assert len(attempts) == 5
+
+def test_connections_are_capped(service, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(psycopg2, 'connect', fake_connect(FakeConnection, attempts))
+    service.max_connections = 2
+    service.db_config['connect_timeout'] = 0.2
+    held = []
+    release = threading.Event()
+
+    def hold():
+        held.append(service.get_connection())
+        release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for holder in holders:
+        holder.start()
+    while len(held) < 2:
+        time.sleep(0.01)
+    try:
+        assert connect_concurrently(service, threads=1) == [None]
+    finally:
+        release.set()
+        for holder in holders:
+            holder.join()
+    # A connection is given back when its thread exits
+    held.clear()
+    deadline = time.monotonic() + 2
+    while service.get_connection() is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert service.get_connection() is not None
+
+def test_a_failed_reconnect_backs_everyone_off(service, monkeypatch):
+    attempts = []
+
+    def failing_connect():
+        time.sleep(0.1)
+        raise psycopg2.OperationalError("connection refused")
+
+    monkeypatch.setattr(psycopg2, 'connect', fake_connect(failing_connect, attempts))
+    assert connect_concurrently(service) == [None] * 4
+    assert len(attempts) == 1
+    assert service.is_degraded()
+    # Still inside the backoff window: no new attempt
+    assert service.get_connection() is None
+    assert len(attempts) == 1
+
+class RecordingConnection:
+    closed = 0
+
+    def __init__(self, status=extensions.TRANSACTION_STATUS_IDLE):
+        self.autocommit = True
+        self.status = status
+        self.calls = []
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.calls.append(('commit', self.autocommit))
+
+    def rollback(self):
+        self.calls.append(('rollback', self.autocommit))
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+def test_transaction_commits_the_block_as_one_unit(service):
+    conn = RecordingConnection(status=extensions.TRANSACTION_STATUS_INERROR)
+    with service.transaction(conn):
+        assert conn.autocommit is False
+        with service.transaction(conn):
+            pass  # joins the outer transaction
+    # The leftover aborted transaction is rolled back first; one commit, outside autocommit
+    assert conn.calls == [('rollback', True), ('commit', False)]
+    assert conn.autocommit is True
+
+def test_transaction_rolls_back_when_the_block_fails(service):
+    conn = RecordingConnection()
+    with pytest.raises(RuntimeError):
+        with service.transaction(conn):
+            raise RuntimeError("outbox insert failed")
+    assert conn.calls == [('rollback', False)]
+    assert conn.autocommit is True
+
+def test_a_released_connection_is_reused_by_the_next_call(service, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(psycopg2, 'connect', fake_connect(RecordingConnection, attempts))
+    service.max_connections = 1
+    service.db_config['connect_timeout'] = 0.2
+    borrowed = []
+
+    def call():
+        conn = service.get_connection()
+        borrowed.append(conn)
+        if conn is not None:
+            conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        service.release_connection()
+
+    for _ in range(3):
+        worker = threading.Thread(target=call)
+        worker.start()
+        worker.join()
+    # One connection served every call; each hand-back cleared what the call left open
+    assert len(attempts) == 1
+    assert borrowed == [borrowed[0]] * 3
+    assert borrowed[0].calls == [('rollback', True)] * 3
+    assert service.health()['idle_connections'] == 1
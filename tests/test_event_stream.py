@@ -0,0 +1,81 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+pytestmark = pytest.mark.anyio
+
+def make_request(client_ip="10.9.9.9"):
+    return Request({"type": "http", "method": "GET", "path": "/events", "headers": [], "client": (client_ip, 40000)})
+
+async def one_event():
+    yield "event: test\ndata: {}\n\n"
+
+@pytest.fixture
+def stream_limits(backend, monkeypatch):
+    monkeypatch.setattr(backend.event_stream_user_slots, "max_per_key", 2)
+    monkeypatch.setattr(backend.event_stream_ip_slots, "max_per_key", 3)
+    monkeypatch.setattr(backend.event_stream_ip_limiter, "rate", 1000.0)
+    monkeypatch.setattr(backend.event_stream_ip_limiter, "burst", 1000)
+    return backend
+
+async def test_open_streams_are_capped_per_username_until_one_ends(stream_limits):
+    backend = stream_limits
+    first = backend.event_stream_response(one_event(), make_request(), "alice")
+    backend.event_stream_response(one_event(), make_request("10.9.9.10"), "Alice")
+    with pytest.raises(HTTPException) as rejected:
+        backend.event_stream_response(one_event(), make_request("10.9.9.11"), "alice")
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"]
+
+    # A finished stream gives its slot back
+    async for _ in first.body_iterator:
+        pass
+    backend.event_stream_response(one_event(), make_request(), "alice")
+
+async def test_public_lockout_streams_are_capped_per_client_ip(stream_limits):
+    backend = stream_limits
+    responses = [backend.event_stream_response(one_event(), make_request("10.8.8.8"), f"user{i}", lockout=True)
+                 for i in range(3)]
+    with pytest.raises(HTTPException) as rejected:
+        backend.event_stream_response(one_event(), make_request("10.8.8.8"), "user3", lockout=True)
+    assert rejected.value.status_code == 429
+    # Session streams are not counted against the IP
+    backend.event_stream_response(one_event(), make_request("10.8.8.8"), "user4")
+
+    # A stream that never started is released once the response is done
+    await responses[0].background()
+    backend.event_stream_response(one_event(), make_request("10.8.8.8"), "user5", lockout=True)
+
+async def test_lockout_streams_have_their_own_smaller_pool(backend, monkeypatch):
+    monkeypatch.setattr(backend.event_hub, "max_lockout_subscribers", backend.event_hub.lockout_subscribers)
+    assert backend.event_hub.accepting()
+    assert not backend.event_hub.accepting(lockout=True)
+    with pytest.raises(HTTPException) as rejected:
+        backend.event_stream_response(one_event(), make_request("10.7.7.7"), "bob", lockout=True)
+    assert rejected.value.status_code == 503
+
+async def test_session_stream_takes_a_short_lived_ticket_not_the_access_token(backend):
+    access_token = backend.generate_access_token("carol", "personnel")
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+        response = await client.post("/events/session/ticket", headers={"Authorization": f"Bearer {access_token}"})
+        assert response.status_code == 200
+        ticket = response.json()["ticket"]
+
+        # The access token itself is no longer accepted in the query string
+        refused = await client.get("/events/session", params={"token": access_token})
+        assert refused.status_code == 401
+        refused = await client.get("/events/session", params={"ticket": access_token})
+        assert refused.status_code == 401
+
+    owner = backend.verify_stream_ticket(ticket)
+    assert owner["sub"] == "carol"
+    assert owner["exp"] == backend.verify_access_token(access_token)["exp"]
+
+async def test_expired_ticket_is_refused(backend, monkeypatch):
+    monkeypatch.setattr(backend, "EVENT_STREAM_TICKET_TTL", -1)
+    payload = backend.verify_access_token(backend.generate_access_token("dave", "personnel"))
+    with pytest.raises(HTTPException) as refused:
+        backend.verify_stream_ticket(backend.generate_stream_ticket(payload))
+    assert refused.value.detail == "Stream ticket expired"
@@ -0,0 +1,26 @@
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_public_health_reports_only_liveness_and_readiness(backend):
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+        response = await client.get("/health")
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"status", "message", "database"}
+    assert body["database"] in ("connected", "down", "disconnected")
+
+async def test_subsystem_stats_need_an_admin(backend):
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+        anonymous = await client.get("/admin/health")
+        user = await client.get("/admin/health", headers={
+            "Authorization": f"Bearer {backend.generate_access_token('erin', 'personnel')}"})
+        admin = await client.get("/admin/health", headers={
+            "Authorization": f"Bearer {backend.generate_access_token('root', 'admin')}"})
+    assert anonymous.status_code == 401
+    assert user.status_code == 403
+    assert admin.status_code == 200
+    assert {"database", "bulkheads", "ldap_pool", "rate_limits"} <= set(admin.json())
@@ -0,0 +1,80 @@
+import anyio
+import pytest
+
+from idempotency import IdempotencyWindow
+from invalidation_bus import TOKEN_EPOCH_BUMPED, TOKENS_REVOKED, USER_CHANGED, LOCKOUT_CHANGED
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def window():
+    return IdempotencyWindow('test', window_seconds=60, max_entries=100,
+                             invalidated_by=(USER_CHANGED, TOKENS_REVOKED, TOKEN_EPOCH_BUMPED))
+
+class Minter:
+    """Stands in for mint_refreshed_access_token: every call mints a new token at the current epoch"""
+
+    def __init__(self):
+        self.epoch = 0
+        self.calls = 0
+        self.gate = None
+
+    async def __call__(self, refresh_token):
+        self.calls += 1
+        epoch = self.epoch
+        if self.gate is not None:
+            await self.gate.wait()
+        return {"access_token": f"{refresh_token}@{epoch}#{self.calls}"}
+
+async def test_repeated_refresh_within_the_window_is_replayed(window):
+    mint = Minter()
+    first = await window.run("jti-1", mint, "rt", owner="alice")
+    assert await window.run("jti-1", mint, "rt", owner="alice") == first
+    assert mint.calls == 1
+    assert window.stats()["replayed"] == 1
+
+async def test_epoch_bump_ends_the_replay(window):
+    mint = Minter()
+    await window.run("jti-1", mint, "rt", owner="alice")
+    mint.epoch += 1
+    window.on_invalidation(TOKEN_EPOCH_BUMPED, "alice")
+    fresh = await window.run("jti-1", mint, "rt", owner="alice")
+    assert fresh["access_token"].startswith("rt@1")
+    assert mint.calls == 2
+
+async def test_events_for_other_users_or_kinds_keep_the_result(window):
+    mint = Minter()
+    first = await window.run("jti-1", mint, "rt", owner="alice")
+    window.on_invalidation(TOKEN_EPOCH_BUMPED, "bob")
+    window.on_invalidation(LOCKOUT_CHANGED, "alice")
+    assert await window.run("jti-1", mint, "rt", owner="alice") == first
+    assert mint.calls == 1
+
+async def test_a_call_in_flight_during_the_bump_is_not_remembered(window):
+    mint = Minter()
+    mint.gate = anyio.Event()
+    results = []
+
+    async def refresh():
+        results.append(await window.run("jti-1", mint, "rt", owner="alice"))
+
+    async with anyio.create_task_group() as tasks:
+        tasks.start_soon(refresh)
+        await anyio.sleep(0.01)
+        # logout-all lands while the token is being minted at the old epoch
+        mint.epoch += 1
+        window.on_invalidation(TOKENS_REVOKED, "alice")
+        mint.gate.set()
+
+    assert results[0]["access_token"].startswith("rt@0")
+    mint.gate = None
+    assert (await window.run("jti-1", mint, "rt", owner="alice"))["access_token"].startswith("rt@1")
+
+async def test_flush_drops_everything(window):
+    mint = Minter()
+    await window.run("jti-1", mint, "rt", owner="alice")
+    await window.run("jti-2", mint, "rt", owner="bob")
+    window.clear()
+    await window.run("jti-1", mint, "rt", owner="alice")
+    assert mint.calls == 3
+    assert window.stats()["held_results"] == 1
@@ -0,0 +1,74 @@
+import pytest
+
+from ldap_outbox import LdapOutboxRelay
+
+class FakeCursor:
+    """Serves the relay's batch query from `rows` and records every UPDATE"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().startswith("UPDATE"):
+            self.updates.append((" ".join(sql.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+    def updated(self, row_id, fragment):
+        return any(params[-1] == row_id and fragment in sql for sql, params in self.updates)
+
+@pytest.fixture
+def relay(monkeypatch):
+    monkeypatch.setenv('LDAP_OUTBOX_MAX_ATTEMPTS', '3')
+    relay = LdapOutboxRelay()
+    relay.ldap_writes = []
+    relay.failing = set()
+    relay.notified = []
+
+    def apply(conn, username, changes):
+        if changes["id"] in relay.failing:
+            raise ConnectionError("LDAP write failed")
+        relay.ldap_writes.append(changes["id"])
+        return True
+
+    relay._connect = lambda: object()
+    relay._apply = apply
+    relay._on_applied = relay.notified.append
+    return relay
+
+def row(row_id, username, attempts=0, due=True):
+    return (row_id, username, {"id": row_id}, attempts, due)
+
+def test_rows_are_applied_in_id_order(relay):
+    cursor = FakeCursor([row(1, "alice"), row(2, "bob"), row(3, "alice")])
+    assert relay._relay_batch(cursor) == 3
+    assert relay.ldap_writes == [1, 2, 3]
+    assert relay.notified == ["alice", "bob", "alice"]
+    assert all(cursor.updated(row_id, "applied_at = NOW()") for row_id in (1, 2, 3))
+
+def test_a_failed_row_holds_back_only_that_users_later_rows(relay):
+    relay.failing = {1}
+    cursor = FakeCursor([row(1, "alice"), row(2, "bob"), row(3, "alice"), row(4, "carol")])
+    assert relay._relay_batch(cursor) == 2
+    assert relay.ldap_writes == [2, 4]
+    assert cursor.updated(1, "next_attempt_at")
+    assert not cursor.updated(1, "dead_at")
+    assert not cursor.updated(3, "applied_at")
+
+def test_a_row_not_yet_due_holds_back_later_rows(relay):
+    cursor = FakeCursor([row(1, "alice", attempts=1, due=False), row(2, "alice"), row(3, "bob")])
+    assert relay._relay_batch(cursor) == 1
+    assert relay.ldap_writes == [3]
+
+def test_a_row_is_dead_lettered_after_max_attempts_and_stops_holding_back(relay):
+    relay.failing = {1}
+    cursor = FakeCursor([row(1, "alice", attempts=2), row(2, "alice")])
+    assert relay._relay_batch(cursor) == 2
+    assert cursor.updated(1, "dead_at = NOW()")
+    assert not cursor.updated(1, "applied_at")
+    # The user's later change is no longer stuck behind the dead letter
+    assert relay.ldap_writes == [2]
+    assert relay.stats()["dead_lettered"] == 1
+    assert relay.notified == ["alice"]
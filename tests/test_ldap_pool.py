@@ -0,0 +1,128 @@
+import time
+
+import pytest
+from ldap3.core.exceptions import LDAPSocketReceiveError, LDAPStartTLSError
+
+from ldap_pool import CircuitBreaker, LDAPServerPool, LDAPUnavailableError
+from ldap_stub import StubLdapServer
+
+OPEN_SECONDS = 0.5
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    def make(*urls):
+        monkeypatch.setenv('LDAP_SERVERS', ','.join(urls))
+        monkeypatch.setenv('LDAP_CONNECT_TIMEOUT', '1')
+        monkeypatch.setenv('LDAP_RECEIVE_TIMEOUT', '1')
+        monkeypatch.setenv('LDAP_BREAKER_MIN_CALLS', '2')
+        monkeypatch.setenv('LDAP_BREAKER_OPEN_SECONDS', str(OPEN_SECONDS))
+        return LDAPServerPool()
+    return make
+
+def server_used(pool):
+    conn, url = pool.open_connection()
+    conn.unbind()
+    return url
+
+def test_breaker_opens_on_error_rate_and_closes_after_a_good_trial():
+    breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5, open_seconds=OPEN_SECONDS)
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(OPEN_SECONDS)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_failed_half_open_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(window=10, min_calls=1, error_rate=0.5, open_seconds=OPEN_SECONDS)
+    breaker.record(False)
+    time.sleep(OPEN_SECONDS)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_fails_over_when_the_primary_is_killed_and_returns_after_the_cool_down(make_pool, stub_ldap_servers):
+    primary, replica = stub_ldap_servers(), stub_ldap_servers()
+    pool = make_pool(primary.url, replica.url)
+    assert server_used(pool) == primary.url
+
+    primary.kill()
+    assert server_used(pool) == replica.url
+    assert server_used(pool) == replica.url
+    assert pool.breakers[primary.url].state == CircuitBreaker.OPEN
+    # While open, the dead server is not even tried
+    started = time.perf_counter()
+    assert server_used(pool) == replica.url
+    assert time.perf_counter() - started < 0.5
+
+    replica.kill()
+    with pytest.raises(LDAPUnavailableError):
+        server_used(pool)
+
+    # The primary comes back; after the cool-down its half-open trial succeeds
+    revived = StubLdapServer(primary.port).start()
+    try:
+        time.sleep(OPEN_SECONDS)
+        assert server_used(pool) == primary.url
+        assert pool.breakers[primary.url].state == CircuitBreaker.CLOSED
+    finally:
+        revived.kill()
+
+def test_any_connect_error_settles_the_half_open_trial(make_pool, stub_ldap_servers, monkeypatch):
+    server = stub_ldap_servers()
+    pool = make_pool(server.url)
+    breaker = pool.breakers[server.url]
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(OPEN_SECONDS)
+
+    # A StartTLS failure is not a socket error, but still fails the trial
+    new_connection = pool._new_connection
+    unbound = []
+
+    def failing_connection(*args, **kwargs):
+        conn = new_connection(*args, **kwargs)
+
+        def open_with_failing_tls(*open_args, **open_kwargs):
+            raise LDAPStartTLSError("handshake failed")
+
+        conn.open = open_with_failing_tls
+        conn.unbind = lambda: unbound.append(conn)
+        return conn
+
+    monkeypatch.setattr(pool, '_new_connection', failing_connection)
+    with pytest.raises(LDAPUnavailableError):
+        pool.open_connection()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert unbound, "the failed connection should be closed"
+
+    # Once the server behaves, the next trial goes through instead of being stuck in flight
+    monkeypatch.setattr(pool, '_new_connection', new_connection)
+    time.sleep(OPEN_SECONDS)
+    assert server_used(pool) == server.url
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_operation_timeouts_count_against_the_server(make_pool, stub_ldap_servers):
+    server = stub_ldap_servers()
+    pool = make_pool(server.url)
+    conn = pool.connect()
+    server.delay = 2.0
+    try:
+        # One good connect and one timed-out search: a 50% error rate
+        with pytest.raises(LDAPSocketReceiveError):
+            conn.search("dc=example,dc=com", "(objectClass=*)")
+    finally:
+        server.delay = 0.0
+        conn.unbind()
+    assert pool.breakers[server.url].state == CircuitBreaker.OPEN
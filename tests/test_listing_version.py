@@ -0,0 +1,58 @@
+import httpx
+import pytest
+
+from invalidation_bus import LOCKOUT_CHANGED, ROLE_CHANGED, USER_CHANGED, USERS_IMPORTED
+from listing_version import ListingVersion
+
+def test_if_none_match_accepts_the_weak_and_strong_forms_of_the_current_tag():
+    version = ListingVersion()
+    etag = version.etag("users")
+    assert etag.startswith('W/"users-')
+    assert version.matches(etag, etag)
+    assert version.matches(etag[2:], etag)
+    assert version.matches(f'W/"stale", {etag}', etag)
+    assert version.matches('*', etag)
+    assert not version.matches(None, etag)
+    assert not version.matches('W/"users-other"', etag)
+    assert version.stats()["not_modified"] == 4
+
+def test_listing_changes_bump_the_tag():
+    version = ListingVersion()
+    etag = version.etag("users")
+    version.on_invalidation(LOCKOUT_CHANGED, "alice")
+    assert version.matches(etag, version.etag("users"))
+    for kind in (USER_CHANGED, ROLE_CHANGED, USERS_IMPORTED):
+        version.on_invalidation(kind, "alice")
+        assert not version.matches(etag, version.etag("users"))
+        etag = version.etag("users")
+
+def test_tags_from_another_replica_never_match():
+    assert ListingVersion().etag("users") != ListingVersion().etag("users")
+
+@pytest.mark.anyio
+async def test_endpoint_answers_304_until_the_listing_changes(backend, monkeypatch):
+    queries = []
+
+    def get_operators():
+        queries.append(1)
+        return [{"username": "op1"}, {"username": "op2"}]
+
+    monkeypatch.setattr(backend.db_service, "get_operators", get_operators)
+    headers = {"Authorization": f"Bearer {backend.generate_access_token('pat', 'personnel')}"}
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+        first = await client.get("/users/operator-count", headers=headers)
+        assert first.status_code == 200
+        assert first.json() == {"operator_count": 2}
+        etag = first.headers["etag"]
+
+        cached = await client.get("/users/operator-count", headers={**headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert len(queries) == 1
+
+        backend.listing_version.on_invalidation(ROLE_CHANGED, "op3")
+        changed = await client.get("/users/operator-count", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert len(queries) == 2
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from profiling_service import ProfilingService, ProfilingBusyError, request_route
+
+pytestmark = pytest.mark.skipif(not hasattr(time, "pthread_getcpuclockid"), reason="needs per-thread CPU clocks")
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+def other_route_worker(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+def idle_worker(stop):
+    stop.wait()
+
+def run_tagged(service, route, target, stop):
+    token = request_route.set(route)
+    try:
+        func = service.bind_route(target)
+    finally:
+        request_route.reset(token)
+    thread = threading.Thread(target=func, args=(stop,), daemon=True)
+    thread.start()
+    return thread
+
+def test_route_filter_attributes_worker_threads_and_skips_idle_ones():
+    service = ProfilingService()
+    service.enabled = True
+    stop = threading.Event()
+    threads = [
+        run_tagged(service, "/login", busy_worker, stop),
+        run_tagged(service, "/login", idle_worker, stop),
+        run_tagged(service, "/admin/users", other_route_worker, stop)
+    ]
+    try:
+        result = service.sample_cpu(seconds=0.5, interval_ms=5, route="/login")
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert result["cpu_filtered"]
+    assert result["idle_thread_samples_skipped"] > 0
+    stacks = result["folded"].splitlines()
+    assert stacks
+    # Only the busy /login worker is sampled: not the idle one, not the other route
+    assert all("busy_worker" in stack for stack in stacks)
+    assert not any("idle_worker" in stack or "other_route_worker" in stack for stack in stacks)
+
+def test_bind_route_is_a_no_op_unless_profiling_is_enabled():
+    service = ProfilingService()
+    service.enabled = False
+    token = request_route.set("/login")
+    try:
+        assert service.bind_route(busy_worker) is busy_worker
+    finally:
+        request_route.reset(token)
+
+def test_concurrent_runs_are_rejected():
+    service = ProfilingService()
+    service._acquire()
+    try:
+        with pytest.raises(ProfilingBusyError):
+            service.sample_cpu(seconds=0.1)
+    finally:
+        service._run_lock.release()
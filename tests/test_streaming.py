@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from ldap3.core.exceptions import LDAPOperationResult
+
+from ldap_search import LDAP_PAGE_SIZE
+
+pytestmark = pytest.mark.anyio
+
+class FakeConnection:
+    def __init__(self):
+        self.unbound = False
+
+    def unbind(self):
+        self.unbound = True
+
+@pytest.fixture
+def ldap_records(backend, monkeypatch):
+    """Serve `count` fake users from the admin search, optionally failing after `fail_after`"""
+    conn = FakeConnection()
+    setup = {"count": 0, "fail_after": None, "read": 0}
+
+    def fake_paged_search(connection, base, search_filter, attributes):
+        for i in range(setup["count"]):
+            if setup["fail_after"] is not None and i == setup["fail_after"]:
+                raise LDAPOperationResult(result=3, description="timeLimitExceeded")
+            setup["read"] += 1
+            record = {name: None for name in attributes}
+            record.update(uid=f"user{i:04d}", cn=f"User {i}", dn=f"uid=user{i:04d},ou=users")
+            yield record
+
+    monkeypatch.setattr(backend, "get_ldap_admin_connection", lambda: conn)
+    monkeypatch.setattr(backend, "paged_search", fake_paged_search)
+
+    def configure(count, fail_after=None):
+        setup.update(count=count, fail_after=fail_after)
+        return conn
+    configure.read = lambda: setup["read"]
+    return configure
+
+async def as_uids(records):
+    return [record["uid"] for record in records]
+
+async def read_body(response):
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def test_streams_every_page_and_releases_the_connection(backend, ldap_records):
+    conn = ldap_records(600)
+    response = await backend.stream_json_list("users", "(uid=*)", ["uid"], as_uids)
+    body = json.loads(await read_body(response))
+    assert len(body["users"]) == 600
+    assert conn.unbound
+
+async def test_a_failure_mid_stream_aborts_and_invalidates_the_listing(backend, ldap_records):
+    conn = ldap_records(600, fail_after=300)
+    version = backend.listing_version.etag("users")
+    response = await backend.stream_json_list("users", "(uid=*)", ["uid"], as_uids)
+    with pytest.raises(LDAPOperationResult):
+        await read_body(response)
+    assert conn.unbound
+    # A partial copy tagged with the old ETag can never be revalidated
+    assert backend.listing_version.etag("users") != version
+
+async def test_a_client_going_away_releases_the_connection(backend, ldap_records):
+    conn = ldap_records(600)
+    response = await backend.stream_json_list("users", "(uid=*)", ["uid"], as_uids)
+    body = response.body_iterator
+    await body.__anext__()
+    await body.aclose()
+    assert conn.unbound
+
+async def test_dashboard_fallback_reads_only_the_first_page(backend, ldap_records, monkeypatch):
+    conn = ldap_records(5000)
+    monkeypatch.setattr(backend.user_directory, "loaded", False)
+    monkeypatch.setattr(backend.db_service, "get_employee_ids", lambda uids: {})
+    listing = await backend.directory_listing(10)
+    assert len(listing["items"]) == 10
+    assert listing["more"] and listing["total"] is None
+    assert ldap_records.read() <= LDAP_PAGE_SIZE
+    assert conn.unbound
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from user_directory import UserDirectory, _Index
+
+ROLES = ('user', 'operator', 'personnel', 'admin')
+
+def make_users(count, seed=7):
+    rng = random.Random(seed)
+    return [{
+        "uid": f"user{i:05d}",
+        "cn": f"{rng.choice(['Ann', 'Bob', 'Cid', 'Dee'])} {rng.choice(['Ng', 'Ode', 'Park'])} {i}",
+        "role": rng.choice(ROLES),
+        "authorization_level": rng.randint(1, 5),
+        "employee_id": f"E{rng.randint(0, 99999):05d}"
+    } for i in rng.sample(range(count), count)]
+
+@pytest.fixture
+def directory():
+    users = make_users(2000)
+    directory = UserDirectory()
+    directory._load_all = lambda: iter(users)
+    directory._load_user = lambda uid: next((user for user in users if user["uid"] == uid), None)
+    directory.rebuild()
+    directory.users = users
+    return directory
+
+def test_bulk_build_matches_incremental_adds():
+    users = make_users(500)
+    built = _Index.build(users)
+    incremental = _Index()
+    for user in users:
+        incremental.add(user)
+    assert built.by_uid == incremental.by_uid
+    assert built.by_cn == incremental.by_cn
+    assert built.by_role == incremental.by_role
+    assert built.by_level == incremental.by_level
+    assert built.sort_keys == incremental.sort_keys
+
+def test_duplicate_uids_in_a_load_keep_the_last_copy():
+    first, second = {"uid": "alice", "cn": "Old"}, {"uid": "alice", "cn": "New"}
+    index = _Index.build([first, second])
+    assert index.by_uid == [("alice", "alice")]
+    assert index.by_cn == [("new", "alice")]
+
+def test_prefix_search_with_filters(directory):
+    total, page = directory.search(query="user001", role="admin", limit=500)
+    expected = sorted(u["uid"] for u in directory.users if u["uid"].startswith("user001") and u["role"] == "admin")
+    assert total == len(expected)
+    assert [user["uid"] for user in page] == expected
+
+def test_cn_prefix_is_case_insensitive(directory):
+    total, page = directory.search(query="ann", field="cn", limit=500)
+    assert total == sum(1 for u in directory.users if u["cn"].lower().startswith("ann"))
+    assert all(user["cn"].startswith("Ann") for user in page)
+
+@pytest.mark.parametrize("sort", ["uid", "cn", "role", "authorization_level", "employee_id"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_walk_the_whole_sorted_listing(directory, sort, descending):
+    key = {
+        "uid": lambda u: (u["uid"].lower(), u["uid"]),
+        "cn": lambda u: (u["cn"].lower(), u["uid"]),
+    }.get(sort, lambda u: (u[sort], u["uid"].lower(), u["uid"]))
+    expected = [u["uid"] for u in sorted(directory.users, key=key, reverse=descending)]
+    seen = []
+    for offset in range(0, len(expected), 300):
+        total, page = directory.search(sort=sort, descending=descending, offset=offset, limit=300)
+        assert total == len(expected)
+        seen.extend(user["uid"] for user in page)
+    assert seen == expected
+
+def test_single_user_updates_keep_the_indexes_sorted(directory):
+    user = dict(directory.users[0], cn="Aaron First", role="admin")
+    directory.users[0] = user
+    directory.refresh_user(user["uid"])
+    _, page = directory.search(sort="cn", limit=1)
+    assert page[0]["uid"] == user["uid"]
+
+    directory.users.pop(0)
+    directory.refresh_user(user["uid"])
+    total, _ = directory.search(query=user["uid"], field="uid")
+    assert total == 0
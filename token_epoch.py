@@ -0,0 +1,94 @@
+import os
+import threading
+from typing import Dict, Any, Optional
+import logging
+
+from database_service import db_service
+from invalidation_bus import TOKEN_EPOCH_BUMPED, USER_DELETED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class TokenEpochCache:
+    """In-memory copy of every user's access-token epoch.
+
+    Access tokens carry the epoch they were minted under; a token whose
+    epoch is below the user's current one is rejected by a single dict
+    lookup, so bumping users.token_epoch invalidates all of a user's access
+    tokens without a per-request blacklist query.  Only non-zero epochs are
+    held.  Epochs only ever move forward: bumps are applied locally at once,
+    other replicas reload the user when the invalidation bus reports a bump,
+    and a full reload every TOKEN_EPOCH_REFRESH_INTERVAL bounds staleness
+    if an event is missed.
+    """
+
+    def __init__(self):
+        self.refresh_interval = float(os.environ.get('TOKEN_EPOCH_REFRESH_INTERVAL', '30'))
+        self._epochs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self.loaded = False
+        self.reload_failures = 0
+
+    def current(self, username: str) -> int:
+        return self._epochs.get(username, 0)
+
+    def observe(self, username: str, epoch: Optional[int]):
+        """Record an epoch read from the database; never moves an epoch backwards"""
+        if not epoch:
+            return
+        with self._lock:
+            if epoch > self._epochs.get(username, 0):
+                self._epochs[username] = epoch
+
+    def bump(self, username: str) -> Optional[int]:
+        """Invalidate every outstanding access token of a user"""
+        epoch = db_service.bump_token_epoch(username)
+        self.observe(username, epoch)
+        return epoch
+
+    def reload(self, username: str = None):
+        for name, epoch in db_service.get_token_epochs(username).items():
+            self.observe(name, epoch)
+        if username is None:
+            self.loaded = True
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in (TOKEN_EPOCH_BUMPED, USER_DELETED) and username:
+            try:
+                self.reload(username)
+            except Exception as e:
+                logger.warning(f"Could not reload token epoch for {username}, full reload scheduled: {e}")
+                self._wake.set()
+
+    def request_reload(self):
+        """Reload every epoch in the background (e.g. after missed invalidations)"""
+        self._wake.set()
+
+    def _reload_loop(self):
+        while True:
+            try:
+                self.reload()
+            except Exception as e:
+                self.reload_failures += 1
+                logger.warning(f"Token epoch reload failed, keeping known epochs: {e}")
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Load all epochs and keep refreshing them in the background (idempotent)"""
+        if self._thread is None and self.refresh_interval > 0:
+            self._thread = threading.Thread(target=self._reload_loop, name="token-epoch", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "users_with_epoch": len(self._epochs),
+            "reload_failures": self.reload_failures
+        }
+
+# Global token epoch cache instance
+token_epochs = TokenEpochCache()
@@ -0,0 +1,190 @@
+import os
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+import logging
+
+from database_service import db_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FallbackToken:
+    """Metadata for one refresh token issued while the database was unavailable"""
+    __slots__ = ('token_id', 'username', 'created_at', 'expires_at', 'is_active', 'revoked_at')
+
+    def __init__(self, token_id: str, username: str, created_at: datetime, expires_at: datetime):
+        self.token_id = token_id
+        self.username = username
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.is_active = True
+        self.revoked_at: Optional[datetime] = None
+
+class FallbackTokenStore:
+    """Bounded in-memory refresh-token store used while the database is down.
+
+    Tokens are indexed by token id and by username, and an expiry min-heap
+    lets expired tokens be dropped in O(log n) each without scanning the
+    whole store.  The store never holds more than `max_tokens` entries: when
+    full, expired tokens are purged first and then the tokens closest to
+    expiry are evicted.  Once the database is reachable again a background
+    thread writes the tokens into jwt_sessions and drops them from memory.
+    """
+
+    def __init__(self):
+        self.max_tokens = max(1, int(os.environ.get('FALLBACK_TOKEN_MAX', '10000')))
+        self.reconcile_interval = float(os.environ.get('FALLBACK_TOKEN_RECONCILE_INTERVAL', '15'))
+        self._tokens: Dict[str, FallbackToken] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._expiry_heap: List[tuple] = []  # (expires_at, token_id)
+        self._lock = threading.Lock()
+        self._reconcile_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.evicted = 0
+        self.reconciled = 0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def _remove(self, token_id: str) -> Optional[FallbackToken]:
+        # Heap entries of removed tokens are skipped lazily when popped
+        token = self._tokens.pop(token_id, None)
+        if token is not None:
+            user_tokens = self._by_user.get(token.username)
+            if user_tokens is not None:
+                user_tokens.discard(token_id)
+                if not user_tokens:
+                    del self._by_user[token.username]
+        return token
+
+    def _pop_heap(self) -> Optional[FallbackToken]:
+        while self._expiry_heap:
+            expires_at, token_id = heapq.heappop(self._expiry_heap)
+            token = self._tokens.get(token_id)
+            if token is not None and token.expires_at == expires_at:
+                return self._remove(token_id)
+        return None
+
+    def _purge_expired(self, now: datetime) -> int:
+        purged = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            if self._pop_heap() is not None:
+                purged += 1
+        # Rebuild the heap if stale entries from revoked/reconciled tokens pile up
+        if len(self._expiry_heap) > 2 * len(self._tokens) + 64:
+            self._expiry_heap = [(token.expires_at, token_id) for token_id, token in self._tokens.items()]
+            heapq.heapify(self._expiry_heap)
+        return purged
+
+    def add(self, token_id: str, username: str, created_at: datetime, expires_at: datetime):
+        """Store a refresh token, evicting the soonest-expiring ones if the store is full"""
+        with self._lock:
+            self._remove(token_id)
+            if len(self._tokens) >= self.max_tokens:
+                self._purge_expired(datetime.utcnow())
+            while len(self._tokens) >= self.max_tokens:
+                evicted = self._pop_heap()
+                if evicted is None:
+                    break
+                self.evicted += 1
+                logger.warning(f"Fallback token store full ({self.max_tokens}), evicted token {evicted.token_id} of {evicted.username}")
+            self._tokens[token_id] = FallbackToken(token_id, username, created_at, expires_at)
+            self._by_user.setdefault(username, set()).add(token_id)
+            heapq.heappush(self._expiry_heap, (expires_at, token_id))
+
+    def get(self, token_id: str) -> Optional[FallbackToken]:
+        with self._lock:
+            return self._tokens.get(token_id)
+
+    def discard(self, token_id: str):
+        with self._lock:
+            self._remove(token_id)
+
+    def revoke(self, token_id: str) -> bool:
+        """Mark one token revoked; returns False if it is not held here"""
+        with self._lock:
+            token = self._tokens.get(token_id)
+            if token is None:
+                return False
+            token.is_active = False
+            token.revoked_at = datetime.utcnow()
+            return True
+
+    def revoke_user(self, username: str) -> List[str]:
+        """Revoke every token of a user, touching only that user's tokens; returns their ids"""
+        now = datetime.utcnow()
+        revoked = []
+        with self._lock:
+            for token_id in self._by_user.get(username, ()):
+                token = self._tokens[token_id]
+                if token.is_active:
+                    token.is_active = False
+                    token.revoked_at = now
+                    revoked.append(token_id)
+        return revoked
+
+    def purge_expired(self) -> int:
+        """Drop expired tokens; cost is proportional to the number expired"""
+        with self._lock:
+            return self._purge_expired(datetime.utcnow())
+
+    def active_tokens(self) -> List[FallbackToken]:
+        now = datetime.utcnow()
+        with self._lock:
+            return [token for token in self._tokens.values() if token.is_active and now <= token.expires_at]
+
+    def reconcile(self) -> int:
+        """Write held tokens into jwt_sessions and forget the ones that were persisted"""
+        if not self._tokens or db_service.is_degraded():
+            return 0
+        with self._lock:
+            self._purge_expired(datetime.utcnow())
+            snapshot = [
+                (token.token_id, token.username, token.created_at, token.expires_at, token.is_active, token.revoked_at)
+                for token in self._tokens.values()
+            ]
+        if not snapshot:
+            return 0
+
+        db_service.store_refresh_tokens_bulk(snapshot)
+
+        reconciled = 0
+        with self._lock:
+            for token_id, _, _, _, is_active, _ in snapshot:
+                token = self._tokens.get(token_id)
+                # A token revoked while the write was in flight is kept for the next pass
+                if token is not None and token.is_active == is_active:
+                    self._remove(token_id)
+                    reconciled += 1
+        self.reconciled += reconciled
+        logger.info(f"Reconciled {reconciled} fallback refresh tokens into jwt_sessions")
+        return reconciled
+
+    def _reconcile_loop(self):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.warning(f"Fallback token reconciliation failed, will retry: {e}")
+
+    def start_reconciler(self):
+        """Start the background reconciliation thread (idempotent)"""
+        if self._reconcile_thread is None and self.reconcile_interval > 0:
+            self._reconcile_thread = threading.Thread(target=self._reconcile_loop, name="token-reconcile", daemon=True)
+            self._reconcile_thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "held_tokens": len(self._tokens),
+                "max_tokens": self.max_tokens,
+                "users": len(self._by_user),
+                "evicted": self.evicted,
+                "reconciled": self.reconciled
+            }
+
+# Global fallback refresh-token store instance
+fallback_tokens = FallbackTokenStore()
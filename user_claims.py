@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from database_service import db_service
+from invalidation_bus import USER_CHANGED, USER_DELETED
+
+class UserClaimsCache:
+    """Short-lived per-user copy of the claims carried in access tokens.
+
+    Holds each user's role, employee_id, authorization_level and claims_version
+    from the users table for `ttl` seconds (LRU-capped), so deciding whether
+    a token's claims are still current usually costs no database round
+    trip.  Entries are dropped as soon as the invalidation bus reports the
+    user changed, and everything is dropped when the bus flushes.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.environ.get('USER_CLAIMS_CACHE_TTL', '60'))
+        self.max_entries = max(1, int(os.environ.get('USER_CLAIMS_CACHE_MAX_ENTRIES', '10000')))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # username -> (loaded_at, claims)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, username: str) -> Optional[Dict[str, Any]]:
+        """Return the cached claims if still fresh, without touching the database"""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def load(self, username: str) -> Optional[Dict[str, Any]]:
+        """Read the user's claims from the database and cache them"""
+        claims = db_service.get_user_claims(username)
+        with self._lock:
+            self.misses += 1
+            if claims is None:
+                self._entries.pop(username, None)
+                return None
+            self._entries[username] = (time.monotonic(), claims)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return claims
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        claims = self.cached(username)
+        return claims if claims is not None else self.load(username)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in (USER_CHANGED, USER_DELETED):
+            if username:
+                self.invalidate(username)
+            else:
+                self.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached_users": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# Global user claims cache instance
+user_claims = UserClaimsCache()
@@ -0,0 +1,266 @@
+import os
+import time
+import bisect
+import heapq
+import threading
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+import logging
+
+from invalidation_bus import USER_CHANGED, USER_DELETED, USERS_IMPORTED, USERS_SYNCED
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SORT_FIELDS = ('uid', 'cn', 'role', 'authorization_level', 'employee_id')
+SEARCH_FIELDS = ('any', 'uid', 'cn')
+
+class _Index:
+    """One generation of the directory: users by uid plus their sorted and hash indexes"""
+
+    def __init__(self):
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.by_uid: List[Tuple[str, str]] = []  # sorted (uid.lower(), uid)
+        self.by_cn: List[Tuple[str, str]] = []   # sorted (cn.lower(), uid)
+        self.by_role: Dict[str, Set[str]] = {}
+        self.by_level: Dict[int, Set[str]] = {}
+        # Precomputed sort key of every user per sortable field
+        self.sort_keys: Dict[str, Dict[str, tuple]] = {field: {} for field in SORT_FIELDS}
+
+    @staticmethod
+    def _sort_keys(user: Dict[str, Any]) -> Dict[str, tuple]:
+        uid_key = (user['uid'].lower(), user['uid'])
+        return {
+            'uid': uid_key,
+            'cn': _Index._cn_key(user),
+            'role': (user.get('role') or '',) + uid_key,
+            'authorization_level': (user.get('authorization_level') or 0,) + uid_key,
+            'employee_id': (user.get('employee_id') or '',) + uid_key
+        }
+
+    @staticmethod
+    def _cn_key(user: Dict[str, Any]) -> Tuple[str, str]:
+        return ((user.get('cn') or '').lower(), user['uid'])
+
+    @classmethod
+    def build(cls, users: Iterable[Dict[str, Any]]) -> '_Index':
+        """A whole generation at once: fill the indexes, then sort each array once"""
+        index = cls()
+        for user in users:
+            index.users[user['uid']] = user
+        for uid, user in index.users.items():
+            index.by_uid.append((uid.lower(), uid))
+            index.by_cn.append(cls._cn_key(user))
+            index.by_role.setdefault(user.get('role'), set()).add(uid)
+            index.by_level.setdefault(user.get('authorization_level'), set()).add(uid)
+            for field, key in cls._sort_keys(user).items():
+                index.sort_keys[field][uid] = key
+        index.by_uid.sort()
+        index.by_cn.sort()
+        return index
+
+    def add(self, user: Dict[str, Any]):
+        """Insert or replace one user, keeping the arrays sorted"""
+        uid = user['uid']
+        self.remove(uid)
+        self.users[uid] = user
+        bisect.insort(self.by_uid, (uid.lower(), uid))
+        bisect.insort(self.by_cn, self._cn_key(user))
+        self.by_role.setdefault(user.get('role'), set()).add(uid)
+        self.by_level.setdefault(user.get('authorization_level'), set()).add(uid)
+        for field, key in self._sort_keys(user).items():
+            self.sort_keys[field][uid] = key
+
+    @staticmethod
+    def _discard_sorted(keys: List[Tuple[str, str]], key: Tuple[str, str]):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def remove(self, uid: str):
+        user = self.users.pop(uid, None)
+        if user is None:
+            return
+        self._discard_sorted(self.by_uid, (uid.lower(), uid))
+        self._discard_sorted(self.by_cn, self._cn_key(user))
+        for index, value in ((self.by_role, user.get('role')), (self.by_level, user.get('authorization_level'))):
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.discard(uid)
+                if not bucket:
+                    del index[value]
+        for keys in self.sort_keys.values():
+            keys.pop(uid, None)
+
+    @staticmethod
+    def prefix(keys: List[Tuple[str, str]], prefix: str) -> List[str]:
+        """Every uid whose key starts with `prefix` (two binary searches bound the matching run)"""
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + '\uffff',), start)
+        return [uid for _, uid in keys[start:end]]
+
+class UserDirectory:
+    """In-memory, indexed copy of every user for admin search, sort and paging.
+
+    Users are kept in sorted arrays on lower-cased uid and cn (prefix queries
+    are a binary search plus a contiguous scan) and in hash indexes on role
+    and authorization level.  The directory is built from a full LDAP/DB
+    load, updated per user when the invalidation bus reports a change, and
+    rebuilt every USER_DIRECTORY_REFRESH_INTERVAL seconds (or after a bus
+    reconnect or a manual sync) to catch anything done outside this service.
+    Searches never touch LDAP or the database.
+    """
+
+    def __init__(self):
+        self.refresh_interval = float(os.environ.get('USER_DIRECTORY_REFRESH_INTERVAL', '300'))
+        self.max_page_size = int(os.environ.get('USER_DIRECTORY_MAX_PAGE_SIZE', '500'))
+        self._index = _Index()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._dirty: Set[str] = set()
+        self._rebuild_requested = True
+        self._load_all: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None
+        self._load_user: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None
+        self._on_rebuilt: Optional[Callable[[], None]] = None
+        self.loaded = False
+        self.built_at = 0.0
+        self.rebuilds = 0
+        self.failures = 0
+
+    def rebuild(self):
+        """Replace the directory with a fresh full load"""
+        index = _Index.build(self._load_all())
+        with self._lock:
+            self._index = index
+        self.loaded = True
+        self.built_at = time.monotonic()
+        self.rebuilds += 1
+        logger.info(f"User directory rebuilt with {len(index.users)} users")
+        if self._on_rebuilt is not None:
+            self._on_rebuilt()
+
+    def refresh_user(self, username: str):
+        """Reload one user (removing them if they no longer exist)"""
+        user = self._load_user(username)
+        with self._lock:
+            if user is None:
+                self._index.remove(username)
+            else:
+                self._index.add(user)
+
+    def on_invalidation(self, kind: str, username: Optional[str]):
+        if kind in (USERS_IMPORTED, USERS_SYNCED):
+            self.request_rebuild()
+            return
+        if kind not in (USER_CHANGED, USER_DELETED):
+            return
+        if username:
+            with self._lock:
+                self._dirty.add(username)
+        else:
+            self._rebuild_requested = True
+        self._wake.set()
+
+    def request_rebuild(self):
+        """Rebuild in the background (e.g. after a sync or missed invalidations)"""
+        self._rebuild_requested = True
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                if self._rebuild_requested or not self.loaded or time.monotonic() - self.built_at >= self.refresh_interval:
+                    self._rebuild_requested = False
+                    self.rebuild()
+                with self._lock:
+                    dirty, self._dirty = self._dirty, set()
+                for username in dirty:
+                    try:
+                        self.refresh_user(username)
+                    except Exception:
+                        with self._lock:
+                            self._dirty.add(username)
+                        raise
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"User directory update failed, serving the last good copy: {e}")
+                self._wake.wait(min(self.refresh_interval, 30))
+                self._wake.clear()
+                continue
+            self._wake.wait(max(0.0, self.refresh_interval - (time.monotonic() - self.built_at)))
+            self._wake.clear()
+
+    def start(self, load_all: Callable[[], Iterable[Dict[str, Any]]],
+              load_user: Callable[[str], Optional[Dict[str, Any]]], on_rebuilt: Callable[[], None] = None):
+        """Build the directory and keep it current in the background (idempotent)"""
+        self._load_all = load_all
+        self._load_user = load_user
+        self._on_rebuilt = on_rebuilt
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="user-directory", daemon=True)
+            self._thread.start()
+
+    def search(self, query: str = '', field: str = 'any', role: str = None, authorization_level: int = None,
+               sort: str = 'uid', descending: bool = False, offset: int = 0,
+               limit: int = 50) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return (total matches, one page of users) for a prefix query plus filters"""
+        limit = max(0, min(limit, self.max_page_size))
+        offset = max(0, offset)
+        with self._lock:
+            index = self._index
+            candidates: Optional[Set[str]] = None
+            if query:
+                prefix = query.lower()
+                candidates = set()
+                if field in ('any', 'uid'):
+                    candidates.update(index.prefix(index.by_uid, prefix))
+                if field in ('any', 'cn'):
+                    candidates.update(index.prefix(index.by_cn, prefix))
+            for bucket_index, value in ((index.by_role, role), (index.by_level, authorization_level)):
+                if value is not None:
+                    bucket = bucket_index.get(value, set())
+                    candidates = bucket if candidates is None else candidates & bucket
+
+            wanted = offset + limit
+            if candidates is None and sort in ('uid', 'cn'):
+                # No filter: page straight out of the presorted array
+                keys = index.by_uid if sort == 'uid' else index.by_cn
+                total = len(keys)
+                if descending:
+                    start = max(0, total - wanted)
+                    uids = [uid for _, uid in reversed(keys[start:total - offset])] if offset < total else []
+                else:
+                    uids = [uid for _, uid in keys[offset:wanted]]
+            elif sort in ('uid', 'cn') and len(candidates) * 8 >= len(index.users):
+                # Broad match: walk the presorted array and stop once the page is full
+                keys = index.by_uid if sort == 'uid' else index.by_cn
+                total = len(candidates)
+                uids = []
+                for _, uid in (reversed(keys) if descending else keys):
+                    if uid in candidates:
+                        if len(uids) >= wanted:
+                            break
+                        uids.append(uid)
+                uids = uids[offset:]
+            else:
+                matches = index.users.keys() if candidates is None else candidates
+                sort_key = index.sort_keys[sort].__getitem__
+                total = len(matches)
+                # Only the users up to the requested page need ordering
+                select = heapq.nlargest if descending else heapq.nsmallest
+                uids = select(wanted, matches, key=sort_key)[offset:]
+            return total, [dict(index.users[uid]) for uid in uids]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "users": len(self._index.users),
+            "age_seconds": round(time.monotonic() - self.built_at, 1) if self.loaded else None,
+            "pending_updates": len(self._dirty),
+            "rebuilds": self.rebuilds,
+            "failures": self.failures
+        }
+
+# Global user directory instance
+user_directory = UserDirectory()